@@ -0,0 +1,318 @@
+"""
+Clientes TCP y UDP basados en asyncio.
+
+Mismas reglas que los clientes de src/client.py (mínimo 5 mensajes, 'end'
+para terminar), pero sin bloquear: miles de sesiones comparten un solo
+event loop y cada petición tiene su propio timeout.
+"""
+import asyncio
+import logging
+import time
+import sys
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.base.acks import PlainAckMatcher, UnexpectedReply
+from src.base.client_base import BaseClient
+from src.base.metrics import Metrics
+from src.base.framing import HEADER, encode_frame
+from src.base.compression import DEFAULT_THRESHOLD, NONE, encode_hello, is_hello, make_codec, parse_hello
+from src.server import ACK_PREFIX
+
+logger = logging.getLogger(__name__)
+
+class _AsyncClientBase(BaseClient):
+    def __init__(self, port, log_callback=None, timeout=5.0, log_sink=None, compression=None,
+                 compress_threshold=DEFAULT_THRESHOLD):
+        super().__init__(log_sink=log_sink)
+        self.port = port
+        self.log_callback = log_callback
+        # timeout por petición (segundos) para conectar y para cada confirmación
+        self.timeout = timeout
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+
+    def _log(self, message):
+        """envía el log al callback si existe, sino usa logger"""
+        if self.log_sink is not None:
+            self.log_sink.emit(message)
+        elif self.log_callback:
+            self.log_callback(message)
+        else:
+            logger.info(message)
+
+    def _check_end(self, message):
+        """reglas de 'end': None si hay que enviar el mensaje, True/False como send_message si no"""
+        if message.lower() != 'end':
+            return None
+        if self.message_count < 5:
+            self._log(f"Error: Debes enviar al menos 5 mensajes. Llevas {self.message_count}")
+            return True
+        return False
+
+    def _log_sent(self, message):
+        self._emit("Mensaje: {}", message)
+        if self._get_server_info():
+            self._emit("IP de destino: {}", self.server_ip)
+            self._emit("Puerto de destino: {}", self.server_port)
+        self._emit("Tiempo de envío: {ts}")
+
+class AsyncTCPClient(_AsyncClientBase):
+    def __init__(self, port=54321, log_callback=None, framed=False, timeout=5.0, log_sink=None,
+                 compression=None, compress_threshold=DEFAULT_THRESHOLD):
+        super().__init__(port, log_callback, timeout, log_sink, compression, compress_threshold)
+        # compression necesita framing para separar mensajes (igual que TCPClient)
+        self.framed = framed or bool(compression)
+        self.reader = None
+        self.writer = None
+        self._acks = PlainAckMatcher(ACK_PREFIX)
+        # tras un timeout la conexión se descarta y se vuelve a abrir en el próximo envío
+        self._stale = False
+
+    async def connect(self):
+        """establece conexión con el servidor"""
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+            self.socket = self.writer.get_extra_info('socket')
+            self.server_ip = self.server_port = None
+            self._acks.reset()
+            self._stale = False
+            self.metrics.connection_opened()
+            self._log(f"Conectado al servidor en {self.host}:{self.port}")
+            if self.compression:
+                await self._negotiate()
+            return True
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al conectar: {e}")
+            return False
+
+    async def _read_frame(self):
+        header = await self.reader.readexactly(HEADER.size)
+        (length,) = HEADER.unpack(header)
+        return await self.reader.readexactly(length)
+
+    async def _negotiate(self):
+        """ofrece el códec al servidor; si no responde con un saludo se sigue sin comprimir"""
+        self.writer.write(encode_frame(encode_hello((self.compression,))))
+        reply = await asyncio.wait_for(self._read_frame(), self.timeout)
+        name = parse_hello(reply)[0] if is_hello(reply) else NONE
+        self.codec = make_codec(name, True, self.compress_threshold)
+        self._log(f"Compresión: {name}")
+
+    async def _read_echo(self, payload):
+        """sin framing el servidor confirma cada recv por separado: se lee todo el eco"""
+        acks = self._acks
+        acks.expect(payload)
+        try:
+            done = acks.feed()
+            while not done:
+                data = await self.reader.read(65536)
+                if not data:
+                    raise ConnectionError("el servidor cerró la conexión")
+                done = acks.feed(data)
+        except UnexpectedReply:
+            # otra respuesta (p. ej. del rate_limiter) también confirma el mensaje
+            pass
+
+    def _discard_connection(self):
+        """la confirmación vencida puede llegar tarde y leerse como la del próximo mensaje"""
+        self.writer.close()
+        self.metrics.connection_closed()
+        self.reader = self.writer = self.socket = None
+        self.codec = None
+        self._stale = True
+
+    async def send_message(self, message):
+        """envía un mensaje al servidor y espera la respuesta (hasta timeout segundos)"""
+        result = self._check_end(message)
+        if result is not None:
+            return result
+        if self._stale and not await self.connect():
+            return False
+        try:
+            payload = message.encode()
+            started = time.perf_counter_ns()
+            if self.framed:
+                self.writer.write(encode_frame(self.codec.encode(payload) if self.codec else payload))
+            else:
+                self.writer.write(payload)
+            await self.writer.drain()
+            self.message_count += 1
+            self._log_sent(message)
+
+            if self.framed:
+                ack = await asyncio.wait_for(self._read_frame(), self.timeout)
+                if self.codec:
+                    self.codec.decode(ack)
+            else:
+                await asyncio.wait_for(self._read_echo(payload), self.timeout)
+            self.metrics.message(len(payload), time.perf_counter_ns() - started)
+            return True
+        except asyncio.TimeoutError:
+            self.metrics.error()
+            self._log("Timeout: No se recibió respuesta del servidor")
+            self._discard_connection()
+            return False
+        except asyncio.IncompleteReadError:
+            self.metrics.error()
+            self._log("Error al enviar mensaje: el servidor cerró la conexión")
+            return False
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al enviar mensaje: {e}")
+            return False
+
+    async def close(self):
+        """cierra la conexión con el servidor"""
+        if self.writer:
+            try:
+                self.writer.close()
+                await self.writer.wait_closed()
+                self.metrics.connection_closed()
+                self._log("Conexión cerrada")
+            except Exception as e:
+                self._log(f"Error al cerrar la conexión: {e}")
+            finally:
+                self.reader = self.writer = self.socket = None
+                self.codec = None
+
+class _ClientDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, responses):
+        self.responses = responses
+
+    def datagram_received(self, data, address):
+        self.responses.put_nowait(data)
+
+    def error_received(self, exc):
+        # ICMP port unreachable y similares: la petición en curso falla con esa excepción
+        self.responses.put_nowait(exc)
+
+class AsyncUDPClient(_AsyncClientBase):
+    def __init__(self, port=5555, log_callback=None, timeout=5.0, log_sink=None, compression=None,
+                 compress_threshold=DEFAULT_THRESHOLD):
+        super().__init__(port, log_callback, timeout, log_sink, compression, compress_threshold)
+        self.transport = None
+        self._responses = None
+        self._negotiated = False
+
+    async def _ensure_endpoint(self):
+        if self.transport is None:
+            self._responses = asyncio.Queue()
+            loop = asyncio.get_running_loop()
+            self.transport, _ = await loop.create_datagram_endpoint(
+                lambda: _ClientDatagramProtocol(self._responses), remote_addr=(self.host, self.port))
+            self.socket = self.transport.get_extra_info('socket')
+
+    async def _request(self, datagram):
+        """envía un datagrama y espera la próxima respuesta"""
+        # descartamos respuestas atrasadas de peticiones que ya vencieron
+        while not self._responses.empty():
+            self._responses.get_nowait()
+        self.transport.sendto(datagram)
+        response = await asyncio.wait_for(self._responses.get(), self.timeout)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def _negotiate(self):
+        """ofrece el códec al servidor; sin respuesta o sin soporte se sigue sin comprimir"""
+        self._negotiated = True
+        try:
+            reply = await self._request(encode_hello((self.compression,)))
+        except asyncio.TimeoutError:
+            reply = b''
+        name = parse_hello(reply)[0] if is_hello(reply) else NONE
+        self.codec = make_codec(name, False, self.compress_threshold)
+        self._log(f"Compresión: {name}")
+
+    async def send_message(self, message):
+        """envía un mensaje al servidor UDP y espera la confirmación (hasta timeout segundos)"""
+        result = self._check_end(message)
+        if result is not None:
+            return result
+        try:
+            await self._ensure_endpoint()
+            if self.compression and not self._negotiated:
+                await self._negotiate()
+            payload = message.encode()
+            started = time.perf_counter_ns()
+            ack = await self._request(self.codec.encode(payload) if self.codec else payload)
+            self.message_count += 1
+            self._log_sent(message)
+            if self.codec:
+                self.codec.decode(ack)
+            self.metrics.message(len(payload), time.perf_counter_ns() - started)
+            return True
+        except asyncio.TimeoutError:
+            self.metrics.error()
+            self._log("Timeout: No se recibió respuesta del servidor")
+            return False
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al enviar mensaje UDP: {e}")
+            return False
+
+    async def close(self):
+        """cierra el socket UDP"""
+        if self.transport:
+            self.transport.close()
+            self.transport = self.socket = None
+            self._log("Socket UDP cerrado")
+
+async def run_sessions(sessions, messages, protocol='tcp', host='localhost', port=None, **options):
+    """simula sessions usuarios concurrentes que envían messages y terminan con 'end'
+
+    devuelve las métricas (compartidas por todas las sesiones, un solo histograma)
+    y cuántas sesiones completaron todos los mensajes
+    """
+    from src.async_server import raise_nofile_limit
+    raise_nofile_limit()
+    client_class = AsyncTCPClient if protocol == 'tcp' else AsyncUDPClient
+    if port is None:
+        port = 54321 if protocol == 'tcp' else 5555
+
+    async def session(client):
+        client.host = host
+        if protocol == 'tcp' and not await client.connect():
+            return False
+        try:
+            for message in messages:
+                if not await client.send_message(message):
+                    return False
+            return not await client.send_message('end')
+        finally:
+            await client.close()
+
+    metrics = Metrics()
+    clients = [client_class(port, **options) for _ in range(sessions)]
+    for client in clients:
+        client.metrics = metrics
+    results = await asyncio.gather(*(session(client) for client in clients))
+    return metrics, sum(results)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simula muchas sesiones de cliente en un solo event loop")
+    parser.add_argument('--protocol', choices=('tcp', 'udp'), default='tcp')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--sessions', '-n', type=int, default=1000)
+    parser.add_argument('--messages', '-m', type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    metrics, completed = asyncio.run(run_sessions(
+        args.sessions, [f"mensaje {i}" for i in range(args.messages)], args.protocol, args.host, args.port,
+        log_callback=lambda message: None,
+    ))
+    elapsed = time.perf_counter() - started
+    total = metrics.snapshot()
+    print(f"{completed}/{args.sessions} sesiones completas en {elapsed:.2f} s, "
+          f"{total['messages']} mensajes, p99 {total['latency'].percentile(99) / 1000:.1f} us")
@@ -0,0 +1,417 @@
+"""
+Servidores TCP y UDP basados en asyncio (un solo hilo, un event loop)
+"""
+import asyncio
+import socket
+from abc import ABC, abstractmethod
+import logging
+import time
+import sys
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.server import ACK_PREFIX, BaseServer, used_port, used_port_udp
+from src.base.framing import HEADER, MAX_FRAME_SIZE, FrameError, encode_frame
+from src.base.log_sink import LazyText
+from src.base.profiling import LOG, PROCESS, RECV, RESPOND
+from src.base.compression import CodecTable, CompressionError, is_hello
+from src.base.rate_limit import DELAY, SLOW_DOWN, slow_down_reply
+
+logger = logging.getLogger(__name__)
+
+def raise_nofile_limit():
+    """sube el límite blando de descriptores al máximo permitido (para miles de conexiones)"""
+    try:
+        import resource
+    except ImportError:
+        # windows no tiene el módulo resource
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return soft
+
+class AsyncBaseServer(BaseServer, ABC):
+    """base de los servidores asyncio: cada subclase implementa _serve"""
+    def __init__(self, host='localhost', port=None, log_callback=None, **options):
+        super().__init__(host, port, log_callback, **options)
+        self.loop = None
+        self._stop_event = None
+
+    def start(self):
+        """inicia el servidor y bloquea el hilo actual hasta que se llame a stop()"""
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self._log(f"Error al iniciar servidor {self.__class__.__name__}: {e}")
+        finally:
+            self.running = False
+            self.loop = None
+            if self.capture is not None:
+                # con el loop ya terminado no quedan escrituras pendientes
+                self.capture.close()
+
+    @abstractmethod
+    async def _serve(self):
+        """corrutina principal del servidor: la implementa cada subclase (TCP o UDP)
+
+        Debe guardar el loop en self.loop, crear self._stop_event, llamar a
+        _mark_ready() cuando el socket escucha y volver cuando stop() marque
+        el evento.
+        """
+
+    def stop(self):
+        """detiene el servidor (se puede llamar desde cualquier hilo)"""
+        was_running = self.running
+        self.running = False
+        self.ready.clear()
+        loop = self.loop
+        if loop is not None and self._stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                # el loop ya se cerró
+                pass
+        if was_running:
+            self._log(f"Servidor {self.__class__.__name__} detenido")
+
+class AsyncTCPServer(AsyncBaseServer):
+    def __init__(self, host='localhost', port=54321, log_callback=None, backlog=1024, framed=False, **options):
+        super().__init__(host, port, log_callback, **options)
+        self.backlog = backlog
+        self.framed = framed
+        self._client_tasks = set()
+
+    @property
+    def active_connections(self):
+        return len(self._client_tasks)
+
+    def start(self):
+        """inicia el servidor TCP asíncrono"""
+        if used_port(self.port, self.host, self.reuse_port):
+            self._log(f"El puerto {self.port} ya está en uso. El servidor ya está corriendo.")
+            return
+        raise_nofile_limit()
+        super().start()
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        server = await asyncio.start_server(
+            self._handle_framed_client if self.framed else self._handle_client, self.host, self.port,
+            backlog=self.backlog, reuse_address=True, reuse_port=self.reuse_port or None,
+        )
+        self.server_socket = server.sockets[0]
+        self._mark_ready()
+        self._log(f"Servidor TCP asíncrono iniciado en {self.host}:{self.port} (backlog {self.backlog})")
+        try:
+            async with server:
+                await self._stop_event.wait()
+        finally:
+            server.close()
+            # cerramos las conexiones que sigan vivas
+            for task in list(self._client_tasks):
+                task.cancel()
+            if self._client_tasks:
+                await asyncio.gather(*self._client_tasks, return_exceptions=True)
+            await server.wait_closed()
+            self.server_socket = None
+
+    async def _throttle(self, address, nbytes):
+        """como TCPServer._throttle, pero la espera de delay no bloquea el event loop"""
+        action, wait = self._limit(address, nbytes)
+        if action is None:
+            return None
+        if action == DELAY:
+            await asyncio.sleep(wait)
+            return None
+        return slow_down_reply(wait) if action == SLOW_DOWN else b''
+
+    async def _handle_client(self, reader, writer):
+        """maneja la conexión con un cliente TCP dentro del event loop"""
+        task = asyncio.current_task()
+        self._client_tasks.add(task)
+        self.metrics.connection_opened()
+        address = writer.get_extra_info('peername')[:2]
+        local_address = writer.get_extra_info('sockname')[:2]
+        self._emit("Conexión aceptada de {}", address)
+        try:
+            while True:
+                data = await reader.read(1024)
+                if not data:
+                    break
+                started = time.perf_counter_ns()
+                if self.capture is not None:
+                    self.capture.write('tcp', address, local_address, data)
+                if self.flow_table is not None:
+                    self.flow_table.record('tcp', address, len(data))
+                if self.rate_limiter is not None:
+                    reply = await self._throttle(address, len(data))
+                    if reply is not None:
+                        if reply:
+                            writer.write(reply)
+                        continue
+                # los hooks empiezan después del await de _throttle: entre begin y end
+                # no puede correr otra corrutina (el perfilador es uno por hilo)
+                hooks = self.hooks
+                if hooks is not None:
+                    mark = hooks.begin()
+                if self.recorder is not None:
+                    self.recorder.record('tcp', address, data)
+                if hooks is not None:
+                    mark = hooks.lap(RECV, mark)
+
+                client_ip, client_port = address
+                self._emit("Mensaje recibido desde la IP {} puerto {}.", client_ip, client_port)
+                self._emit("Tiempo de recepción: {ts}")
+                if hooks is not None:
+                    mark = hooks.lap(LOG, mark)
+
+                # prefijo + payload en bytes, sin decodificar el mensaje
+                writer.writelines((ACK_PREFIX, data))
+                if hooks is not None:
+                    hooks.end(RESPOND, mark)
+                self.metrics.message(len(data), time.perf_counter_ns() - started)
+                await writer.drain()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al manejar cliente {address}: {e}")
+        finally:
+            self._client_tasks.discard(task)
+            self._end_tcp_session(address, local_address)
+            self._sample_tcp_rtt(writer.get_extra_info('socket'), address)
+            writer.close()
+            self.metrics.connection_closed()
+            self._emit("Conexión cerrada con {}", address)
+
+    async def _handle_framed_client(self, reader, writer):
+        """maneja un cliente TCP con framing (largo + payload) dentro del event loop"""
+        task = asyncio.current_task()
+        self._client_tasks.add(task)
+        self.metrics.connection_opened()
+        address = writer.get_extra_info('peername')[:2]
+        local_address = writer.get_extra_info('sockname')[:2]
+        self._emit("Conexión aceptada de {}", address)
+        codec = None
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                (length,) = HEADER.unpack(header)
+                if length > MAX_FRAME_SIZE:
+                    raise FrameError(f"Frame de {length} bytes supera el máximo de {MAX_FRAME_SIZE}")
+                payload = await reader.readexactly(length)
+                started = time.perf_counter_ns()
+                if self.capture is not None:
+                    self.capture.write('tcp', address, local_address, payload)
+                if self.flow_table is not None:
+                    self.flow_table.record('tcp', address, length)
+                if self.compression and is_hello(payload):
+                    reply, codec = self._negotiate(payload, address)
+                    writer.write(encode_frame(reply))
+                    continue
+                if self.rate_limiter is not None:
+                    reply = await self._throttle(address, length)
+                    if reply is not None:
+                        if reply:
+                            writer.write(encode_frame(codec.encode(reply) if codec is not None else reply))
+                        continue
+                hooks = self.hooks
+                if hooks is not None:
+                    mark = hooks.begin()
+                message = codec.decode(payload) if codec is not None else payload
+                if hooks is not None:
+                    mark = hooks.lap(PROCESS, mark)
+                if self.recorder is not None:
+                    self.recorder.record('tcp', address, message)
+                if hooks is not None:
+                    mark = hooks.lap(RECV, mark)
+
+                client_ip, client_port = address
+                self._emit("Mensaje recibido desde la IP {} puerto {}.", client_ip, client_port)
+                self._emit("Tiempo de recepción: {ts}")
+                if hooks is not None:
+                    mark = hooks.lap(LOG, mark)
+
+                if codec is not None:
+                    reply = codec.encode(ACK_PREFIX + message)
+                    if hooks is not None:
+                        mark = hooks.lap(PROCESS, mark)
+                    writer.write(encode_frame(reply))
+                else:
+                    writer.write(encode_frame(ACK_PREFIX, payload))
+                if hooks is not None:
+                    hooks.end(RESPOND, mark)
+                self.metrics.message(length, time.perf_counter_ns() - started)
+                await writer.drain()
+        except (asyncio.CancelledError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al manejar cliente {address}: {e}")
+        finally:
+            self._client_tasks.discard(task)
+            self._end_tcp_session(address, local_address)
+            if codec is not None:
+                self.compression_stats.merge(codec.stats)
+            self._sample_tcp_rtt(writer.get_extra_info('socket'), address)
+            writer.close()
+            self.metrics.connection_closed()
+            self._emit("Conexión cerrada con {}", address)
+
+class _EchoDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        self.server._handle_datagram(self.transport, data, address)
+
+    def error_received(self, exc):
+        if self.server.running:
+            self.server.metrics.error()
+            self.server._log(f"Error al recibir mensaje UDP: {exc}")
+
+class AsyncUDPServer(AsyncBaseServer):
+    def __init__(self, host='localhost', port=5555, log_callback=None, **options):
+        super().__init__(host, port, log_callback, **options)
+        self.codecs = CodecTable()
+
+    def start(self):
+        """inicia el servidor UDP asíncrono"""
+        if used_port_udp(self.port, self.host, self.reuse_port):
+            self._log(f"El puerto UDP {self.port} ya está en uso. El servidor ya está corriendo.")
+            return
+        super().start()
+        self._log("Servidor UDP terminado")
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        # creamos el socket a mano para mantener SO_REUSEADDR como el servidor con hilos
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._set_socket_options(sock)
+        sock.bind((self.host, self.port))
+        sock.setblocking(False)
+        self.server_socket = sock
+        transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _EchoDatagramProtocol(self), sock=sock,
+        )
+        self._mark_ready()
+        self._log(f"Servidor UDP asíncrono iniciado en {self.host}:{self.port}")
+        try:
+            await self._stop_event.wait()
+        finally:
+            transport.close()
+            self.server_socket = None
+
+    def _handle_datagram(self, transport, data, address):
+        """procesa un datagrama (saludo de compresión y rate_limiter) y responde con la confirmación"""
+        started = time.perf_counter_ns()
+        hooks = self.hooks
+        mark = hooks.begin() if hooks is not None else None
+        if self.capture is not None:
+            self.capture.write('udp', address, self.local_address, data)
+        if self.flow_table is not None:
+            self.flow_table.record('udp', address, len(data))
+        try:
+            if self.compression and is_hello(data):
+                reply, self.codecs[address] = self._negotiate(data, address, stream=False)
+                transport.sendto(reply, address)
+                if hooks is not None:
+                    hooks.end(RESPOND, mark)
+                return
+            if self.rate_limiter is not None:
+                action, wait = self._limit(address, len(data))
+                if action is not None:
+                    if action == DELAY:
+                        # se demora solo a este cliente con un timer del event loop
+                        self.loop.call_later(wait, self._process_delayed, transport, data, address)
+                    elif action == SLOW_DOWN:
+                        codec = self.codecs.get(address)
+                        reply = slow_down_reply(wait)
+                        transport.sendto(codec.encode(reply) if codec is not None else reply, address)
+                    if hooks is not None:
+                        hooks.end(RECV, mark)
+                    return
+            self._process_datagram(transport, data, address, started, mark)
+        except Exception as e:
+            if self.running:
+                self.metrics.error()
+                self._log(f"Error al recibir mensaje UDP: {e}")
+
+    def _process_delayed(self, transport, data, address):
+        """datagrama demorado por el rate_limiter que ya llegó a su turno"""
+        hooks = self.hooks
+        self._process_datagram(transport, data, address, time.perf_counter_ns(),
+                               hooks.begin() if hooks is not None else None)
+
+    def _process_datagram(self, transport, data, address, started, mark=None):
+        """decodifica, registra y confirma un datagrama ya admitido"""
+        hooks = self.hooks if mark is not None else None
+        try:
+            if hooks is not None:
+                mark = hooks.lap(RECV, mark)
+            client_ip, client_port = address[:2]
+            codec = self.codecs.get(address)
+            if codec is not None:
+                try:
+                    data = codec.decode(data)
+                except CompressionError:
+                    # códec viejo de otro cliente en el mismo ip:puerto, o bomba: se olvida
+                    self.codecs.pop(address)
+                    raise
+                if hooks is not None:
+                    mark = hooks.lap(PROCESS, mark)
+            if self.recorder is not None:
+                self.recorder.record('udp', address, data)
+
+            self._emit("Mensaje recibido desde la IP {} puerto {}: {}", client_ip, client_port, LazyText(data))
+            self._emit("Tiempo de recepción: {ts}")
+            if hooks is not None:
+                mark = hooks.lap(LOG, mark)
+
+            # transport.sendto necesita un solo buffer: una copia, pero sin decodificar
+            transport.sendto(codec.encode(ACK_PREFIX + data) if codec is not None else ACK_PREFIX + data, address)
+            if hooks is not None:
+                hooks.end(RESPOND, mark)
+            self.metrics.message(len(data), time.perf_counter_ns() - started)
+            self._emit("Respuesta enviada a {}", address)
+        except Exception as e:
+            if self.running:
+                self.metrics.error()
+                self._log(f"Error al recibir mensaje UDP: {e}")
+
+if __name__ == '__main__':
+    print("Seleccione el servidor asíncrono a iniciar:")
+    print("1. TCP")
+    print("2. UDP")
+    eleccion = input("Ingrese su elección (1 o 2): ")
+
+    if eleccion == "1":
+        server = AsyncTCPServer()
+    elif eleccion == "2":
+        server = AsyncUDPServer()
+    else:
+        print("Opcion invalida")
+        exit(1)
+
+    try:
+        server.start()
+    except KeyboardInterrupt:
+        server.stop()
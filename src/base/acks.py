@@ -0,0 +1,175 @@
+"""
+Confirmaciones del eco TCP sin framing.
+
+Sin framing el servidor responde prefijo + lo que leyó en cada recv: un
+mensaje grande vuelve partido en varias confirmaciones (un prefijo por
+trozo) y varios mensajes juntos en un recv vuelven con un solo prefijo.
+No hay límites de mensaje en el stream, así que el eco se recorre contra
+lo enviado. Un payload puede contener el texto del prefijo, o empezar con
+sus primeros bytes, y entonces cada byte admite dos lecturas (sigue el
+trozo o empieza otra confirmación): se siguen todas las que encajan hasta
+que quede una, comparando en bloque mientras no haya ambigüedad. Si lo
+recibido termina justo donde una lectura completa el mensaje se lo da por
+terminado: el servidor no manda nada más hasta recibir el próximo.
+
+PlainAckMatcher no hace E/S: lo alimentan tanto los clientes con sockets
+bloqueantes como los de asyncio.
+
+    matcher = PlainAckMatcher(ACK_PREFIX)
+    matcher.expect(payload)
+    done = matcher.feed()
+    while not done:
+        done = matcher.feed(sock.recv(65536))
+"""
+
+# estado dentro de un trozo de eco: después de al menos un byte (se puede cortar) o recién abierto
+IN_CHUNK = -1
+CHUNK_START = -2
+
+class UnexpectedReply(ValueError):
+    """el servidor respondió algo que no es el eco (p. ej. 'Reduce la velocidad' del rate_limiter)"""
+    def __init__(self, data):
+        super().__init__("confirmación inesperada del servidor")
+        self.data = data
+
+class PlainAckMatcher:
+    """empareja el eco de una conexión con los payloads enviados, en orden
+
+    Cada lectura posible es (bytes del payload ya confirmados, posición en
+    el prefijo o IN_CHUNK/CHUNK_START). En pedido/respuesta el eco de cada
+    mensaje empieza con su prefijo y todo lo recibido es de ese eco, así que
+    gana la lectura más larga; con pipelined=True lo que sigue puede ser del
+    próximo mensaje (el servidor pudo juntarlos en un recv) y gana la primera
+    que termina.
+    """
+    def __init__(self, prefix, pipelined=False):
+        self.prefix = prefix
+        self.pipelined = pipelined
+        self._buffer = bytearray()
+        self.reset()
+
+    def reset(self):
+        """descarta lo leído (conexión nueva o desincronizada)"""
+        self._buffer.clear()
+        self._payload = b''
+        self._states = {(0, 0)}
+        self._position = 0
+        self._done_at = None
+        # en pipeline, al terminar un mensaje el servidor pudo juntar su final con el siguiente
+        self._after_message = {(0, 0)}
+
+    def expect(self, payload):
+        """siguiente payload cuyo eco hay que consumir"""
+        self._payload = payload
+        self._states = set(self._after_message)
+        self._position = 0
+        self._done_at = None
+
+    def feed(self, data=b''):
+        """agrega bytes recibidos; True cuando el eco del payload esperado está completo
+
+        Lanza UnexpectedReply (con lo recibido) si ninguna lectura encaja; el
+        matcher queda vacío para el próximo mensaje.
+        """
+        buffer = self._buffer
+        buffer += data
+        if not self._payload:
+            return True
+        position = self._position
+        while self._states and position < len(buffer):
+            if self._done_at is not None and self.pipelined:
+                break
+            if len(self._states) == 1:
+                position = self._advance_one(position)
+            else:
+                position = self._step(position)
+        self._position = position
+        if self._states and self._done_at is None:
+            # faltan bytes: lo ya recorrido no hace falta guardarlo
+            del buffer[:position]
+            self._position = 0
+            return False
+        if self._states and self._done_at < len(buffer) and not self.pipelined:
+            # una lectura más larga sigue viva sobre bytes ya recibidos: son de este eco
+            return False
+        if self._done_at is None:
+            reply = bytes(buffer)
+            self.reset()
+            raise UnexpectedReply(reply)
+        # el mensaje termina en _done_at; lo que sigue es del próximo
+        del buffer[:self._done_at]
+        if self.pipelined:
+            self._after_message = {(0, IN_CHUNK)}
+        self._states = set()
+        self._position = 0
+        return True
+
+    def _finish(self, position):
+        if self._done_at is None or not self.pipelined:
+            self._done_at = position
+
+    def _step(self, position):
+        """un byte con varias lecturas vivas"""
+        byte = self._buffer[position]
+        prefix, payload = self.prefix, self._payload
+        states = set()
+        for offset, state in self._states:
+            if state >= 0:
+                if prefix[state] == byte:
+                    states.add((offset, state + 1 if state + 1 < len(prefix) else CHUNK_START))
+                continue
+            if payload[offset] == byte:
+                if offset + 1 == len(payload):
+                    self._finish(position + 1)
+                else:
+                    states.add((offset + 1, IN_CHUNK))
+            if state == IN_CHUNK and prefix[0] == byte:
+                states.add((offset, 1 if len(prefix) > 1 else CHUNK_START))
+        self._states = states
+        return position + 1
+
+    def _fits_prefix(self, position):
+        buffer, prefix = self._buffer, self.prefix
+        if len(buffer) - position >= len(prefix):
+            return buffer.startswith(prefix, position)
+        return prefix.startswith(buffer[position:])
+
+    def _advance_one(self, position):
+        """una sola lectura viva: compara en bloque hasta donde pueda aparecer otra"""
+        buffer, prefix, payload = self._buffer, self.prefix, self._payload
+        (offset, state), = self._states
+        if state >= 0:
+            size = min(len(prefix) - state, len(buffer) - position)
+            if buffer[position:position + size] != prefix[state:state + size]:
+                self._states = set()
+                return position
+            state += size
+            self._states = {(offset, state if state < len(prefix) else CHUNK_START)}
+            return position + size
+        size = min(len(buffer) - position, len(payload) - offset)
+        matched = size
+        if buffer[position:position + size] != payload[offset:offset + size]:
+            matched = 0
+            while buffer[position + matched] == payload[offset + matched]:
+                matched += 1
+        # el servidor pudo haber cortado el trozo dentro del tramo que coincide
+        end = position + matched
+        cut = buffer.find(prefix[:1], position + (1 if state == CHUNK_START else 0), end)
+        while cut != -1 and not self._fits_prefix(cut):
+            cut = buffer.find(prefix[:1], cut + 1, end)
+        if cut == position:
+            return self._step(position)
+        if cut != -1:
+            # el prefijo aparece dentro del eco: desde acá se siguen las dos lecturas byte a byte
+            self._states = {(offset + cut - position, IN_CHUNK if cut > position else state)}
+            return cut
+        if offset + matched == len(payload):
+            self._states = set()
+            self._finish(end)
+        elif matched < size:
+            # el eco ya no coincide: solo puede empezar otra confirmación
+            can_cut = matched > 0 or state == IN_CHUNK
+            self._states = {(offset + matched, 0)} if can_cut and self._fits_prefix(end) else set()
+        elif matched:
+            self._states = {(offset + matched, IN_CHUNK)}
+        return end
@@ -0,0 +1,304 @@
+"""
+Captura de tráfico a pcap y lectura indexada con mmap.
+
+CaptureWriter guarda cada mensaje como un paquete IPv4/IPv6 + TCP/UDP
+sintético (LINKTYPE_RAW, timestamps en ns), así que el archivo se abre con
+Wireshark/tcpdump. Las escrituras se acumulan en un buffer y se vuelcan en
+bloques grandes, y un hilo compartido (src/base/flusher.py) las vuelca cada
+flush_interval segundos aunque no lleguen más mensajes, así una captura en
+curso (o un proceso que muere) pierde como mucho ese intervalo.
+
+CaptureReader mapea el archivo en memoria y construye un índice de offsets,
+timestamps y flujos sin copiar los payloads, para filtrar capturas de
+varios GB sin cargarlas en RAM.
+"""
+import ipaddress
+import mmap
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from src.base.flusher import flusher
+
+PCAP_MAGIC_NS = 0xA1B23C4D
+LINKTYPE_RAW = 101
+SNAPLEN = 65535
+# direcciones IP empaquetadas que se guardan en caché antes de vaciarla
+MAX_CACHED_ADDRESSES = 4096
+GLOBAL_HEADER = struct.Struct('<IHHiIII')
+RECORD_HEADER = struct.Struct('<IIII')
+IPV4_HEADER = struct.Struct('!BBHHHBBH4s4s')
+IPV6_HEADER = struct.Struct('!IHBB16s16s')
+TCP_HEADER = struct.Struct('!HHIIBBHHH')
+UDP_HEADER = struct.Struct('!HHHH')
+PROTO_TCP = 6
+PROTO_UDP = 17
+PROTOCOLS = {'tcp': PROTO_TCP, 'udp': PROTO_UDP}
+PROTOCOL_NAMES = {PROTO_TCP: 'tcp', PROTO_UDP: 'udp'}
+
+def _ipv4_checksum(header):
+    total = sum(struct.unpack('!10H', header))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+class CaptureWriter:
+    """escribe mensajes como paquetes en un pcap, con buffer de escritura en bloque"""
+    def __init__(self, path, buffer_size=1024 * 1024, snaplen=SNAPLEN, flush_interval=1.0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.snaplen = snaplen
+        self._file = open(path, 'wb')
+        self._file.write(GLOBAL_HEADER.pack(PCAP_MAGIC_NS, 2, 4, 0, 0, snaplen, LINKTYPE_RAW))
+        self._file.flush()
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        # secuencia TCP sintética por dirección de flujo (se borra con close_flow)
+        self._tcp_seq = {}
+        self._addresses = {}
+        self.packets = 0
+        self.bytes_written = GLOBAL_HEADER.size
+        flusher.register(self, flush_interval)
+
+    def _packed_address(self, ip):
+        packed = self._addresses.get(ip)
+        if packed is None:
+            if len(self._addresses) >= MAX_CACHED_ADDRESSES:
+                self._addresses = {}
+            key = ip
+            if ip == 'localhost':
+                ip = '127.0.0.1'
+            packed = self._addresses[key] = ipaddress.ip_address(ip).packed
+        return packed
+
+    def write(self, protocol, source, destination, payload, ts_ns=None):
+        """agrega un mensaje (protocol 'tcp'/'udp', source/destination como (ip, puerto))"""
+        if ts_ns is None:
+            ts_ns = time.time_ns()
+        proto = PROTOCOLS[protocol]
+        src_ip = self._packed_address(source[0])
+        dst_ip = self._packed_address(destination[0])
+        original = len(payload)
+        with self._lock:
+            if self._file.closed:
+                # el servidor ya se detuvo y cerró la captura
+                return
+            if proto == PROTO_TCP:
+                key = (source, destination)
+                seq = self._tcp_seq.get(key, 0)
+                self._tcp_seq[key] = (seq + original) & 0xFFFFFFFF
+                # data offset 5 palabras, flags PSH|ACK
+                l4 = TCP_HEADER.pack(source[1], destination[1], seq, 0, 5 << 4, 0x18, 65535, 0, 0)
+            else:
+                l4 = UDP_HEADER.pack(source[1], destination[1], min(0xFFFF, 8 + original), 0)
+            if len(src_ip) == 4:
+                total = min(0xFFFF, 20 + len(l4) + original)
+                header = IPV4_HEADER.pack(0x45, 0, total, 0, 0, 64, proto, 0, src_ip, dst_ip)
+                header = header[:10] + struct.pack('!H', _ipv4_checksum(header)) + header[12:]
+            else:
+                header = IPV6_HEADER.pack(6 << 28, min(0xFFFF, len(l4) + original), proto, 64, src_ip, dst_ip)
+            wire_length = len(header) + len(l4) + original
+            captured = min(original, self.snaplen - len(header) - len(l4))
+            buffer = self._buffer
+            buffer += RECORD_HEADER.pack(ts_ns // 1_000_000_000, ts_ns % 1_000_000_000,
+                                         len(header) + len(l4) + captured, wire_length)
+            buffer += header
+            buffer += l4
+            buffer += payload[:captured]
+            self.packets += 1
+            if len(buffer) >= self.buffer_size:
+                self._flush_locked()
+
+    def close_flow(self, source, destination):
+        """olvida la secuencia TCP de una conexión terminada (ambos sentidos)"""
+        with self._lock:
+            self._tcp_seq.pop((source, destination), None)
+            self._tcp_seq.pop((destination, source), None)
+
+    def _flush_locked(self):
+        if self._buffer and not self._file.closed:
+            self._file.write(self._buffer)
+            self.bytes_written += len(self._buffer)
+            self._buffer = bytearray()
+
+    def flush(self):
+        """vuelca el buffer al archivo"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_locked()
+            self._file.flush()
+
+    def close(self):
+        flusher.unregister(self)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_locked()
+            self._file.close()
+            self._tcp_seq.clear()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CaptureReader:
+    """lee un pcap mapeado en memoria con índice de offsets, timestamps y flujos
+
+    Un flujo es (protocolo, ip origen, puerto origen, ip destino, puerto destino).
+    Los payloads se devuelven como memoryview sobre el mmap: no se copian.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, _, _, _, _, _, linktype = GLOBAL_HEADER.unpack_from(self._map, 0)
+        if magic == PCAP_MAGIC_NS:
+            self._ts_scale = 1
+        elif magic == 0xA1B2C3D4:
+            self._ts_scale = 1000
+        else:
+            raise ValueError(f"{path} no es un pcap little-endian soportado")
+        if linktype != LINKTYPE_RAW:
+            raise ValueError(f"Tipo de enlace {linktype} no soportado (se esperaba LINKTYPE_RAW)")
+        self.offsets = array('Q')
+        self.timestamps = array('q')
+        self.flow_ids = array('I')
+        self.flows = []
+        # clave cruda (bytes del paquete) -> posición en flows
+        self._flow_index = {}
+        self.sorted_by_time = True
+        self._build_index()
+
+    def _raw_flow(self, offset):
+        """clave cruda del flujo: direcciones y puertos empaquetados + protocolo, sin decodificar"""
+        data = self._map
+        if data[offset] >> 4 == 4:
+            header_length = (data[offset] & 0x0F) * 4
+            return data[offset + 12:offset + 20] + data[offset + header_length:offset + header_length + 4] \
+                + data[offset + 9:offset + 10]
+        return data[offset + 8:offset + 44] + data[offset + 6:offset + 7]
+
+    @staticmethod
+    def _decode_flow(key):
+        """(protocolo, ip origen, puerto origen, ip destino, puerto destino) de una clave cruda"""
+        size = (len(key) - 5) // 2
+        src = str(ipaddress.ip_address(key[:size]))
+        dst = str(ipaddress.ip_address(key[size:2 * size]))
+        src_port, dst_port = struct.unpack_from('!HH', key, 2 * size)
+        proto = key[-1]
+        return PROTOCOL_NAMES.get(proto, str(proto)), src, src_port, dst, dst_port
+
+    def _headers_length(self, offset):
+        """largo de las cabeceras IP + L4 del paquete en offset"""
+        data = self._map
+        if data[offset] >> 4 == 4:
+            header_length, proto = (data[offset] & 0x0F) * 4, data[offset + 9]
+        else:
+            header_length, proto = 40, data[offset + 6]
+        return header_length + (TCP_HEADER.size if proto == PROTO_TCP else UDP_HEADER.size)
+
+    def _build_index(self):
+        """recorre los registros una vez; el texto de cada flujo se arma solo al verlo por primera vez"""
+        data = self._map
+        size = len(data)
+        offset = GLOBAL_HEADER.size
+        last_ts = -1
+        unpack_record = RECORD_HEADER.unpack_from
+        raw_flow = self._raw_flow
+        flow_index = self._flow_index
+        offsets, timestamps, flow_ids = self.offsets, self.timestamps, self.flow_ids
+        scale = self._ts_scale
+        while offset + RECORD_HEADER.size <= size:
+            seconds, fraction, caplen, _ = unpack_record(data, offset)
+            packet = offset + RECORD_HEADER.size
+            if packet + caplen > size:
+                # registro truncado al final (captura en curso)
+                break
+            ts = seconds * 1_000_000_000 + fraction * scale
+            key = raw_flow(packet)
+            flow_id = flow_index.get(key)
+            if flow_id is None:
+                flow_id = flow_index[key] = len(self.flows)
+                self.flows.append(self._decode_flow(key))
+            if ts < last_ts:
+                self.sorted_by_time = False
+            last_ts = ts
+            offsets.append(offset)
+            timestamps.append(ts)
+            flow_ids.append(flow_id)
+            offset = packet + caplen
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def record(self, index):
+        """(ts_ns, flujo, payload) del registro index"""
+        offset = self.offsets[index]
+        _, _, caplen, _ = RECORD_HEADER.unpack_from(self._map, offset)
+        packet = offset + RECORD_HEADER.size
+        headers = self._headers_length(packet)
+        return self.timestamps[index], self.flows[self.flow_ids[index]], self._view[packet + headers:packet + caplen]
+
+    def _range(self, start_ns, end_ns):
+        if not self.sorted_by_time:
+            return range(len(self))
+        low = 0 if start_ns is None else bisect_left(self.timestamps, start_ns)
+        high = len(self) if end_ns is None else bisect_right(self.timestamps, end_ns)
+        return range(low, high)
+
+    def filter(self, flow=None, protocol=None, host=None, port=None, start_ns=None, end_ns=None):
+        """itera (ts_ns, flujo, payload) que cumplan los filtros
+
+        flow: tupla exacta de flujo; host/port coinciden con origen o destino.
+        """
+        wanted = None
+        if flow is not None or protocol or host or port:
+            wanted = set()
+            for flow_id, candidate in enumerate(self.flows):
+                proto, src, src_port, dst, dst_port = candidate
+                if flow is not None and candidate != tuple(flow):
+                    continue
+                if protocol and proto != protocol:
+                    continue
+                if host and host not in (src, dst):
+                    continue
+                if port and port not in (src_port, dst_port):
+                    continue
+                wanted.add(flow_id)
+        timestamps = self.timestamps
+        for index in self._range(start_ns, end_ns):
+            if wanted is not None and self.flow_ids[index] not in wanted:
+                continue
+            ts = timestamps[index]
+            if (start_ns is not None and ts < start_ns) or (end_ns is not None and ts > end_ns):
+                continue
+            yield self.record(index)
+
+    def flow_summary(self):
+        """{flujo: (paquetes, primer ts, último ts)} calculado desde el índice"""
+        summary = {}
+        for flow_id, ts in zip(self.flow_ids, self.timestamps):
+            count, first, last = summary.get(flow_id, (0, ts, ts))
+            summary[flow_id] = (count + 1, min(first, ts), max(last, ts))
+        return {self.flows[flow_id]: value for flow_id, value in summary.items()}
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
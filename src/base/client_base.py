@@ -6,19 +6,42 @@ import logging
 import time
 from datetime import datetime
 
+from src.base.log_sink import format_event
+from src.base.metrics import Metrics
+
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
 class BaseClient:
-    def __init__(self, host='localhost'):
+    def __init__(self, host='localhost', log_sink=None):
         self.host = host
         self.socket = None
         self.message_count = 0
         self.server_ip = None
         self.server_port = None
+        # con log_sink los logs se encolan y se formatean en otro hilo (src/base/log_sink.py)
+        self.log_sink = log_sink
+        # mensajes, bytes y RTT de las confirmaciones (src/base/metrics.py)
+        self.metrics = Metrics()
+        # códec negociado con el servidor (src/base/compression.py), None sin compresión
+        self.codec = None
+
+    def compression_stats(self):
+        """relación de compresión y CPU por mensaje; None si no se negoció compresión"""
+        return self.codec.stats.summary() if self.codec is not None else None
+
+    def _emit(self, template, *args):
+        """log del camino caliente: con log_sink el formateo (y la hora {ts}) se difiere"""
+        if self.log_sink is not None:
+            self.log_sink.emit(template, args)
+        else:
+            self._log(format_event(template, args, time.time()))
 
     def _get_server_info(self):
         """Obtiene la información del servidor después de la conexión"""
+        if self.server_ip is not None:
+            # ya la consultamos en esta conexión, evitamos un getpeername por mensaje
+            return True
         if self.socket:
             self.server_ip, self.server_port = self.socket.getpeername()
             return True
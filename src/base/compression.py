@@ -0,0 +1,237 @@
+"""
+Compresión opcional de payloads negociada por conexión.
+
+El cliente abre con un saludo (byte 0xFE + códecs que ofrece, separados por
+coma) y el servidor responde 0xFE + el códec elegido, o 'none'. Un servidor
+sin compresión trata el saludo como un mensaje más y lo confirma con el
+prefijo normal, así que el cliente detecta que no hay soporte y sigue sin
+comprimir. 0xFE nunca aparece al inicio de un texto UTF-8.
+
+Después del saludo cada mensaje lleva un byte de flag (0 = sin comprimir,
+1 = deflate). Los mensajes bajo el umbral van sin comprimir.
+  - TCP (stream): un contexto deflate por dirección que se conserva entre
+    mensajes (Z_SYNC_FLUSH), así que los mensajes chicos se comprimen contra
+    el historial de la conexión.
+  - UDP (datagramas): cada datagrama se comprime solo, pero con un
+    diccionario compartido para que los mensajes chicos igual compriman.
+
+Al descomprimir se corta en MAX_FRAME_SIZE: un payload que crece más que eso
+se rechaza con CompressionError (en TCP se cierra la conexión, en UDP se
+descarta el datagrama y se olvida el códec de esa dirección).
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from src.base.framing import MAX_FRAME_SIZE
+
+HELLO = 0xFE
+RAW = 0
+DEFLATE = 1
+NONE = 'none'
+CODECS = ('zlib',)
+DEFAULT_THRESHOLD = 256
+DEFAULT_LEVEL = 6
+# direcciones UDP con códec que se recuerdan y segundos sin tráfico hasta olvidarlas
+MAX_CODECS = 4096
+CODEC_IDLE_TIMEOUT = 300.0
+# cola que agrega Z_SYNC_FLUSH; no se envía y se repone al descomprimir
+SYNC_TAIL = b'\x00\x00\xff\xff'
+# diccionario compartido (inicial en TCP, por datagrama en UDP): fragmentos típicos del tráfico tipo log
+DICTIONARY = (
+    "Confirmación recibida: Mensaje recibido desde la IP puerto Tiempo de recepción: "
+    "Respuesta enviada a Conexión aceptada de Conexión cerrada con Error al "
+    '{"timestamp": "2024-01-01T00:00:00.000Z", "level": "INFO", "message": "", '
+    '"host": "localhost", "service": "", "status": 200, "latency_ms": '
+    "INFO WARNING ERROR DEBUG GET POST HTTP/1.1 127.0.0.1 "
+).encode()
+
+class CompressionError(ValueError):
+    """payload comprimido inválido o que supera el tamaño máximo al descomprimir"""
+
+def encode_hello(codecs=CODECS):
+    return bytes([HELLO]) + ','.join(codecs).encode()
+
+def is_hello(data):
+    return len(data) > 0 and data[0] == HELLO
+
+def parse_hello(data):
+    """códec de un saludo (respuesta del servidor) o lista de códecs ofrecidos"""
+    return bytes(data[1:]).decode('ascii', errors='replace').split(',')
+
+def choose_codec(offered, supported):
+    """primer códec ofrecido por el cliente que el servidor soporta ('none' si no hay)"""
+    for name in offered:
+        if name in supported:
+            return name
+    return NONE
+
+class CompressionStats:
+    """bytes antes/después de comprimir y CPU usada (ns) para comprimir y descomprimir"""
+    def __init__(self):
+        self.encoded = 0
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.encode_ns = 0
+        self.decoded = 0
+        self.decode_ns = 0
+        self._lock = threading.Lock()
+
+    def merge(self, other):
+        with self._lock:
+            for name in ('encoded', 'compressed', 'raw_bytes', 'wire_bytes', 'encode_ns', 'decoded', 'decode_ns'):
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def summary(self):
+        messages = self.encoded + self.decoded
+        return {
+            'messages': self.encoded,
+            'compressed': self.compressed,
+            'raw_bytes': self.raw_bytes,
+            'wire_bytes': self.wire_bytes,
+            'ratio': self.raw_bytes / self.wire_bytes if self.wire_bytes else 1.0,
+            'cpu_us_per_message': (self.encode_ns + self.decode_ns) / messages / 1000 if messages else 0.0,
+        }
+
+class _Codec:
+    """flag + payload; las subclases definen cómo se comprime y descomprime"""
+    name = 'zlib'
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, level=DEFAULT_LEVEL, stats=None, max_size=MAX_FRAME_SIZE):
+        self.threshold = threshold
+        self.level = level
+        self.stats = stats or CompressionStats()
+        # tope del payload descomprimido (protege contra bombas de descompresión)
+        self.max_size = max_size
+
+    def encode(self, payload):
+        """payload listo para enviar: flag + datos (comprimidos si supera el umbral)"""
+        stats = self.stats
+        started = time.thread_time_ns()
+        if len(payload) >= self.threshold:
+            wire = bytes([DEFLATE]) + self._compress(payload)
+            stats.compressed += 1
+        else:
+            wire = bytes([RAW]) + payload
+        stats.encode_ns += time.thread_time_ns() - started
+        stats.encoded += 1
+        stats.raw_bytes += len(payload)
+        stats.wire_bytes += len(wire)
+        return wire
+
+    def decode(self, data):
+        started = time.thread_time_ns()
+        if data[0] == DEFLATE:
+            payload = self._decompress(data[1:])
+        elif data[0] == RAW:
+            payload = bytes(data[1:])
+        else:
+            raise CompressionError(f"Flag de compresión desconocido: {data[0]}")
+        self.stats.decode_ns += time.thread_time_ns() - started
+        self.stats.decoded += 1
+        return payload
+
+class StreamCodec(_Codec):
+    """códec para una conexión TCP: contextos deflate que se conservan entre mensajes"""
+    def __init__(self, threshold=DEFAULT_THRESHOLD, level=DEFAULT_LEVEL, stats=None, max_size=MAX_FRAME_SIZE):
+        super().__init__(threshold, level, stats, max_size)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=DICTIONARY)
+        self._decompressor = zlib.decompressobj(-15, zdict=DICTIONARY)
+
+    def _compress(self, payload):
+        data = self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data[:-len(SYNC_TAIL)] if data.endswith(SYNC_TAIL) else data
+
+    def _decompress(self, data):
+        return _bounded(self._decompressor, bytes(data) + SYNC_TAIL, self.max_size)
+
+class DatagramCodec(_Codec):
+    """códec para UDP: cada datagrama se comprime por separado con el diccionario compartido
+
+    Ventana de 4 KiB y memLevel 5: crear el contexto por datagrama cuesta
+    ~9 us en vez de ~60 us con la ventana de 32 KiB.
+    """
+    WBITS = -12
+
+    def _compress(self, payload):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, self.WBITS, 5, zdict=DICTIONARY)
+        return compressor.compress(payload) + compressor.flush()
+
+    def _decompress(self, data):
+        return _bounded(zlib.decompressobj(self.WBITS, zdict=DICTIONARY), data, self.max_size)
+
+def _bounded(decompressor, data, max_size):
+    """descomprime como mucho max_size bytes; si sobra entrada el payload es demasiado grande"""
+    try:
+        # un byte de más para distinguir 'justo max_size' de 'sigue creciendo'
+        payload = decompressor.decompress(data, max_size + 1)
+    except zlib.error as e:
+        raise CompressionError(f"Payload comprimido inválido: {e}") from None
+    if len(payload) > max_size or decompressor.unconsumed_tail:
+        raise CompressionError(f"El payload descomprimido supera {max_size} bytes")
+    return payload
+
+def make_codec(name, stream=True, threshold=DEFAULT_THRESHOLD, stats=None):
+    """códec negociado ('none' devuelve None)"""
+    if name == NONE:
+        return None
+    if name not in CODECS:
+        raise ValueError(f"Códec de compresión no soportado: {name}")
+    return StreamCodec(threshold, stats=stats) if stream else DatagramCodec(threshold, stats=stats)
+
+class CodecTable:
+    """códecs UDP por dirección, con tope de entradas y expiración por inactividad
+
+    Orden LRU: cada uso mueve la dirección al final, así que las inactivas
+    quedan al principio y se descartan sin recorrer la tabla. Un códec que
+    pasó idle_timeout sin tráfico no se devuelve: el ip:puerto pudo pasar a
+    otro cliente que no negoció compresión.
+    """
+    def __init__(self, max_entries=MAX_CODECS, idle_timeout=CODEC_IDLE_TIMEOUT):
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout
+        # dirección -> (códec, último uso)
+        self._entries = OrderedDict()
+
+    def get(self, address):
+        entry = self._entries.get(address)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now - entry[1] > self.idle_timeout:
+            del self._entries[address]
+            return None
+        self._entries[address] = (entry[0], now)
+        self._entries.move_to_end(address)
+        return entry[0]
+
+    def __setitem__(self, address, codec):
+        """registra el códec negociado; None ('none') olvida la dirección"""
+        self._entries.pop(address, None)
+        if codec is None:
+            return
+        now = time.monotonic()
+        self._expire(now)
+        while len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+        self._entries[address] = (codec, now)
+
+    def pop(self, address):
+        entry = self._entries.pop(address, None)
+        return entry[0] if entry is not None else None
+
+    def _expire(self, now):
+        entries = self._entries
+        while entries:
+            address, (_, last_used) = next(iter(entries.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del entries[address]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, address):
+        return address in self._entries
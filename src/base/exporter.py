@@ -0,0 +1,268 @@
+"""
+Endpoint HTTP local con métricas en formato de texto de Prometheus.
+
+Solo usa la biblioteca estándar. Los contadores siguen en los shards por
+hilo de Metrics (src/base/metrics.py) y se suman recién al atender el
+scrape, así que el camino de red no toma ningún lock compartido:
+
+    exporter = MetricsExporter({'tcp': tcp_server, 'udp': udp_server}, port=9464)
+    exporter.start()
+    curl http://127.0.0.1:9464/metrics
+
+Con profile_dir también acepta capturas de perfilado (src/base/profiling.py)
+sobre los servidores; los archivos se escriben siempre en profile_dir:
+
+    curl -X POST 'http://127.0.0.1:9464/profile/start?kind=cprofile&seconds=10'
+    curl -X POST http://127.0.0.1:9464/profile/stop
+    curl http://127.0.0.1:9464/profile
+"""
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from src.base.histogram import BUCKET_COUNT, bucket_value
+from src.base.profiling import CPROFILE, KINDS, HotPathProfiler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9464
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# límites (segundos) de los buckets de latencia exportados
+LATENCY_BOUNDS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                  0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _bound_index(index):
+    value = bucket_value(index) / 1e9
+    for position, bound in enumerate(LATENCY_BOUNDS):
+        if value <= bound:
+            return position
+    return len(LATENCY_BOUNDS)
+
+# bucket del histograma interno -> bucket exportado, calculado una sola vez
+_BOUND_OF_BUCKET = array('b', (_bound_index(index) for index in range(BUCKET_COUNT)))
+
+COUNTERS = (
+    ('connections', 'csat_connections_total', 'counter', "Conexiones aceptadas"),
+    ('active_connections', 'csat_connections_active', 'gauge', "Conexiones abiertas"),
+    ('messages', 'csat_messages_total', 'counter', "Mensajes procesados"),
+    ('bytes', 'csat_bytes_total', 'counter', "Bytes de payload recibidos"),
+    ('errors', 'csat_errors_total', 'counter', "Errores de red o de manejo"),
+)
+
+def _metrics_of(source):
+    """acepta un servidor/cliente (con .metrics) o un Metrics directamente"""
+    return getattr(source, 'metrics', source)
+
+def _extra_stats(source):
+    """estadísticas opcionales del pool de workers, del reaper, del rate_limiter y de recepción UDP"""
+    stats = {}
+    admission = getattr(source, 'admission_stats', None)
+    pool = admission() if admission is not None else None
+    if pool:
+        stats.update((f'csat_pool_{name}', value) for name, value in pool.items())
+    reaper = getattr(source, 'reaper_stats', None)
+    if reaper is not None:
+        stats.update((f'csat_reaper_{name}', value) for name, value in reaper().items())
+    rate_limit = getattr(source, 'rate_limit_stats', None)
+    limits = rate_limit() if rate_limit is not None else None
+    if limits:
+        stats.update((f'csat_ratelimit_{name}', value) for name, value in limits.items())
+    receive = getattr(source, 'receive_stats', None)
+    if receive is not None:
+        # rx_dropped es None sin SO_RXQ_OVFL
+        stats.update((f'csat_udp_{name}', value) for name, value in receive().items() if value is not None)
+    return stats
+
+def _throttled_lines(sources):
+    """mensajes limitados de las IPs más castigadas, con la IP como etiqueta"""
+    lines = []
+    for label, source in sources.items():
+        limiter = getattr(source, 'rate_limiter', None)
+        if limiter is None:
+            continue
+        for ip, count in limiter.top_throttled():
+            lines.append(f'csat_ratelimit_throttled_by_ip{{server="{label}",ip="{ip}"}} {count}')
+    if lines:
+        lines.insert(0, '# TYPE csat_ratelimit_throttled_by_ip gauge')
+    return lines
+
+def _histogram_lines(name, label, histogram):
+    per_bound = [0] * (len(LATENCY_BOUNDS) + 1)
+    bound_of = _BOUND_OF_BUCKET
+    for index, count in enumerate(histogram.counts):
+        if count:
+            per_bound[bound_of[index]] += count
+    lines = []
+    cumulative = 0
+    for bound, count in zip(LATENCY_BOUNDS, per_bound):
+        cumulative += count
+        lines.append(f'{name}_bucket{{server="{label}",le="{bound:g}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{server="{label}",le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{server="{label}"}} {histogram.total / 1e9:.9f}')
+    lines.append(f'{name}_count{{server="{label}"}} {histogram.count}')
+    return lines
+
+def render_metrics(sources):
+    """texto de Prometheus para {etiqueta: servidor o Metrics}"""
+    snapshots = {label: _metrics_of(source).snapshot() for label, source in sources.items()}
+    lines = []
+    for key, name, kind, help_text in COUNTERS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for label, snapshot in snapshots.items():
+            lines.append(f'{name}{{server="{label}"}} {snapshot[key]}')
+
+    name = 'csat_latency_seconds'
+    lines.append(f'# HELP {name} Latencia de procesamiento por mensaje')
+    lines.append(f'# TYPE {name} histogram')
+    for label, snapshot in snapshots.items():
+        lines.extend(_histogram_lines(name, label, snapshot['latency']))
+
+    extras = {}
+    for label, source in sources.items():
+        for name, value in _extra_stats(source).items():
+            extras.setdefault(name, []).append((label, value))
+    for name, values in extras.items():
+        lines.append(f'# TYPE {name} gauge')
+        lines.extend(f'{name}{{server="{label}"}} {value}' for label, value in values)
+    lines.extend(_throttled_lines(sources))
+    return '\n'.join(lines) + '\n'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body, content_type=CONTENT_TYPE):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, data):
+        self._send(status, json.dumps(data, indent=2).encode(), 'application/json')
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/profile' and self.server.exporter.profile_dir is not None:
+            self._send_json(200, self.server.exporter.profile_status())
+            return
+        if path not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        try:
+            body = render_metrics(self.server.exporter.sources).encode()
+        except Exception as e:
+            logger.info(f"Error al generar métricas: {e}")
+            self.send_error(500)
+            return
+        self._send(200, body)
+
+    def do_POST(self):
+        exporter = self.server.exporter
+        url = urlsplit(self.path)
+        if exporter.profile_dir is None or url.path not in ('/profile/start', '/profile/stop'):
+            self.send_error(404)
+            return
+        if url.path == '/profile/stop':
+            exporter.stop_profile()
+            self._send_json(200, exporter.profile_status())
+            return
+        query = parse_qs(url.query)
+        try:
+            kind = query.get('kind', ['cprofile'])[0]
+            seconds = float(query.get('seconds', ['10'])[0])
+            exporter.start_profile(kind, seconds)
+        except (ValueError, RuntimeError) as e:
+            self._send_json(409, {'error': str(e)})
+            return
+        self._send_json(200, exporter.profile_status())
+
+    def log_message(self, format, *args):
+        # sin una línea por scrape en stderr
+        logger.debug(format % args)
+
+class MetricsExporter:
+    """servidor HTTP en un hilo daemon que atiende GET /metrics (y /profile con profile_dir)"""
+    # tope de la duración de una captura pedida por HTTP
+    MAX_PROFILE_SECONDS = 300
+
+    def __init__(self, sources, host='127.0.0.1', port=DEFAULT_PORT, profile_dir=None):
+        self.sources = sources
+        self.host = host
+        self.port = port
+        self.profile_dir = profile_dir
+        self.profiler = None
+        self._httpd = None
+        self._thread = None
+
+    def start_profile(self, kind, seconds):
+        """instala los hooks en los servidores (uno compartido) e inicia una captura"""
+        if kind not in KINDS:
+            raise ValueError(f"Tipo de captura desconocido: {kind}")
+        if not 0 < seconds <= self.MAX_PROFILE_SECONDS:
+            raise ValueError(f"La duración debe estar entre 0 y {self.MAX_PROFILE_SECONDS} s")
+        if self.profiler is None:
+            self.profiler = HotPathProfiler()
+        if self.profiler.capture is not None and self.profiler.capture.active:
+            raise RuntimeError("Ya hay una captura en curso")
+        # los hooks solo cuestan mientras dura la captura: _profile_done los quita
+        for source in self.sources.values():
+            if hasattr(source, 'enable_hooks'):
+                source.enable_hooks(self.profiler)
+        suffix = '.prof' if kind == CPROFILE else '.tracemalloc'
+        path = os.path.join(self.profile_dir, f"csat-{kind}-{time.strftime('%Y%m%d-%H%M%S')}{suffix}")
+        try:
+            return self.profiler.start_capture(kind, seconds, path, on_done=self._profile_done)
+        except RuntimeError:
+            self._profile_done(None)
+            raise
+
+    def _profile_done(self, capture):
+        """se llama desde el hilo del timer al guardar la captura: quita los hooks de los servidores"""
+        for source in self.sources.values():
+            if getattr(source, 'hooks', None) is self.profiler:
+                source.disable_hooks()
+
+    def stop_profile(self):
+        return self.profiler.stop_capture() if self.profiler is not None else None
+
+    def profile_status(self):
+        """captura en curso o última terminada, y tiempos por etapa"""
+        if self.profiler is None:
+            return {'capture': None, 'stages': None}
+        capture = self.profiler.capture
+        return {
+            'capture': capture and {
+                'kind': capture.kind,
+                'seconds': capture.duration,
+                'path': capture.path,
+                'active': capture.active,
+                'messages': capture.messages,
+                'summary': capture.summary,
+            },
+            'stages': self.profiler.summary(),
+        }
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.exporter = self
+        # con port=0 el sistema elige uno libre
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='metrics-exporter', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
@@ -0,0 +1,180 @@
+"""
+Tabla de flujos por (protocolo, ip, puerto) con almacenamiento columnar.
+
+Cada estadística vive en un array preasignado y el flujo es solo un índice
+de fila, así que la memoria por flujo se mantiene constante aunque haya
+cientos de miles de clientes. El top-K recorre una columna con heapq. Los
+flujos se mantienen en orden de actividad (LRU), así que desalojar o vencer
+los más viejos no recorre la tabla.
+"""
+import collections
+import csv
+import heapq
+import socket
+import struct
+import threading
+import time
+from array import array
+
+COLUMNS = ('messages', 'bytes', 'first_seen', 'last_seen', 'rtt')
+
+# offset de tcpi_rtt (us) dentro de struct tcp_info en Linux
+_TCPI_RTT_OFFSET = 68
+
+def tcp_rtt(sock):
+    """RTT suavizado que estima el kernel para la conexión, en segundos (None si no está disponible)"""
+    if not hasattr(socket, 'TCP_INFO'):
+        return None
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 104)
+    except OSError:
+        return None
+    if len(info) < _TCPI_RTT_OFFSET + 4:
+        return None
+    (rtt_us,) = struct.unpack_from('I', info, _TCPI_RTT_OFFSET)
+    return rtt_us / 1e6
+
+class FlowTable:
+    """estadísticas por flujo en arrays columnares
+
+    Cada actualización toma el lock: expire y el desalojo reutilizan filas,
+    y una escritura sin lock podría caer en la fila de otro flujo.
+    """
+    def __init__(self, capacity=1024, max_flows=None, rtt_alpha=0.125):
+        self.max_flows = max_flows
+        self.rtt_alpha = rtt_alpha
+        # clave -> fila, del flujo con actividad más vieja al más reciente
+        self.slots = collections.OrderedDict()
+        self.keys = []
+        self._free = []
+        self._lock = threading.Lock()
+        self.messages = array('Q', bytes(8 * capacity))
+        self.bytes = array('Q', bytes(8 * capacity))
+        self.first_seen = array('d', bytes(8 * capacity))
+        self.last_seen = array('d', bytes(8 * capacity))
+        self.rtt = array('d', bytes(8 * capacity))
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _grow(self):
+        """duplica la capacidad de todas las columnas"""
+        extra = bytes(8 * len(self.messages))
+        for column in (self.messages, self.bytes, self.first_seen, self.last_seen, self.rtt):
+            column.frombytes(extra)
+
+    def _new_slot(self, key, now):
+        """fila para un flujo nuevo (con el lock tomado)"""
+        if self.max_flows and len(self.slots) >= self.max_flows:
+            self._evict_oldest()
+        if self._free:
+            slot = self._free.pop()
+            self.keys[slot] = key
+        else:
+            slot = len(self.keys)
+            if slot >= len(self.messages):
+                self._grow()
+            self.keys.append(key)
+        self.messages[slot] = 0
+        self.bytes[slot] = 0
+        self.first_seen[slot] = now
+        self.last_seen[slot] = now
+        self.rtt[slot] = 0.0
+        self.slots[key] = slot
+        return slot
+
+    def _evict_oldest(self):
+        """libera el flujo con la última actividad más antigua (con el lock tomado)"""
+        _, slot = self.slots.popitem(last=False)
+        self.keys[slot] = None
+        self._free.append(slot)
+        self.evicted += 1
+
+    def record(self, protocol, address, nbytes, now=None):
+        """suma un mensaje de nbytes al flujo (protocol, ip, puerto); devuelve la fila"""
+        if now is None:
+            now = time.time()
+        key = (protocol, address[0], address[1])
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                slot = self._new_slot(key, now)
+            else:
+                self.slots.move_to_end(key)
+            self.messages[slot] += 1
+            self.bytes[slot] += nbytes
+            self.last_seen[slot] = now
+        return slot
+
+    def update_rtt(self, protocol, address, rtt):
+        """agrega una muestra de RTT (segundos) con promedio exponencial"""
+        if rtt is None:
+            return
+        with self._lock:
+            slot = self.slots.get((protocol, address[0], address[1]))
+            if slot is None:
+                return
+            current = self.rtt[slot]
+            self.rtt[slot] = rtt if current == 0.0 else current + self.rtt_alpha * (rtt - current)
+
+    def expire(self, idle_seconds, now=None):
+        """elimina flujos sin actividad en idle_seconds; devuelve cuántos se eliminaron"""
+        if now is None:
+            now = time.time()
+        limit = now - idle_seconds
+        expired = 0
+        with self._lock:
+            # en orden de actividad: los vencidos están al principio
+            for slot in self.slots.values():
+                if self.last_seen[slot] >= limit:
+                    break
+                expired += 1
+            for _ in range(expired):
+                _, slot = self.slots.popitem(last=False)
+                self.keys[slot] = None
+                self._free.append(slot)
+        return expired
+
+    def row(self, slot):
+        protocol, ip, port = self.keys[slot]
+        return {
+            'protocol': protocol,
+            'ip': ip,
+            'port': port,
+            'messages': self.messages[slot],
+            'bytes': self.bytes[slot],
+            'first_seen': self.first_seen[slot],
+            'last_seen': self.last_seen[slot],
+            'rtt': self.rtt[slot],
+        }
+
+    def top(self, k=10, by='bytes'):
+        """los k flujos con mayor valor en la columna by, como lista de dicts"""
+        if by not in COLUMNS:
+            raise ValueError(f"Columna desconocida: {by}")
+        values = getattr(self, by)[:len(self.keys)]
+        keys = self.keys
+        if len(values) > k + len(self._free):
+            # umbral con nlargest sobre los valores crudos (comparaciones en C),
+            # pidiendo de más por si hay filas libres entre los mayores
+            threshold = heapq.nlargest(k + len(self._free), values)[-1]
+            candidates = [slot for slot, value in enumerate(values) if value >= threshold]
+        else:
+            candidates = range(len(values))
+        candidates = sorted((slot for slot in candidates if keys[slot] is not None),
+                            key=values.__getitem__, reverse=True)
+        return [self.row(slot) for slot in candidates[:k]]
+
+    def export_csv(self, path, k=None, by='bytes'):
+        """escribe los flujos (todos o el top-k) en un CSV"""
+        if k is None:
+            with self._lock:
+                rows = [self.row(slot) for slot in self.slots.values()]
+        else:
+            rows = self.top(k, by)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=('protocol', 'ip', 'port') + COLUMNS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
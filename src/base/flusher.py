@@ -0,0 +1,80 @@
+"""
+Volcado periódico de buffers de escritura en un solo hilo daemon.
+
+CaptureWriter y Recorder acumulan en memoria y escriben en bloque; sin
+este hilo un archivo en curso solo se actualizaría con el siguiente
+mensaje, así que una conexión que queda en silencio nunca llegaría al
+disco. Cada escritor se registra con su intervalo y se da de baja al
+cerrarse:
+
+    flusher.register(writer, 1.0)   # llama writer.flush() cada segundo
+    flusher.unregister(writer)
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+class PeriodicFlusher:
+    """llama flush() de cada escritor registrado cada su intervalo (referencias débiles)"""
+    def __init__(self):
+        self._cond = threading.Condition()
+        # (vencimiento, orden, id del escritor)
+        self._due = []
+        # id del escritor -> (referencia débil, intervalo)
+        self._targets = {}
+        self._sequence = itertools.count()
+        self._thread = None
+
+    def register(self, target, interval):
+        if interval <= 0:
+            raise ValueError("El intervalo de volcado debe ser positivo")
+        with self._cond:
+            key = id(target)
+            self._targets[key] = (weakref.ref(target), interval)
+            heapq.heappush(self._due, (time.monotonic() + interval, next(self._sequence), key))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='periodic-flusher', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def unregister(self, target):
+        with self._cond:
+            # la entrada del heap queda huérfana y se descarta al vencer
+            self._targets.pop(id(target), None)
+
+    def _next_due(self):
+        """espera el próximo vencimiento y devuelve los escritores a volcar"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                due = []
+                while self._due and self._due[0][0] <= now:
+                    _, _, key = heapq.heappop(self._due)
+                    entry = self._targets.get(key)
+                    if entry is None:
+                        continue
+                    target = entry[0]()
+                    if target is None:
+                        del self._targets[key]
+                        continue
+                    heapq.heappush(self._due, (now + entry[1], next(self._sequence), key))
+                    due.append(target)
+                if due:
+                    return due
+                self._cond.wait(self._due[0][0] - now if self._due else None)
+
+    def _run(self):
+        while True:
+            for target in self._next_due():
+                try:
+                    target.flush()
+                except Exception as e:
+                    logger.info(f"Error al volcar {target.__class__.__name__}: {e}")
+
+# compartido por todos los escritores del proceso
+flusher = PeriodicFlusher()
@@ -0,0 +1,139 @@
+"""
+Protocolo con framing binario: cabecera de 4 bytes (largo, big-endian) + payload.
+
+La lectura usa recv_into sobre bytearray reutilizables, así que recibir un
+mensaje no crea objetos bytes nuevos.
+"""
+import socket
+import struct
+
+HEADER = struct.Struct('!I')
+HEADER_SIZE = HEADER.size
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+class FrameError(Exception):
+    """frame inválido (largo mayor al permitido)"""
+
+class BufferPool:
+    """pool de bytearray reutilizables, se toman al abrir una conexión y se devuelven al cerrarla"""
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, max_buffers=64):
+        self.buffer_size = buffer_size
+        self.max_buffers = max_buffers
+        self._free = []
+
+    def acquire(self, min_size=0):
+        """entrega un buffer de al menos min_size bytes"""
+        size = max(min_size, self.buffer_size)
+        # list.pop es atómico con el GIL, no hace falta lock
+        try:
+            buffer = self._free.pop()
+        except IndexError:
+            return bytearray(size)
+        if len(buffer) < size:
+            self._free.append(buffer)
+            return bytearray(size)
+        return buffer
+
+    def release(self, buffer):
+        """devuelve un buffer al pool (los buffers que crecieron por frames grandes se descartan)"""
+        if len(buffer) == self.buffer_size and len(self._free) < self.max_buffers:
+            self._free.append(buffer)
+
+class FramedReader:
+    """lee frames de un socket con recv_into sobre un buffer del pool
+
+    read_frame() devuelve un memoryview que apunta al buffer interno: solo es
+    válido hasta la siguiente llamada a read_frame().
+    """
+    def __init__(self, sock, pool=None, max_frame_size=MAX_FRAME_SIZE):
+        self.sock = sock
+        self.pool = pool or BufferPool(max_buffers=1)
+        self.max_frame_size = max_frame_size
+        self._buffer = self.pool.acquire()
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+    def _ensure_capacity(self, needed):
+        """deja espacio para needed bytes desde _start, compactando o creciendo el buffer"""
+        pending = self._end - self._start
+        if self._start + needed <= len(self._buffer):
+            return
+        if needed <= len(self._buffer):
+            # compactamos: movemos lo pendiente al inicio del buffer
+            self._view[:pending] = self._view[self._start:self._end]
+        else:
+            larger = bytearray(needed)
+            larger[:pending] = self._view[self._start:self._end]
+            self._view.release()
+            self.pool.release(self._buffer)
+            self._buffer = larger
+            self._view = memoryview(larger)
+        self._start = 0
+        self._end = pending
+
+    def _fill(self, needed):
+        """recibe hasta tener needed bytes pendientes; False si el socket se cerró"""
+        self._ensure_capacity(needed)
+        while self._end - self._start < needed:
+            received = self.sock.recv_into(self._view[self._end:])
+            if not received:
+                return False
+            self._end += received
+        return True
+
+    def read_frame(self):
+        """devuelve el payload del siguiente frame o None si la conexión se cerró"""
+        if self._start == self._end:
+            # nada pendiente: reiniciamos al inicio para evitar compactar
+            self._start = self._end = 0
+        if not self._fill(HEADER_SIZE):
+            return None
+        (length,) = HEADER.unpack_from(self._buffer, self._start)
+        if length > self.max_frame_size:
+            raise FrameError(f"Frame de {length} bytes supera el máximo de {self.max_frame_size}")
+        if not self._fill(HEADER_SIZE + length):
+            return None
+        begin = self._start + HEADER_SIZE
+        self._start = begin + length
+        return self._view[begin:self._start]
+
+    def close(self):
+        """devuelve el buffer al pool"""
+        if self._buffer is not None:
+            self._view.release()
+            self.pool.release(self._buffer)
+            self._buffer = None
+
+def sendmsg_all(sock, buffers):
+    """envía todos los buffers con sendmsg (scatter-gather), reintentando envíos parciales"""
+    buffers = [memoryview(b).cast('B') for b in buffers if len(b)]
+    while buffers:
+        sent = sock.sendmsg(buffers)
+        while sent:
+            first = buffers[0]
+            if sent >= len(first):
+                sent -= len(first)
+                buffers.pop(0)
+            else:
+                buffers[0] = first[sent:]
+                sent = 0
+
+def send_frame(sock, *parts):
+    """envía un frame cuyo payload es la concatenación de parts, sin concatenarlas en memoria"""
+    length = sum(len(part) for part in parts)
+    if length > MAX_FRAME_SIZE:
+        raise FrameError(f"Frame de {length} bytes supera el máximo de {MAX_FRAME_SIZE}")
+    header = HEADER.pack(length)
+    if hasattr(socket.socket, 'sendmsg'):
+        sendmsg_all(sock, (header, *parts))
+    else:
+        sock.sendall(header)
+        for part in parts:
+            sock.sendall(part)
+
+def encode_frame(*parts):
+    """devuelve el frame completo como bytes (para transportes que no son sockets, ej. asyncio)"""
+    length = sum(len(part) for part in parts)
+    return b''.join((HEADER.pack(length), *parts))
@@ -0,0 +1,124 @@
+"""
+Histograma de latencias log-lineal (estilo HDR) con buckets fijos.
+
+Todos los histogramas tienen la misma disposición de buckets, así que se
+pueden sumar entre hilos/procesos y comparar entre corridas.
+"""
+from array import array
+
+SUB_BUCKET_BITS = 6
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# 2^36 ns ~ 68 s, cualquier latencia mayor cae en el último bucket
+MAX_SHIFT = 36 - SUB_BUCKET_BITS
+BUCKET_COUNT = (MAX_SHIFT + 2) * SUB_BUCKETS
+
+def bucket_index(value):
+    """índice del bucket para un valor en ns (error relativo < 1/64)"""
+    if value < SUB_BUCKETS:
+        return value if value > 0 else 0
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    if shift > MAX_SHIFT:
+        return BUCKET_COUNT - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+def bucket_value(index):
+    """valor representativo (punto medio) de un bucket"""
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+    return (mantissa << shift) + ((1 << shift) >> 1)
+
+class LatencyHistogram:
+    """histograma de latencias en nanosegundos, sin locks: usar uno por hilo y sumar con merge()"""
+    def __init__(self):
+        self.counts = array('q', bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value_ns):
+        """registra una latencia en ns"""
+        self.counts[bucket_index(value_ns)] += 1
+        self.count += 1
+        self.total += value_ns
+        if value_ns > self.max:
+            self.max = value_ns
+        if self.min is None or value_ns < self.min:
+            self.min = value_ns
+
+    def merge(self, other):
+        """suma otro histograma a este"""
+        counts = self.counts
+        for index, value in enumerate(other.counts):
+            if value:
+                counts[index] += value
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        return self
+
+    def since(self, previous):
+        """histograma con solo las muestras agregadas desde previous (una copia anterior)"""
+        delta = LatencyHistogram()
+        counts = delta.counts
+        top = -1
+        for index, value in enumerate(self.counts):
+            value -= previous.counts[index]
+            if value > 0:
+                counts[index] = value
+                delta.count += value
+                top = index
+        delta.total = self.total - previous.total
+        # max/min exactos no se pueden restar, usamos el bucket más alto del intervalo
+        delta.max = bucket_value(top) if top >= 0 else 0
+        return delta
+
+    def copy(self):
+        clone = LatencyHistogram()
+        return clone.merge(self)
+
+    def reset(self):
+        self.counts = array('q', bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """valor (ns) bajo el cual cae el percent % de las muestras"""
+        if not self.count:
+            return 0
+        target = max(1, int(self.count * percent / 100.0 + 0.5))
+        seen = 0
+        for index, value in enumerate(self.counts):
+            seen += value
+            if seen >= target:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def percentiles(self, percents=(50, 90, 99, 99.9)):
+        """varios percentiles en una sola pasada, como dict {percent: ns}"""
+        result = {}
+        pending = sorted(percents)
+        if not self.count:
+            return {p: 0 for p in pending}
+        targets = [(p, max(1, int(self.count * p / 100.0 + 0.5))) for p in pending]
+        seen = 0
+        position = 0
+        for index, value in enumerate(self.counts):
+            if not value:
+                continue
+            seen += value
+            while position < len(targets) and seen >= targets[position][1]:
+                result[targets[position][0]] = min(bucket_value(index), self.max)
+                position += 1
+            if position == len(targets):
+                break
+        return result
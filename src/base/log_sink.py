@@ -0,0 +1,177 @@
+"""
+Sink de logs asíncrono: el camino de red solo encola eventos estructurados y
+un hilo consumidor los formatea y entrega en lotes. LogBuffer convierte cada
+lote en una sola escritura de un panel de logs (la TUI).
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# políticas cuando la cola está llena
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+SAMPLE = 'sample'
+POLICIES = (DROP_NEWEST, DROP_OLDEST, SAMPLE)
+
+def format_timestamp(ts):
+    """mismo formato de hora que usan servidores y clientes"""
+    return datetime.fromtimestamp(ts).strftime('%H:%M:%S.%f')[:-3]
+
+class LazyText:
+    """payload en bytes que solo se decodifica si el log llega a formatearse"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return bytes(self.data).decode('utf-8', errors='replace')
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+def format_event(template, args, ts):
+    """formatea un evento; args=None indica que template ya es el mensaje final"""
+    if args is None:
+        return template
+    return template.format(*args, ts=format_timestamp(ts))
+
+class LogSink:
+    """cola acotada de eventos de log con un consumidor en segundo plano
+
+    emit() nunca bloquea: deque.append/popleft son atómicos con el GIL, así
+    que no se toma ningún lock por mensaje. Si la cola se llena se aplica
+    la política configurada:
+      - drop_newest: se descarta el evento nuevo
+      - drop_oldest: se descarta el evento más antiguo
+      - sample: sobre la marca de agua alta se conserva 1 de cada sample_every
+    """
+    def __init__(self, callback=None, batch_callback=None, max_queue=10000, batch_size=512,
+                 flush_interval=0.05, policy=DROP_NEWEST, sample_every=10):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de log no soportada: {policy}")
+        self.callback = callback
+        self.batch_callback = batch_callback
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.sample_every = sample_every
+        self._high_water = max_queue * 3 // 4
+        self._queue = deque(maxlen=max_queue) if policy == DROP_OLDEST else deque()
+        self._sample_counter = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+
+    def start(self):
+        """inicia el hilo consumidor"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="csat-log-sink", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """detiene el consumidor después de vaciar la cola"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def emit(self, template, args=None):
+        """encola un evento; el formateo (incluido {ts}) se hace en el consumidor"""
+        self.emitted += 1
+        queue = self._queue
+        if self.policy == DROP_OLDEST:
+            if len(queue) >= self.max_queue:
+                self.dropped += 1
+        elif self.policy == DROP_NEWEST:
+            if len(queue) >= self.max_queue:
+                self.dropped += 1
+                return
+        elif len(queue) >= self._high_water:
+            self._sample_counter += 1
+            if len(queue) >= self.max_queue or self._sample_counter % self.sample_every:
+                self.dropped += 1
+                return
+        queue.append((time.time(), template, args))
+
+    def pending(self):
+        return len(self._queue)
+
+    def stats(self):
+        return {
+            'emitted': self.emitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'pending': len(self._queue),
+        }
+
+    def _deliver(self, lines):
+        try:
+            if self.batch_callback:
+                self.batch_callback(lines)
+            elif self.callback:
+                for line in lines:
+                    self.callback(line)
+            else:
+                for line in lines:
+                    logger.info(line)
+        except Exception as e:
+            # un callback roto no debe matar al consumidor
+            logger.error(f"Error al entregar logs: {e}")
+        self.written += len(lines)
+
+    def flush(self):
+        """formatea y entrega todo lo encolado; devuelve la cantidad de líneas"""
+        queue = self._queue
+        total = 0
+        while queue:
+            lines = []
+            try:
+                for _ in range(self.batch_size):
+                    ts, template, args = queue.popleft()
+                    lines.append(format_event(template, args, ts))
+            except IndexError:
+                pass
+            if lines:
+                self._deliver(lines)
+                total += len(lines)
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.flush()
+            # esperar entre lotes agrupa más eventos por entrega
+            self._stop.wait(self.flush_interval)
+
+class LogBuffer:
+    """convierte cada lote de un LogSink en una sola escritura de líneas, con contadores
+
+    No encola: el sink ya acota y descarta; acá solo se cuentan las entradas
+    de cada volcado (coalesced son las escrituras que se ahorraron).
+    """
+    def __init__(self):
+        self.entries = 0
+        self.flushes = 0
+        self.coalesced = 0
+
+    def flush(self, entries):
+        """líneas para escribir de una vez (las entradas con saltos de línea se parten)"""
+        if not entries:
+            return []
+        self.entries += len(entries)
+        self.flushes += 1
+        self.coalesced += len(entries) - 1
+        lines = []
+        for entry in entries:
+            lines.extend(entry.split("\n"))
+        return lines
@@ -0,0 +1,155 @@
+"""
+Métricas de servidores y clientes: contadores e histograma de latencias.
+
+Cada hilo escribe en su propio shard (sin locks por mensaje); snapshot()
+suma los shards al momento de leer, así que muestrear una vez por segundo
+no perturba el camino de red. Los hilos de corta vida (uno por conexión)
+llaman a retire_thread() al terminar: su shard se suma a un acumulador y
+deja de recorrerse, así la memoria y el costo de leer dependen de los
+hilos vivos y no de todas las conexiones atendidas.
+"""
+import threading
+import time
+from collections import deque
+
+from src.base.histogram import LatencyHistogram
+
+# índices de los contadores dentro de cada shard
+MESSAGES, BYTES, OPENED, CLOSED, ERRORS = range(5)
+COUNTER_NAMES = ('messages', 'bytes', 'connections', 'closed', 'errors')
+
+class _Shard:
+    __slots__ = ('counts', 'latency')
+
+    def __init__(self):
+        self.counts = [0] * len(COUNTER_NAMES)
+        self.latency = LatencyHistogram()
+
+class Metrics:
+    """contadores (mensajes, bytes, conexiones, errores) e histograma de latencias"""
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        # totales de los hilos que ya terminaron
+        self._retired = _Shard()
+        # el lock se toma al registrar o retirar el shard de un hilo y al leer, nunca por mensaje
+        self._register_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard()
+            with self._register_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def message(self, nbytes, latency_ns=None):
+        """registra un mensaje procesado y, si se conoce, su latencia en ns"""
+        shard = self._shard()
+        counts = shard.counts
+        counts[MESSAGES] += 1
+        counts[BYTES] += nbytes
+        if latency_ns is not None:
+            shard.latency.record(latency_ns)
+
+    def connection_opened(self):
+        self._shard().counts[OPENED] += 1
+
+    def connection_closed(self):
+        self._shard().counts[CLOSED] += 1
+
+    def error(self):
+        self._shard().counts[ERRORS] += 1
+
+    def retire_thread(self):
+        """suma el shard del hilo actual a los totales retirados y lo suelta (al terminar el hilo)"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            return
+        del self._local.shard
+        with self._register_lock:
+            retired = self._retired
+            for index, value in enumerate(shard.counts):
+                retired.counts[index] += value
+            retired.latency.merge(shard.latency)
+            self._shards.remove(shard)
+
+    def counters(self):
+        """suma de los contadores de todos los hilos"""
+        with self._register_lock:
+            totals = list(self._retired.counts)
+            for shard in self._shards:
+                for index, value in enumerate(shard.counts):
+                    totals[index] += value
+        result = dict(zip(COUNTER_NAMES, totals))
+        result['active_connections'] = max(0, result['connections'] - result['closed'])
+        return result
+
+    def latency(self):
+        """histograma de latencias combinado de todos los hilos"""
+        merged = LatencyHistogram()
+        with self._register_lock:
+            merged.merge(self._retired.latency)
+            for shard in self._shards:
+                merged.merge(shard.latency)
+        return merged
+
+    def shard_count(self):
+        """shards de hilos vivos (los retirados no cuentan)"""
+        return len(self._shards)
+
+    def snapshot(self):
+        result = self.counters()
+        result['latency'] = self.latency()
+        return result
+
+def combine(snapshots):
+    """suma varios snapshot() (ej. servidor TCP + UDP)"""
+    total = {name: 0 for name in COUNTER_NAMES}
+    total['active_connections'] = 0
+    total['latency'] = LatencyHistogram()
+    for snapshot in snapshots:
+        for name, value in snapshot.items():
+            if name == 'latency':
+                total['latency'].merge(value)
+            else:
+                total[name] += value
+    return total
+
+class MetricsSampler:
+    """calcula tasas por intervalo a partir de snapshots sucesivos y guarda un historial"""
+    def __init__(self, source, history=60):
+        # source: callable que devuelve una lista de Metrics a sumar
+        self.source = source
+        self.msgs_per_sec = deque(maxlen=history)
+        self.bytes_per_sec = deque(maxlen=history)
+        self.p99_us = deque(maxlen=history)
+        self.last = None
+        self._previous = None
+        self._previous_time = None
+
+    def sample(self):
+        """toma un snapshot y agrega un punto al historial; devuelve las tasas del intervalo"""
+        now = time.monotonic()
+        current = combine(metrics.snapshot() for metrics in self.source())
+        if self._previous is None:
+            self._previous, self._previous_time = current, now
+            return None
+        elapsed = max(now - self._previous_time, 1e-6)
+        messages = max(0, current['messages'] - self._previous['messages'])
+        nbytes = max(0, current['bytes'] - self._previous['bytes'])
+        window = current['latency'].since(self._previous['latency'])
+        self.last = {
+            'msgs_per_sec': messages / elapsed,
+            'bytes_per_sec': nbytes / elapsed,
+            'p99_us': window.percentile(99) / 1000,
+            'active_connections': current['active_connections'],
+            'errors': current['errors'],
+        }
+        self.msgs_per_sec.append(self.last['msgs_per_sec'])
+        self.bytes_per_sec.append(self.last['bytes_per_sec'])
+        self.p99_us.append(self.last['p99_us'])
+        self._previous, self._previous_time = current, now
+        return self.last
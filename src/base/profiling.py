@@ -0,0 +1,225 @@
+"""
+Puntos de medición del camino caliente y capturas de cProfile/tracemalloc bajo demanda.
+
+Los servidores llaman a server.hooks en cada mensaje, solo si hay uno
+instalado (sin hooks el costo es un `is not None` por punto):
+
+    mark = hooks.begin()                 # llegó el mensaje
+    mark = hooks.lap(RECV, mark)         # captura, flujos, rate limit, grabación
+    mark = hooks.lap(LOG, mark)          # _emit de los logs
+    mark = hooks.lap(PROCESS, mark)      # decodificar / armar la respuesta
+    hooks.end(RESPOND, mark)             # send de la confirmación
+
+La espera bloqueada en recv no se mide: las etapas empiezan cuando el
+socket ya entregó el mensaje. Los tiempos van a histogramas por hilo (como
+Metrics) que se suman al pedir el resumen.
+
+En Python 3.11 cProfile solo perfila el hilo que lo activa, así que la
+captura activa un perfilador por hilo entre begin() y end() de cada mensaje
+y al terminar los combina en un solo archivo .prof (pstats/snakeviz).
+"""
+import io
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import cProfile
+
+from src.base.histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+RECV, PROCESS, RESPOND, LOG = range(4)
+STAGES = ('recv', 'process', 'respond', 'log')
+CPROFILE = 'cprofile'
+TRACEMALLOC = 'tracemalloc'
+KINDS = (CPROFILE, TRACEMALLOC)
+# margen para que los mensajes en curso desactiven su perfilador antes de combinar
+GRACE = 0.1
+
+class ProfileCapture:
+    """captura acotada en el tiempo (cProfile o tracemalloc) que se guarda en path al terminar"""
+    def __init__(self, kind=CPROFILE, duration=10.0, path=None, top=15, on_done=None):
+        if kind not in KINDS:
+            raise ValueError(f"Tipo de captura desconocido: {kind}")
+        self.kind = kind
+        self.duration = duration
+        suffix = '.prof' if kind == CPROFILE else '.tracemalloc'
+        self.path = path or os.path.join(tempfile.gettempdir(), f"csat-{kind}-{int(time.time())}{suffix}")
+        self.top = top
+        self.on_done = on_done
+        self.active = False
+        self.done = threading.Event()
+        self.summary = None
+        self.messages = 0
+        self._local = threading.local()
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def start(self):
+        if self.kind == TRACEMALLOC:
+            if tracemalloc.is_tracing():
+                raise RuntimeError("tracemalloc ya está activo")
+            tracemalloc.start(25)
+        self.active = True
+        self._timer = threading.Timer(self.duration, self.stop)
+        self._timer.daemon = True
+        self._timer.start()
+        return self
+
+    def enter(self):
+        """inicio de un mensaje en el hilo actual (hook begin)"""
+        if not self.active:
+            return
+        self.messages += 1
+        if self.kind != CPROFILE:
+            return
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        profile.enable()
+        self._local.enabled = True
+
+    def exit(self):
+        """fin de un mensaje en el hilo actual (hook end)"""
+        if getattr(self._local, 'enabled', False):
+            self._local.profile.disable()
+            self._local.enabled = False
+            if not self.active:
+                # si stop() ya combinó este perfilador desde otro hilo, disable() no
+                # alcanza a quitar el hook de este hilo
+                sys.setprofile(None)
+
+    def stop(self):
+        """termina la captura (al vencer duration o antes), guarda el archivo y arma el resumen"""
+        with self._lock:
+            if not self.active:
+                return self.summary
+            self.active = False
+        if self._timer is not None:
+            self._timer.cancel()
+        try:
+            if self.kind == CPROFILE:
+                time.sleep(GRACE)
+                self.summary = self._dump_cprofile()
+            else:
+                self.summary = self._dump_tracemalloc()
+        except Exception as e:
+            self.summary = f"Error al guardar la captura: {e}"
+            logger.info(self.summary)
+        self.done.set()
+        if self.on_done is not None:
+            self.on_done(self)
+        return self.summary
+
+    def _dump_cprofile(self):
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return f"Captura cProfile sin mensajes en {self.duration:g} s"
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(self.path)
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats('cumulative').print_stats(self.top)
+        return f"cProfile: {self.messages} mensajes, {len(profiles)} hilos, guardado en {self.path}\n{output.getvalue()}"
+
+    def _dump_tracemalloc(self):
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        snapshot.dump(self.path)
+        lines = [f"tracemalloc: {self.messages} mensajes, guardado en {self.path}"]
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            lines.append(str(stat))
+        return "\n".join(lines)
+
+class HotPathProfiler:
+    """hooks del camino caliente: tiempos por etapa en histogramas por hilo y captura opcional"""
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._register_lock = threading.Lock()
+        # ProfileCapture en curso; begin/end le avisan el inicio y fin de cada mensaje
+        self.capture = None
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [LatencyHistogram() for _ in STAGES]
+            with self._register_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def begin(self):
+        capture = self.capture
+        if capture is not None:
+            capture.enter()
+        return time.perf_counter_ns()
+
+    def lap(self, stage, since):
+        now = time.perf_counter_ns()
+        self._shard()[stage].record(now - since)
+        return now
+
+    def end(self, stage, since):
+        self.lap(stage, since)
+        capture = self.capture
+        if capture is not None:
+            capture.exit()
+
+    def start_capture(self, kind=CPROFILE, duration=10.0, path=None, on_done=None):
+        """inicia una captura (reemplaza a la anterior si ya terminó)
+
+        La captura terminada queda enganchada pero inactiva, así los mensajes
+        que estaban en curso igual pasan por exit() y desactivan su perfilador.
+        """
+        if self.capture is not None and self.capture.active:
+            raise RuntimeError("Ya hay una captura en curso")
+        self.capture = ProfileCapture(kind, duration, path, on_done=on_done).start()
+        return self.capture
+
+    def stop_capture(self):
+        """termina antes de tiempo la captura en curso; devuelve su resumen"""
+        capture = self.capture
+        return capture.stop() if capture is not None else None
+
+    def stages(self):
+        """histograma combinado de cada etapa: {nombre: LatencyHistogram}"""
+        merged = {name: LatencyHistogram() for name in STAGES}
+        for shard in list(self._shards):
+            for name, histogram in zip(STAGES, shard):
+                merged[name].merge(histogram)
+        return merged
+
+    def summary(self):
+        """resumen por etapa en microsegundos"""
+        result = {}
+        for name, histogram in self.stages().items():
+            percentiles = histogram.percentiles((50, 99))
+            result[name] = {
+                'count': histogram.count,
+                'mean_us': histogram.mean() / 1000,
+                'p50_us': percentiles[50] / 1000,
+                'p99_us': percentiles[99] / 1000,
+                'max_us': histogram.max / 1000,
+            }
+        return result
+
+def format_stages(summary):
+    """líneas legibles de HotPathProfiler.summary()"""
+    return [
+        f"{name}: {stage['count']} mensajes, media {stage['mean_us']:.1f} us, "
+        f"p50 {stage['p50_us']:.1f} us, p99 {stage['p99_us']:.1f} us, máx {stage['max_us']:.1f} us"
+        for name, stage in summary.items()
+    ]
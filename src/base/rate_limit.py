@@ -0,0 +1,217 @@
+"""
+Límites de tasa con token buckets por IP de origen y globales.
+
+Cada IP tiene un bucket de mensajes/s y otro de bytes/s (con ráfaga de
+burst segundos), y opcionalmente hay un par global que comparten todos.
+Cuando un cliente supera su límite se aplica una acción:
+  - drop: el mensaje se descarta sin respuesta
+  - delay: el mensaje se procesa cuando alcancen los tokens (solo se demora
+    ese cliente; si la espera supera max_delay se descarta)
+  - slow_down: se responde "Reduce la velocidad" en vez de la confirmación
+
+El estado por IP son cuatro campos en un objeto con __slots__ y los
+buckets están repartidos en franjas por hash de la IP, cada una con su
+dict y su lock, así que clientes distintos casi nunca comparten lock.
+Como mucho hay max_clients buckets propios: las IPs que llegan con la
+tabla llena (y nada que olvidar) comparten un bucket de reserva.
+"""
+import threading
+import time
+
+DROP = 'drop'
+DELAY = 'delay'
+SLOW_DOWN = 'slow_down'
+ACTIONS = (DROP, DELAY, SLOW_DOWN)
+# índices de los contadores de cada franja: permitidos y luego uno por acción
+ALLOWED = 0
+ACTION_INDEX = {action: index + 1 for index, action in enumerate(ACTIONS)}
+SLOW_DOWN_PREFIX = b"Reduce la velocidad: "
+LOCK_STRIPES = 64
+
+def slow_down_reply(wait):
+    """respuesta para un cliente limitado, con la espera sugerida en ms"""
+    return SLOW_DOWN_PREFIX + f"reintentar en {max(1, round(wait * 1000))} ms".encode()
+
+class _Bucket:
+    __slots__ = ('messages', 'bytes', 'stamp', 'throttled')
+
+    def __init__(self, messages, nbytes, stamp):
+        self.messages = messages
+        self.bytes = nbytes
+        self.stamp = stamp
+        self.throttled = 0
+
+class _Limits:
+    """tasas y capacidades de un par de buckets (None = sin límite)"""
+    __slots__ = ('msg_rate', 'byte_rate', 'msg_capacity', 'byte_capacity', 'enabled')
+
+    def __init__(self, msg_rate, byte_rate, burst):
+        self.msg_rate = msg_rate
+        self.byte_rate = byte_rate
+        self.msg_capacity = max(1.0, msg_rate * burst) if msg_rate else 0.0
+        self.byte_capacity = byte_rate * burst if byte_rate else 0.0
+        self.enabled = bool(msg_rate or byte_rate)
+
+    def new_bucket(self, now):
+        return _Bucket(self.msg_capacity, self.byte_capacity, now)
+
+    def wait(self, bucket, nbytes, now):
+        """recarga el bucket y devuelve cuánto falta (s) para poder enviar nbytes"""
+        elapsed = now - bucket.stamp
+        bucket.stamp = now
+        wait = 0.0
+        if self.msg_rate:
+            bucket.messages = min(self.msg_capacity, bucket.messages + elapsed * self.msg_rate)
+            if bucket.messages < 1.0:
+                wait = (1.0 - bucket.messages) / self.msg_rate
+        if self.byte_rate:
+            bucket.bytes = min(self.byte_capacity, bucket.bytes + elapsed * self.byte_rate)
+            # un mensaje más grande que la ráfaga pasa con el bucket lleno
+            needed = min(nbytes, self.byte_capacity)
+            if bucket.bytes < needed:
+                wait = max(wait, (needed - bucket.bytes) / self.byte_rate)
+        return wait
+
+    def consume(self, bucket, nbytes):
+        # con delay el saldo puede quedar negativo: es el turno reservado del cliente
+        bucket.messages -= 1.0
+        bucket.bytes -= min(nbytes, self.byte_capacity)
+
+    def idle(self, bucket, now):
+        """True si el bucket ya se habría recargado por completo (se puede olvidar)"""
+        elapsed = now - bucket.stamp
+        if self.msg_rate and bucket.messages + elapsed * self.msg_rate < self.msg_capacity:
+            return False
+        if self.byte_rate and bucket.bytes + elapsed * self.byte_rate < self.byte_capacity:
+            return False
+        return True
+
+class RateLimiter:
+    """límites por IP y globales de mensajes/s y bytes/s con una acción para los excesos"""
+    def __init__(self, messages_per_ip=None, bytes_per_ip=None, messages_global=None, bytes_global=None,
+                 burst=1.0, action=DROP, max_delay=1.0, max_clients=65536):
+        if action not in ACTIONS:
+            raise ValueError(f"Acción de límite desconocida: {action}")
+        self.action = action
+        self.max_delay = max_delay
+        self.max_clients = max_clients
+        self.per_ip = _Limits(messages_per_ip, bytes_per_ip, burst)
+        self.total = _Limits(messages_global, bytes_global, burst)
+        # un dict por franja, que solo se toca con el lock de esa franja
+        self._buckets = [{} for _ in range(LOCK_STRIPES)]
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._global_lock = threading.Lock()
+        now = time.monotonic()
+        self._global = self.total.new_bucket(now)
+        # buckets propios (total de las franjas) y el de reserva para cuando llegan a max_clients
+        self._clients = 0
+        self._clients_lock = threading.Lock()
+        self._overflow = self.per_ip.new_bucket(now)
+        self._overflow_lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+        # contadores por franja (se actualizan bajo el lock de la franja y se suman en stats)
+        self._counts = [[0] * (len(ACTIONS) + 1) for _ in range(LOCK_STRIPES)]
+
+    def _bucket(self, stripe, ip, now):
+        """bucket de ip (con el lock de su franja tomado); el de reserva si no hay lugar"""
+        buckets = self._buckets[stripe]
+        bucket = buckets.get(ip)
+        if bucket is None:
+            if self._clients >= self.max_clients:
+                self._sweep(now, stripe)
+            with self._clients_lock:
+                if self._clients >= self.max_clients:
+                    return self._overflow
+                self._clients += 1
+            bucket = buckets[ip] = self.per_ip.new_bucket(now)
+        return bucket
+
+    def _sweep(self, now, held):
+        """olvida los buckets llenos (clientes inactivos) para acotar la memoria
+
+        Cada franja se barre con su propio lock; held es la del llamador, que
+        ya lo tiene. Solo un hilo barre a la vez y los demás nunca esperan el
+        lock de otra franja, así que el orden de los locks no puede trabarse.
+        """
+        # como mucho un barrido por segundo aunque todos los clientes sigan activos
+        if now - self._last_sweep < 1.0 or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            for stripe, buckets in enumerate(self._buckets):
+                if stripe == held:
+                    self._sweep_stripe(buckets, now)
+                else:
+                    with self._locks[stripe]:
+                        self._sweep_stripe(buckets, now)
+        finally:
+            self._sweep_lock.release()
+
+    def _sweep_stripe(self, buckets, now):
+        idle = [ip for ip, bucket in buckets.items() if self.per_ip.idle(bucket, now)]
+        for ip in idle:
+            del buckets[ip]
+        if idle:
+            with self._clients_lock:
+                self._clients -= len(idle)
+
+    def check(self, ip, nbytes):
+        """decide un mensaje de ip: (None, 0) si pasa, o (acción, espera en s) si excede el límite
+
+        Con delay los tokens se reservan y el llamador debe esperar antes de
+        procesar; si la espera supera max_delay la acción pasa a ser drop.
+        """
+        now = time.monotonic()
+        stripe = hash(ip) % LOCK_STRIPES
+        with self._locks[stripe]:
+            bucket = self._bucket(stripe, ip, now) if self.per_ip.enabled else None
+            if bucket is self._overflow:
+                with self._overflow_lock:
+                    return self._decide(bucket, nbytes, now, stripe)
+            return self._decide(bucket, nbytes, now, stripe)
+
+    def _decide(self, bucket, nbytes, now, stripe):
+        """cuerpo de check, con los locks del bucket tomados"""
+        per_ip, total = self.per_ip, self.total
+        counts = self._counts[stripe]
+        wait = per_ip.wait(bucket, nbytes, now) if bucket is not None else 0.0
+        if total.enabled:
+            with self._global_lock:
+                wait = max(wait, total.wait(self._global, nbytes, now))
+                if wait <= 0.0 or (self.action == DELAY and wait <= self.max_delay):
+                    total.consume(self._global, nbytes)
+        if wait <= 0.0:
+            if bucket is not None:
+                per_ip.consume(bucket, nbytes)
+            counts[ALLOWED] += 1
+            return None, 0.0
+        action = self.action
+        if action == DELAY:
+            if wait <= self.max_delay:
+                if bucket is not None:
+                    per_ip.consume(bucket, nbytes)
+            else:
+                action = DROP
+        if bucket is not None:
+            bucket.throttled += 1
+        counts[ACTION_INDEX[action]] += 1
+        return action, wait
+
+    def stats(self):
+        totals = [sum(column) for column in zip(*self._counts)]
+        return {
+            'clients': self._clients,
+            'allowed': totals[ALLOWED],
+            'throttled': sum(totals[1:]),
+            'dropped': totals[ACTION_INDEX[DROP]],
+            'delayed': totals[ACTION_INDEX[DELAY]],
+            'slowed': totals[ACTION_INDEX[SLOW_DOWN]],
+        }
+
+    def top_throttled(self, count=10):
+        """IPs con más mensajes limitados: [(ip, mensajes), ...]"""
+        throttled = [(ip, bucket.throttled) for buckets in self._buckets
+                     for ip, bucket in list(buckets.items()) if bucket.throttled]
+        throttled.sort(key=lambda item: item[1], reverse=True)
+        return throttled[:count]
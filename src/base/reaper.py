@@ -0,0 +1,197 @@
+"""
+Cierre de conexiones inactivas o con tiempo de vida vencido.
+
+Los plazos se guardan en una rueda de temporizadores con hash: cada tick
+solo revisa la ranura que le toca, así que el costo por tick no depende del
+total de conexiones. Recibir un mensaje solo actualiza un timestamp; el
+plazo de inactividad se recalcula recién cuando vence la entrada en la
+rueda, sin reprogramar nada por mensaje.
+"""
+import logging
+import math
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IDLE = 'inactividad'
+LIFETIME = 'tiempo de vida'
+SHUTDOWN = 'detención del servidor'
+
+def set_keepalive(sock, idle=None, interval=None, count=None):
+    """activa TCP keepalive y, si el sistema lo permite, ajusta sus tiempos (segundos)"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+        if value is not None and hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), int(value))
+
+class TimerWheel:
+    """rueda de temporizadores con hash: schedule O(1), advance revisa solo las ranuras vencidas
+
+    Las entradas con plazo más lejano que una vuelta completa quedan en su
+    ranura hasta la vuelta que corresponda.
+    """
+    def __init__(self, tick=0.1, slots=512, now=None):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self._current = int((time.monotonic() if now is None else now) / tick)
+        self.size = 0
+
+    def schedule(self, deadline, item):
+        # redondeo hacia arriba: al procesar la ranura el plazo ya venció;
+        # nunca en una ranura ya procesada, como mínimo la del próximo tick
+        index = max(math.ceil(deadline / self.tick), self._current + 1)
+        self.slots[index % len(self.slots)].append((deadline, item))
+        self.size += 1
+
+    def advance(self, now):
+        """devuelve los items con plazo <= now, avanzando la rueda hasta now"""
+        expired = []
+        target = int(now / self.tick)
+        # si pasó más de una vuelta alcanza con recorrer cada ranura una vez
+        start = max(self._current + 1, target - len(self.slots) + 1)
+        for index in range(start, target + 1):
+            slot = self.slots[index % len(self.slots)]
+            if not slot:
+                continue
+            pending = []
+            for entry in slot:
+                if entry[0] <= now:
+                    expired.append(entry[1])
+                else:
+                    pending.append(entry)
+            slot[:] = pending
+        self._current = max(self._current, target)
+        self.size -= len(expired)
+        return expired
+
+class Tracked:
+    """conexión vigilada: el handler llama touch() cada vez que recibe datos"""
+    __slots__ = ('sock', 'address', 'opened', 'last_activity', 'closed', 'reason')
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.opened = self.last_activity = time.monotonic()
+        self.closed = False
+        self.reason = None
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+class ConnectionReaper:
+    """cierra conexiones inactivas (idle_timeout) o demasiado largas (max_lifetime)
+
+    Sin plazos configurados igual lleva la lista de conexiones vivas, para
+    que reap_all() pueda cerrarlas al detener el servidor.
+    """
+    def __init__(self, idle_timeout=None, max_lifetime=None, tick=0.1, on_reap=None):
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.tick = tick
+        self.on_reap = on_reap
+        self.wheel = TimerWheel(tick)
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.reaped = {IDLE: 0, LIFETIME: 0, SHUTDOWN: 0}
+
+    @property
+    def enabled(self):
+        return bool(self.idle_timeout or self.max_lifetime)
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='reaper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _deadline(self, tracked):
+        """próximo plazo de la conexión y el motivo si vence ahí"""
+        deadline, reason = None, None
+        if self.idle_timeout:
+            deadline, reason = tracked.last_activity + self.idle_timeout, IDLE
+        if self.max_lifetime:
+            lifetime = tracked.opened + self.max_lifetime
+            if deadline is None or lifetime < deadline:
+                deadline, reason = lifetime, LIFETIME
+        return deadline, reason
+
+    def register(self, sock, address):
+        tracked = Tracked(sock, address)
+        with self._lock:
+            self.connections.add(tracked)
+            if self.enabled:
+                self.wheel.schedule(self._deadline(tracked)[0], tracked)
+        return tracked
+
+    def unregister(self, tracked):
+        # la entrada en la rueda se descarta cuando vence (cancelación perezosa)
+        tracked.closed = True
+        with self._lock:
+            self.connections.discard(tracked)
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            self.check()
+
+    def check(self, now=None):
+        """procesa los plazos vencidos; devuelve cuántas conexiones se cerraron"""
+        if now is None:
+            now = time.monotonic()
+        victims = []
+        with self._lock:
+            for tracked in self.wheel.advance(now):
+                if tracked.closed:
+                    continue
+                deadline, reason = self._deadline(tracked)
+                if deadline <= now:
+                    victims.append((tracked, reason))
+                else:
+                    # hubo actividad desde que se programó: se reprograma al nuevo plazo
+                    self.wheel.schedule(deadline, tracked)
+        for tracked, reason in victims:
+            self._reap(tracked, reason)
+        return len(victims)
+
+    def _reap(self, tracked, reason):
+        """despierta al handler bloqueado en recv cerrando el socket en ambos sentidos"""
+        if tracked.closed or tracked.reason is not None:
+            return
+        tracked.reason = reason
+        self.reaped[reason] += 1
+        try:
+            tracked.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        if self.on_reap:
+            try:
+                self.on_reap(tracked.address, reason)
+            except Exception as e:
+                logger.info(f"Error al notificar conexión cerrada: {e}")
+
+    def reap_all(self):
+        """cierra todas las conexiones vivas (al detener el servidor)"""
+        with self._lock:
+            alive = list(self.connections)
+        for tracked in alive:
+            self._reap(tracked, SHUTDOWN)
+        return len(alive)
+
+    def stats(self):
+        return {
+            'tracked': len(self.connections),
+            'reaped': sum(self.reaped.values()),
+            'reaped_idle': self.reaped[IDLE],
+            'reaped_lifetime': self.reaped[LIFETIME],
+            'reaped_shutdown': self.reaped[SHUTDOWN],
+        }
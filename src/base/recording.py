@@ -0,0 +1,143 @@
+"""
+Grabación de los mensajes de los clientes en un formato binario compacto.
+
+Cabecera del archivo: magic + hora de pared del inicio (ns). Cada registro:
+timestamp monotónico relativo al inicio (ns), id de sesión, protocolo, tipo
+(mensaje o cierre de sesión), largo y payload. Una sesión es una conexión
+TCP o una dirección UDP (que se cierra tras udp_idle_timeout segundos sin
+mensajes, como las sesiones de src/reliable_udp.py); src/replay.py las vuelve a reproducir respetando
+los tiempos entre mensajes.
+"""
+import struct
+import threading
+import time
+
+from src.base.flusher import flusher
+
+MAGIC = b'CSATREC1'
+FILE_HEADER = struct.Struct('<8sQ')
+# ts relativo (ns), sesión, protocolo, tipo, largo
+RECORD = struct.Struct('<QIBBI')
+PROTOCOLS = {'tcp': 0, 'udp': 1}
+PROTOCOL_NAMES = {value: name for name, value in PROTOCOLS.items()}
+MESSAGE = 0
+CLOSE = 1
+
+class Recorder:
+    """graba mensajes por sesión con buffer de escritura en bloque (seguro entre hilos)
+
+    El buffer se escribe al llenarse o cada flush_interval segundos (desde
+    el hilo compartido de src/base/flusher.py, aunque no lleguen más
+    mensajes), así que una grabación en curso se lee con un atraso acotado.
+    """
+    def __init__(self, path, buffer_size=1024 * 1024, flush_interval=1.0, udp_idle_timeout=60.0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._udp_idle_ns = int(udp_idle_timeout * 1e9)
+        self._file = open(path, 'wb')
+        self._origin = time.monotonic_ns()
+        self._file.write(FILE_HEADER.pack(MAGIC, time.time_ns()))
+        self._file.flush()
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        # (protocolo, dirección) -> id de sesión; las UDP guardan su último mensaje en _udp_seen
+        self._sessions = {}
+        self._udp_seen = {}
+        self._last_sweep = 0
+        self._next_session = 0
+        self.messages = 0
+        flusher.register(self, flush_interval)
+
+    def _session(self, key, ts):
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = self._next_session
+            self._next_session += 1
+        if key[0] == 'udp':
+            self._udp_seen[key] = ts
+        return session
+
+    def _sweep_udp_locked(self, ts):
+        """cierra las sesiones UDP inactivas (como mucho una pasada por segundo)"""
+        if ts - self._last_sweep < min(self._udp_idle_ns, 1_000_000_000):
+            return
+        self._last_sweep = ts
+        limit = ts - self._udp_idle_ns
+        for key in [key for key, seen in self._udp_seen.items() if seen < limit]:
+            del self._udp_seen[key]
+            self._buffer += RECORD.pack(ts, self._sessions.pop(key), PROTOCOLS['udp'], CLOSE, 0)
+
+    def record(self, protocol, address, payload):
+        """graba un mensaje del cliente address"""
+        ts = time.monotonic_ns() - self._origin
+        with self._lock:
+            self._sweep_udp_locked(ts)
+            session = self._session((protocol, address), ts)
+            buffer = self._buffer
+            buffer += RECORD.pack(ts, session, PROTOCOLS[protocol], MESSAGE, len(payload))
+            buffer += payload
+            self.messages += 1
+            if len(buffer) >= self.buffer_size:
+                self._flush_locked()
+
+    def close_session(self, protocol, address):
+        """marca el fin de la sesión (conexión TCP cerrada); la dirección puede reutilizarse después"""
+        ts = time.monotonic_ns() - self._origin
+        with self._lock:
+            session = self._sessions.pop((protocol, address), None)
+            self._udp_seen.pop((protocol, address), None)
+            if session is not None:
+                self._buffer += RECORD.pack(ts, session, PROTOCOLS[protocol], CLOSE, 0)
+
+    def _flush_locked(self):
+        if self._buffer and not self._file.closed:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self._buffer = bytearray()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        flusher.unregister(self)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_locked()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_records(path):
+    """itera (ts_ns, sesión, protocolo, tipo, payload) de una grabación"""
+    with open(path, 'rb') as f:
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size or FILE_HEADER.unpack(header)[0] != MAGIC:
+            raise ValueError(f"{path} no es una grabación de CSAT")
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                # registro truncado al final (grabación en curso)
+                return
+            ts, session, protocol, kind, length = RECORD.unpack(head)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield ts, session, PROTOCOL_NAMES[protocol], kind, payload
+
+def load_sessions(path):
+    """agrupa una grabación por sesión: {sesión: (protocolo, [(ts_ns, payload), ...])}"""
+    sessions = {}
+    for ts, session, protocol, kind, payload in read_records(path):
+        if kind != MESSAGE:
+            continue
+        entry = sessions.get(session)
+        if entry is None:
+            entry = sessions[session] = (protocol, [])
+        entry[1].append((ts, payload))
+    return sessions
@@ -0,0 +1,167 @@
+"""
+Pool fijo de hilos con control de admisión para atender conexiones.
+
+En lugar de un hilo nuevo por conexión, un número fijo de workers toma las
+conexiones de una cola acotada. Cuando todos los workers están ocupados se
+aplica la política de sobrecarga, así que una avalancha de conexiones
+degrada el servicio (rechazos, colas con plazo) en vez de agotar el proceso.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# políticas cuando no hay workers libres
+QUEUE = 'queue'
+REJECT = 'reject'
+SHED_OLDEST = 'shed_oldest'
+POLICIES = (QUEUE, REJECT, SHED_OLDEST)
+
+class WorkerPool:
+    """workers fijos que ejecutan handler(*args) con control de admisión
+
+    Políticas con todos los workers ocupados:
+      - queue: se encola hasta max_queue; lo que espera más de queue_timeout
+        se rechaza en el próximo submit (el aceptador vence el frente de la
+        cola) o al salir de ella, lo que ocurra primero
+      - reject: se rechaza de inmediato (sin cola)
+      - shed_oldest: con la cola llena se descarta la conexión que más esperó
+    reject(*args, reason) se llama fuera del lock para cerrar lo descartado.
+    """
+    def __init__(self, handler, workers=32, max_queue=128, policy=QUEUE, queue_timeout=1.0, reject=None,
+                 name='worker'):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de sobrecarga no soportada: {policy}")
+        if workers < 1:
+            raise ValueError("El pool necesita al menos un worker")
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = 0 if policy == REJECT else max_queue
+        self.policy = policy
+        self.queue_timeout = queue_timeout
+        self.reject = reject
+        self.name = name
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self.running = False
+        self.active = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.shed = 0
+        self.expired = 0
+
+    def start(self):
+        with self._cond:
+            if self.running:
+                return
+            self.running = True
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, *args):
+        """entrega una tarea al pool; devuelve False si fue rechazada"""
+        dropped = None
+        with self._cond:
+            # lo vencido libera su lugar antes de decidir si hay capacidad
+            expired = self._expire_queued(time.monotonic())
+            if not self.running:
+                reason = "pool detenido"
+            elif self.active + len(self._pending) < self.workers + self.max_queue:
+                # hay un worker libre o lugar en la cola
+                reason = None
+            elif self.policy == SHED_OLDEST and self._pending:
+                _, dropped = self._pending.popleft()
+                self.shed += 1
+                reason = None
+            else:
+                reason = "sin workers libres" if self.policy == REJECT else "cola llena"
+            if reason is None:
+                self._pending.append((time.monotonic(), args))
+                self.accepted += 1
+                self._cond.notify()
+            else:
+                self.rejected += 1
+        for stale in expired:
+            self._reject(stale, "plazo de espera en cola vencido")
+        if dropped is not None:
+            self._reject(dropped, "descartada por sobrecarga")
+        if reason is not None:
+            self._reject(args, reason)
+            return False
+        return True
+
+    def _expire_queued(self, now):
+        """saca del frente de la cola lo que superó queue_timeout (con el lock tomado)"""
+        expired = []
+        if self.queue_timeout is None:
+            return expired
+        limit = now - self.queue_timeout
+        pending = self._pending
+        # la cola está en orden de llegada: lo vencido está al frente
+        while pending and pending[0][0] < limit:
+            expired.append(pending.popleft()[1])
+        self.expired += len(expired)
+        return expired
+
+    def _reject(self, args, reason):
+        if self.reject is None:
+            return
+        try:
+            self.reject(*args, reason)
+        except Exception as e:
+            logger.info(f"Error al rechazar tarea: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self.running and not self._pending:
+                    self._cond.wait()
+                if not self.running:
+                    return
+                queued_at, args = self._pending.popleft()
+                self.active += 1
+            try:
+                if self.queue_timeout is not None and time.monotonic() - queued_at > self.queue_timeout:
+                    with self._cond:
+                        self.expired += 1
+                    self._reject(args, "plazo de espera en cola vencido")
+                else:
+                    self.handler(*args)
+            except Exception as e:
+                logger.info(f"Error en worker del pool: {e}")
+            finally:
+                with self._cond:
+                    self.active -= 1
+
+    def stats(self):
+        """contadores del pool: workers activos, en cola y rechazos acumulados"""
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'active': self.active,
+                'queued': len(self._pending),
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'shed': self.shed,
+                'expired': self.expired,
+            }
+
+    def shutdown(self, timeout=None):
+        """detiene los workers y rechaza lo que sigue en cola; espera hasta timeout a los ocupados"""
+        with self._cond:
+            self.running = False
+            pending = list(self._pending)
+            self._pending.clear()
+            self._cond.notify_all()
+        for _, args in pending:
+            self._reject(args, "servidor detenido")
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+            for thread in self._threads:
+                thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
@@ -0,0 +1,385 @@
+"""
+Generador de carga y benchmark para los caminos de eco TCP/UDP.
+
+Levanta un servidor local (o apunta a uno existente) y lo carga con N
+conexiones concurrentes, en lazo cerrado (cada conexión espera su
+confirmación) o lazo abierto (tasa fija, la latencia se mide desde el
+instante programado para no ocultar colas). Reporta throughput y
+percentiles p50/p90/p99/p99.9 en texto o JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.base.acks import PlainAckMatcher
+from src.base.framing import FramedReader, send_frame
+from src.base.histogram import LatencyHistogram
+from src.server import ACK_PREFIX
+
+SCHEMA_VERSION = 1
+# el servidor sin framing lee con recv(1024)
+PLAIN_MAX_MESSAGE_SIZE = 1024
+PERCENTILES = (50, 90, 99, 99.9)
+# claves de config que no cambian lo que se mide: dos corridas con el resto igual son comparables
+NOT_COMPARED = ('host', 'port', 'timeout')
+
+def free_port(protocol='tcp', host='localhost'):
+    """pide al sistema un puerto libre para el servidor local"""
+    kind = socket.SOCK_STREAM if protocol == 'tcp' else socket.SOCK_DGRAM
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+def start_local_server(protocol, engine, host, port, framed=False):
+    """inicia un servidor sin logs en un hilo daemon y espera a que esté escuchando"""
+    def quiet(message):
+        pass
+
+    if engine == 'async':
+        from src.async_server import AsyncTCPServer, AsyncUDPServer
+        if protocol == 'tcp':
+            server = AsyncTCPServer(host, port, quiet, framed=framed)
+        else:
+            server = AsyncUDPServer(host, port, quiet)
+    else:
+        from src.server import TCPServer, UDPServer
+        if protocol == 'tcp':
+            server = TCPServer(host, port, quiet, backlog=1024, framed=framed)
+        else:
+            server = UDPServer(host, port, quiet)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    if not server.ready.wait(5.0):
+        raise RuntimeError(f"El servidor {protocol.upper()} no inició en {host}:{port}")
+    return server, thread
+
+def _start_scraper(server, protocol, host, interval, stop_at):
+    """exporter HTTP del servidor local y un hilo que lo lee cada interval segundos"""
+    from urllib.request import urlopen
+    from src.base.exporter import MetricsExporter
+
+    exporter = MetricsExporter({protocol: server}, host, 0).start()
+    scrapes = [0]
+
+    def scrape():
+        while time.perf_counter() < stop_at:
+            with urlopen(exporter.url, timeout=5.0) as response:
+                response.read()
+            scrapes[0] += 1
+            time.sleep(interval)
+
+    threading.Thread(target=scrape, name='bench-scraper', daemon=True).start()
+    return exporter, scrapes
+
+class _Worker:
+    """una conexión de carga; cada worker tiene su histograma para no compartir locks"""
+    def __init__(self, config, payload, start_at, warmup_until, stop_at, interval):
+        self.config = config
+        self.payload = payload
+        # sin framing el eco llega con un prefijo por cada recv del servidor
+        self.acks = PlainAckMatcher(ACK_PREFIX)
+        # tras un timeout UDP la respuesta puede llegar tarde y tomarse como la del próximo envío
+        self.late_replies = False
+        self.start_at = start_at
+        self.warmup_until = warmup_until
+        self.stop_at = stop_at
+        self.interval = interval
+        self.histogram = LatencyHistogram()
+        self.messages = 0
+        self.errors = 0
+        self.error = None
+        self.sock = None
+        self.reader = None
+
+    def _connect(self):
+        config = self.config
+        if config['protocol'] == 'tcp':
+            self.sock = socket.create_connection((config['host'], config['port']))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if config['framed']:
+                self.reader = FramedReader(self.sock)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect((config['host'], config['port']))
+            self.sock.settimeout(config['timeout'])
+
+    def _round_trip(self):
+        """envía un mensaje y espera la confirmación completa"""
+        if self.reader:
+            send_frame(self.sock, self.payload)
+            if self.reader.read_frame() is None:
+                raise ConnectionError("el servidor cerró la conexión")
+        elif self.config['protocol'] == 'tcp':
+            self.sock.sendall(self.payload)
+            acks = self.acks
+            acks.expect(self.payload)
+            done = acks.feed()
+            while not done:
+                chunk = self.sock.recv(65536)
+                if not chunk:
+                    raise ConnectionError("el servidor cerró la conexión")
+                done = acks.feed(chunk)
+        else:
+            if self.late_replies:
+                self._drain()
+            self.sock.send(self.payload)
+            self.sock.recv(65536)
+
+    def _drain(self):
+        """descarta las respuestas atrasadas de envíos que ya vencieron"""
+        self.sock.setblocking(False)
+        try:
+            while True:
+                self.sock.recv(65536)
+        except BlockingIOError:
+            pass
+        finally:
+            self.sock.settimeout(self.config['timeout'])
+
+    def run(self):
+        try:
+            self._connect()
+        except Exception as e:
+            self.error = e
+            return
+        perf_ns = time.perf_counter_ns
+        record = self.histogram.record
+        scheduled = self.start_at
+        try:
+            while True:
+                if self.interval:
+                    # lazo abierto: esperamos al instante programado, sin recuperar el tiempo perdido
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    origin_ns = int(scheduled * 1e9)
+                    scheduled += self.interval
+                else:
+                    origin_ns = perf_ns()
+                now = time.perf_counter()
+                if now >= self.stop_at:
+                    break
+                try:
+                    self._round_trip()
+                except socket.timeout:
+                    self.errors += 1
+                    self.late_replies = True
+                    continue
+                if now >= self.warmup_until:
+                    record(perf_ns() - origin_ns)
+                    self.messages += 1
+        except Exception as e:
+            self.errors += 1
+            self.error = e
+        finally:
+            if self.reader:
+                self.reader.close()
+            self.sock.close()
+
+def run_benchmark(protocol='tcp', engine='thread', host='localhost', port=None, concurrency=1,
+                  message_size=64, rate=None, duration=5.0, warmup=1.0, framed=False,
+                  timeout=1.0, start_server=True, scrape_interval=None):
+    """ejecuta un benchmark y devuelve un dict con configuración, entorno y resultados
+
+    rate=None es lazo cerrado; rate=N reparte N mensajes/s entre las conexiones.
+    scrape_interval=N expone las métricas del servidor local por HTTP y las
+    lee cada N segundos durante la corrida, para medir el costo del scrape.
+    """
+    if protocol not in ('tcp', 'udp'):
+        raise ValueError(f"Protocolo no soportado: {protocol}")
+    if protocol == 'udp' and framed:
+        raise ValueError("El framing solo aplica a TCP")
+    if not framed and message_size > PLAIN_MAX_MESSAGE_SIZE:
+        raise ValueError(f"Sin framing el servidor lee hasta {PLAIN_MAX_MESSAGE_SIZE} bytes por mensaje; usa framed=True")
+
+    if port is None:
+        port = free_port(protocol, host)
+    config = {
+        'protocol': protocol, 'engine': engine, 'host': host, 'port': port,
+        'concurrency': concurrency, 'message_size': message_size, 'rate': rate,
+        'mode': 'open' if rate else 'closed', 'duration': duration, 'warmup': warmup,
+        'framed': framed, 'timeout': timeout, 'scrape_interval': scrape_interval,
+    }
+
+    server = None
+    if start_server:
+        server, _ = start_local_server(protocol, engine, host, port, framed)
+
+    # payload determinista para que las corridas sean comparables
+    payload = (b'csat-bench-' * (message_size // 11 + 1))[:message_size]
+    interval = concurrency / rate if rate else 0.0
+    start_at = time.perf_counter() + 0.05
+    warmup_until = start_at + warmup
+    stop_at = warmup_until + duration
+    workers = []
+    for index in range(concurrency):
+        # escalonamos los workers de lazo abierto para no enviar en ráfagas
+        offset = interval * index / concurrency if interval else 0.0
+        workers.append(_Worker(config, payload, start_at + offset, warmup_until, stop_at, interval))
+    threads = [threading.Thread(target=w.run, daemon=True) for w in workers]
+    exporter = scrapes = None
+    if server is not None and scrape_interval:
+        exporter, scrapes = _start_scraper(server, protocol, host, scrape_interval, stop_at)
+    cpu_start = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu_used = time.process_time() - cpu_start
+
+    if exporter is not None:
+        exporter.stop()
+    if server is not None:
+        server.stop()
+
+    histogram = LatencyHistogram()
+    for worker in workers:
+        histogram.merge(worker.histogram)
+    errors = sum(w.errors for w in workers)
+    failures = [str(w.error) for w in workers if w.error is not None]
+    messages = histogram.count
+    percentiles = histogram.percentiles(PERCENTILES)
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'config': config,
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': {
+            'messages': messages,
+            'errors': errors,
+            'failures': failures[:5],
+            'throughput_msgs': messages / duration if duration else 0.0,
+            'throughput_bytes': messages * message_size / duration if duration else 0.0,
+            'cpu_seconds': cpu_used,
+            'scrapes': scrapes[0] if scrapes else 0,
+            'latency_us': {
+                'mean': histogram.mean() / 1000,
+                'min': (histogram.min or 0) / 1000,
+                'p50': percentiles[50] / 1000,
+                'p90': percentiles[90] / 1000,
+                'p99': percentiles[99] / 1000,
+                'p999': percentiles[99.9] / 1000,
+                'max': histogram.max / 1000,
+            },
+        },
+    }
+
+def format_report(result):
+    """reporte legible de un resultado de run_benchmark"""
+    config = result['config']
+    results = result['results']
+    latency = results['latency_us']
+    mode = f"lazo abierto a {config['rate']} msg/s" if config['rate'] else "lazo cerrado"
+    lines = [
+        f"=== Benchmark {config['protocol'].upper()} ({config['engine']}{', framed' if config['framed'] else ''}) ===",
+        f"Conexiones: {config['concurrency']}  Tamaño: {config['message_size']} B  Modo: {mode}",
+        f"Duración: {config['duration']} s (+{config['warmup']} s de calentamiento)"
+        + (f"  Scrape cada {config['scrape_interval']} s ({results['scrapes']} scrapes)"
+           if config.get('scrape_interval') else ""),
+        f"Mensajes: {results['messages']}  Errores: {results['errors']}",
+        f"Throughput: {results['throughput_msgs']:.0f} msg/s  {results['throughput_bytes'] * 8 / 1e6:.2f} Mbit/s",
+        f"CPU: {results['cpu_seconds']:.2f} s",
+        "Latencia (us): " + "  ".join(
+            f"{name}={latency[name]:.1f}" for name in ('p50', 'p90', 'p99', 'p999', 'max')
+        ),
+    ]
+    for failure in results['failures']:
+        lines.append(f"Error: {failure}")
+    return "\n".join(lines)
+
+def config_mismatches(baseline, current):
+    """diferencias que hacen incomparables dos resultados, como texto (vacío si se pueden comparar)"""
+    if baseline.get('schema_version') != current.get('schema_version'):
+        return [f"schema_version {baseline.get('schema_version')} != {current.get('schema_version')}"]
+    mismatches = []
+    for key in sorted(set(baseline['config']) | set(current['config'])):
+        if key in NOT_COMPARED:
+            continue
+        before, after = baseline['config'].get(key), current['config'].get(key)
+        if before != after:
+            mismatches.append(f"{key} {before} != {after}")
+    return mismatches
+
+def compare_results(baseline, current):
+    """compara dos resultados y devuelve {métrica: cambio relativo en %}
+
+    ValueError si las corridas no tienen el mismo esquema y configuración.
+    """
+    mismatches = config_mismatches(baseline, current)
+    if mismatches:
+        raise ValueError("Corridas no comparables: " + ", ".join(mismatches))
+    changes = {}
+    pairs = [('throughput_msgs', baseline['results']['throughput_msgs'], current['results']['throughput_msgs'])]
+    for name in ('p50', 'p90', 'p99', 'p999'):
+        pairs.append((name, baseline['results']['latency_us'][name], current['results']['latency_us'][name]))
+    for name, before, after in pairs:
+        changes[name] = (after - before) / before * 100 if before else 0.0
+    return changes
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de los servidores de eco CSAT")
+    parser.add_argument('--protocol', choices=('tcp', 'udp'), default='tcp')
+    parser.add_argument('--engine', choices=('thread', 'async'), default='thread')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--concurrency', '-c', type=int, default=1)
+    parser.add_argument('--size', '-s', type=int, default=64, help="tamaño del mensaje en bytes")
+    parser.add_argument('--rate', '-r', type=float, default=None, help="msg/s totales (lazo abierto)")
+    parser.add_argument('--duration', '-d', type=float, default=5.0)
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--framed', action='store_true')
+    parser.add_argument('--no-server', action='store_true', help="no iniciar servidor local, usar host:port")
+    parser.add_argument('--scrape', type=float, default=None, metavar='SEGUNDOS',
+                        help="leer las métricas HTTP del servidor local cada SEGUNDOS durante la corrida")
+    parser.add_argument('--json', action='store_true', help="imprimir el resultado en JSON")
+    parser.add_argument('--output', '-o', help="guardar el resultado JSON en un archivo")
+    parser.add_argument('--compare', help="JSON de una corrida anterior para comparar")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.no_server and args.port is None:
+        print("--no-server requiere --port")
+        return 2
+    result = run_benchmark(
+        protocol=args.protocol, engine=args.engine, host=args.host, port=args.port,
+        concurrency=args.concurrency, message_size=args.size, rate=args.rate,
+        duration=args.duration, warmup=args.warmup, framed=args.framed,
+        start_server=not args.no_server, scrape_interval=args.scrape,
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(format_report(result))
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        try:
+            changes = compare_results(baseline, result)
+        except ValueError as e:
+            print(e)
+            return 1
+        for name, change in changes.items():
+            print(f"{name}: {change:+.1f}%")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Modo de transferencia masiva TCP para medir throughput entre hosts.
+
+El cliente envía un archivo (o un payload generado de cualquier tamaño) con
+socket.sendfile, así que los datos pasan del page cache al socket sin
+copiarse a Python. El servidor vacía el socket con recv_into sobre un buffer
+grande reutilizable y, cuando el cliente cierra su lado de escritura,
+responde con los bytes recibidos, el tiempo y la CPU usada. Ambos lados
+reportan Gbit/s y tiempo de CPU.
+"""
+import argparse
+import json
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import logging
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.base.framing import BufferPool
+from src.client import TCPClient
+from src.server import TCPServer
+
+logger = logging.getLogger(__name__)
+
+BULK_PORT = 54322
+# buffer de recepción del servidor y tamaño del bloque generado por el cliente
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+# respuesta del servidor: bytes recibidos, duración (ns) y CPU del hilo (ns)
+REPORT = struct.Struct('!QQQ')
+SIZE_SUFFIXES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def parse_size(text):
+    """convierte '512', '64K', '10M' o '2G' a bytes"""
+    text = str(text).strip().upper().rstrip('B')
+    if text and text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def transfer_result(nbytes, seconds, cpu_seconds):
+    """dict con bytes, duración, Gbit/s y CPU de una transferencia"""
+    return {
+        'bytes': nbytes,
+        'seconds': seconds,
+        'gbps': nbytes * 8 / seconds / 1e9 if seconds > 0 else 0.0,
+        'cpu_seconds': cpu_seconds,
+    }
+
+def format_transfer(result):
+    return (f"{result['bytes'] / 1e6:.1f} MB en {result['seconds']:.3f} s, "
+            f"{result['gbps']:.2f} Gbit/s, CPU {result['cpu_seconds']:.3f} s")
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("el servidor cerró la conexión antes del reporte")
+        data += chunk
+    return bytes(data)
+
+class BulkServer(TCPServer):
+    """recibe transferencias masivas y responde con bytes, duración y CPU al terminar cada una"""
+    def __init__(self, host='localhost', port=BULK_PORT, log_callback=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                 rcvbuf=None, **options):
+        options.setdefault('backlog', 16)
+        super().__init__(host, port, log_callback, **options)
+        # un buffer grande por conexión activa, reutilizado entre conexiones
+        self.buffer_pool = BufferPool(buffer_size, max_buffers=8)
+        # SO_RCVBUF se fija en el socket que escucha para que lo hereden las conexiones aceptadas
+        self.rcvbuf = rcvbuf
+        self.last_transfer = None
+
+    def _set_socket_options(self, sock):
+        super()._set_socket_options(sock)
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+
+    def _handle_client(self, client_socket, address):
+        """vacía el socket con recv_into hasta que el cliente cierre su lado de escritura"""
+        buffer = self.buffer_pool.acquire()
+        view = memoryview(buffer)
+        total = 0
+        started = None
+        tracked = self.reaper.register(client_socket, address)
+        local_address = None
+        try:
+            local_address = client_socket.getsockname()[:2]
+            cpu_started = time.thread_time_ns()
+            while True:
+                received = client_socket.recv_into(view)
+                if not received:
+                    break
+                if started is None:
+                    started = time.perf_counter_ns()
+                tracked.touch()
+                total += received
+                if self.capture is not None:
+                    self.capture.write('tcp', address, local_address, view[:received])
+            elapsed = time.perf_counter_ns() - started if started is not None else 0
+            cpu = time.thread_time_ns() - cpu_started
+            client_socket.sendall(REPORT.pack(total, elapsed, cpu))
+
+            if self.flow_table is not None:
+                self.flow_table.record('tcp', address, total)
+            self.metrics.message(total, elapsed)
+            self.last_transfer = transfer_result(total, elapsed / 1e9, cpu / 1e9)
+            self._log(f"Transferencia desde {address}: {format_transfer(self.last_transfer)}")
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al manejar cliente {address}: {e}")
+        finally:
+            view.release()
+            self.buffer_pool.release(buffer)
+            self._end_tcp_session(address, local_address)
+            self.reaper.unregister(tracked)
+            self._sample_tcp_rtt(client_socket, address)
+            client_socket.close()
+            self.metrics.connection_closed()
+            self._emit("Conexión cerrada con {}", address)
+
+class BulkClient(TCPClient):
+    """envía archivos o payloads generados con sendfile; cada transferencia usa su propia conexión"""
+    def __init__(self, port=BULK_PORT, log_callback=None, sndbuf=None, rcvbuf=None, log_sink=None):
+        super().__init__(port, log_callback, log_sink=log_sink)
+        self.sndbuf = sndbuf
+        self.rcvbuf = rcvbuf
+
+    def _set_socket_options(self, sock):
+        # antes de connect, para que el kernel negocie la escala de ventana con estos tamaños
+        if self.sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+        if self.rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+
+    def send_file(self, path, count=None):
+        """envía el archivo (o sus primeros count bytes); devuelve el reporte o None si falló"""
+        with open(path, 'rb') as f:
+            return self._transfer(lambda: self.socket.sendfile(f, 0, count))
+
+    def send_payload(self, size, chunk_size=DEFAULT_CHUNK_SIZE):
+        """envía size bytes generados repitiendo un bloque temporal de chunk_size con sendfile"""
+        chunk_size = max(1, min(size, chunk_size))
+        with tempfile.TemporaryFile() as f:
+            pattern = bytes(range(256))
+            f.write((pattern * (chunk_size // 256 + 1))[:chunk_size])
+            f.flush()
+
+            def send():
+                sent = 0
+                while sent < size:
+                    sent += self.socket.sendfile(f, 0, min(chunk_size, size - sent))
+                return sent
+
+            return self._transfer(send)
+
+    def _transfer(self, send):
+        if not self.connect():
+            return None
+        try:
+            started = time.perf_counter_ns()
+            cpu_started = time.thread_time_ns()
+            sent = send()
+            # fin de los datos: el servidor ve EOF y responde con su reporte
+            self.socket.shutdown(socket.SHUT_WR)
+            received, server_ns, server_cpu_ns = REPORT.unpack(_recv_exactly(self.socket, REPORT.size))
+            elapsed = time.perf_counter_ns() - started
+            cpu = time.thread_time_ns() - cpu_started
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error en la transferencia: {e}")
+            return None
+        finally:
+            self.close()
+
+        self.metrics.message(sent, elapsed)
+        if received != sent:
+            self._log(f"Advertencia: se enviaron {sent} bytes y el servidor recibió {received}")
+        report = {
+            'client': transfer_result(sent, elapsed / 1e9, cpu / 1e9),
+            'server': transfer_result(received, server_ns / 1e9, server_cpu_ns / 1e9),
+            'sndbuf': self.sndbuf,
+            'rcvbuf': self.rcvbuf,
+        }
+        self._log(f"Cliente: {format_transfer(report['client'])}")
+        self._log(f"Servidor: {format_transfer(report['server'])}")
+        return report
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Transferencia masiva TCP de CSAT")
+    parser.add_argument('--serve', action='store_true', help="iniciar solo el servidor")
+    parser.add_argument('--local', action='store_true', help="iniciar un servidor local y transferir contra él")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=BULK_PORT)
+    parser.add_argument('--size', default='1G', help="bytes a generar (acepta K, M y G)")
+    parser.add_argument('--file', help="archivo a enviar en lugar del payload generado")
+    parser.add_argument('--sndbuf', help="SO_SNDBUF del cliente (acepta K y M)")
+    parser.add_argument('--rcvbuf', help="SO_RCVBUF del servidor (acepta K y M)")
+    parser.add_argument('--buffer-size', default=str(DEFAULT_BUFFER_SIZE), help="buffer de recv_into del servidor")
+    parser.add_argument('--json', action='store_true', help="imprimir el reporte en JSON")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    rcvbuf = parse_size(args.rcvbuf) if args.rcvbuf else None
+    if args.serve or args.local:
+        server = BulkServer(args.host, args.port, buffer_size=parse_size(args.buffer_size), rcvbuf=rcvbuf)
+        if args.serve:
+            try:
+                server.start()
+            except KeyboardInterrupt:
+                server.stop()
+            return 0
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        if not server.ready.wait(5.0):
+            print(f"No se pudo iniciar el servidor en {args.host}:{args.port}")
+            return 1
+
+    client = BulkClient(args.port, sndbuf=parse_size(args.sndbuf) if args.sndbuf else None)
+    client.host = args.host
+    if args.file:
+        report = client.send_file(args.file)
+    else:
+        report = client.send_payload(parse_size(args.size))
+    if report is None:
+        print("La transferencia falló")
+        return 1
+    if args.json:
+        print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
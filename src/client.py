@@ -2,9 +2,10 @@
 Cliente TCP y UDP para prueba de concepto
 """
 import socket
+import select
 import logging
 import time
-from datetime import datetime
+from collections import deque
 import sys
 from pathlib import Path
 
@@ -13,19 +14,45 @@ root_dir = str(Path(__file__).parent.parent.parent)
 if root_dir not in sys.path:
     sys.path.append(root_dir)
 
+from src.base.acks import PlainAckMatcher, UnexpectedReply
 from src.base.client_base import BaseClient
+from src.base.framing import FramedReader, encode_frame, send_frame
+from src.base.compression import DEFAULT_THRESHOLD, NONE, encode_hello, is_hello, make_codec, parse_hello
+from src.server import ACK_PREFIX
 
 logger = logging.getLogger(__name__)
 
 class TCPClient(BaseClient):
-    def __init__(self, port=54321, log_callback=None):
-        super().__init__()
+    # bytes por recv al leer confirmaciones sin framing
+    RECV_SIZE = 4096
+
+    def __init__(self, port=54321, log_callback=None, framed=False, window=32, ack_callback=None,
+                 log_sink=None, compression=None, compress_threshold=DEFAULT_THRESHOLD, timeout=None):
+        super().__init__(log_sink=log_sink)
         self.port = port
         self.log_callback = log_callback
+        # timeout (segundos) para conectar y para cada confirmación; None bloquea sin límite
+        self.timeout = timeout
+        # compression='zlib' se negocia al conectar y necesita framing para separar mensajes
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        # framed=True habla el protocolo con largo + payload (ver TCPServer(framed=True))
+        self.framed = framed or bool(compression)
+        self._reader = None
+        # pipeline: hasta window mensajes en vuelo, confirmados en orden
+        self.window = window
+        self.ack_callback = ack_callback
+        self.acked = 0
+        self._in_flight = deque()
+        self._next_seq = 0
+        # eco sin framing: se recorre contra lo enviado (ver src/base/acks.py)
+        self._acks = PlainAckMatcher(ACK_PREFIX)
 
     def _log(self, message):
         """envía el log al callback si existe, sino usa logger"""
-        if self.log_callback:
+        if self.log_sink is not None:
+            self.log_sink.emit(message)
+        elif self.log_callback:
             self.log_callback(message)
         else:
             logger.info(message)
@@ -34,13 +61,44 @@ class TCPClient(BaseClient):
         """establece conexión con el servidor"""
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._set_socket_options(self.socket)
+            if self.timeout is not None:
+                self.socket.settimeout(self.timeout)
             self.socket.connect((self.host, self.port))
+            if self.framed:
+                self._reader = FramedReader(self.socket)
+            self._in_flight.clear()
+            self._next_seq = 0
+            self._acks.reset()
+            self.server_ip = self.server_port = None
+            self.metrics.connection_opened()
             self._log(f"Conectado al servidor en {self.host}:{self.port}")
+            if self.compression:
+                self._negotiate()
             return True
         except Exception as e:
+            self.metrics.error()
             self._log(f"Error al conectar: {e}")
+            # sin el socket a medio abrir, un nuevo connect() no deja descriptores colgados
+            if self.socket is not None:
+                self.socket.close()
+                self.socket = None
             return False
 
+    def _set_socket_options(self, sock):
+        """opciones del socket antes de conectar (las subclases pueden agregar más)"""
+        pass
+
+    def _negotiate(self):
+        """ofrece el códec al servidor; si no responde con un saludo se sigue sin comprimir"""
+        send_frame(self.socket, encode_hello((self.compression,)))
+        reply = self._reader.read_frame()
+        if reply is None:
+            raise ConnectionError("el servidor cerró la conexión")
+        name = parse_hello(reply)[0] if is_hello(reply) else NONE
+        self.codec = make_codec(name, True, self.compress_threshold)
+        self._log(f"Compresión: {name}")
+
     def send_message(self, message):
         """envía un mensaje al servidor y recibe respuesta"""
         try:
@@ -51,47 +109,210 @@ class TCPClient(BaseClient):
                 return False
 
             # envía mensaje
-            self.socket.send(message.encode())
+            payload = message.encode()
+            started = time.perf_counter_ns()
+            self._send_payload(payload)
             self.message_count += 1
             
             # información del envío
-            timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
-            self._log(f"Mensaje: {message}")
+            self._emit("Mensaje: {}", message)
             if self._get_server_info():
-                self._log(f"IP de destino: {self.server_ip}")
-                self._log(f"Puerto de destino: {self.server_port}")
-            self._log(f"Tiempo de envío: {timestamp}")
+                self._emit("IP de destino: {}", self.server_ip)
+                self._emit("Puerto de destino: {}", self.server_port)
+            self._emit("Tiempo de envío: {ts}")
             
             # recibe respuesta
-            response = self.socket.recv(1024).decode()
-            #self._log(f"Respuesta: {response}")
+            self._receive_reply(payload)
+            self.metrics.message(len(payload), time.perf_counter_ns() - started)
             return True
         except Exception as e:
+            self.metrics.error()
             self._log(f"Error al enviar mensaje: {e}")
             return False
 
+    def request(self, payload):
+        """envía payload (bytes) y devuelve la confirmación, sin logs por mensaje
+
+        A diferencia de send_message lanza la excepción si falla, así quien
+        llama (p. ej. TCPConnectionPool) puede reconectar y reintentar.
+        """
+        started = time.perf_counter_ns()
+        self._send_payload(payload)
+        self.message_count += 1
+        reply = self._receive_reply(payload)
+        self.metrics.message(len(payload), time.perf_counter_ns() - started)
+        return reply
+
+    def _send_payload(self, payload):
+        if self.framed:
+            send_frame(self.socket, self.codec.encode(payload) if self.codec else payload)
+        else:
+            self.socket.sendall(payload)
+
+    def _receive_reply(self, payload):
+        """confirmación de payload: con framing un frame, sin framing todo su eco"""
+        if self.framed:
+            ack = self._reader.read_frame()
+            if ack is None:
+                raise ConnectionError("el servidor cerró la conexión")
+            # el contexto de descompresión tiene que ver todas las respuestas
+            return self.codec.decode(ack) if self.codec else ack
+        # el servidor confirma cada recv por separado: hay que leer todo el eco o la
+        # conexión quedaría con confirmaciones sin leer para el próximo mensaje
+        acks = self._acks
+        acks.expect(payload)
+        try:
+            done = acks.feed()
+            while not done:
+                done = acks.feed(self._recv_plain())
+        except UnexpectedReply as e:
+            # otra respuesta (p. ej. del rate_limiter) se devuelve tal cual
+            return e.data
+        except socket.timeout:
+            # lo leído a medias no sirve para el próximo mensaje
+            acks.reset()
+            raise
+        return ACK_PREFIX + payload
+
+    def _recv_plain(self):
+        data = self.socket.recv(self.RECV_SIZE)
+        if not data:
+            raise ConnectionError("el servidor cerró la conexión")
+        return data
+
+    def _receive_ack(self):
+        """lee la siguiente confirmación y la empareja con el mensaje más antiguo en vuelo"""
+        ack = self._reader.read_frame()
+        if ack is None:
+            raise ConnectionError("el servidor cerró la conexión")
+        if self.codec:
+            ack = self.codec.decode(ack)
+        seq, payload, sent_ns = self._in_flight.popleft()
+        if ack[len(ACK_PREFIX):] != payload:
+            raise ConnectionError(f"confirmación desordenada para el mensaje {seq}")
+        self.acked += 1
+        rtt_ns = time.perf_counter_ns() - sent_ns
+        self.metrics.message(len(payload), rtt_ns)
+        if self.ack_callback:
+            self.ack_callback(seq, rtt_ns)
+
+    def _send_pipelined(self, payload):
+        """send_frame que consume confirmaciones mientras el socket no acepta más datos
+
+        Con frames grandes el servidor puede quedar bloqueado enviando
+        confirmaciones que nadie lee, y entonces tampoco lee lo que enviamos.
+        """
+        if not hasattr(socket, 'MSG_DONTWAIT'):
+            send_frame(self.socket, payload)
+            return
+        frame = memoryview(encode_frame(payload))
+        while frame:
+            readable, writable, _ = select.select([self.socket], [self.socket], [], self.timeout)
+            if readable:
+                self._receive_ack()
+            elif writable:
+                try:
+                    frame = frame[self.socket.send(frame, socket.MSG_DONTWAIT):]
+                except BlockingIOError:
+                    pass
+            else:
+                raise socket.timeout("timeout al enviar en pipeline")
+
+    def _abort_pipeline(self):
+        """tras un error quedan confirmaciones a medias en la conexión: no se puede reutilizar"""
+        self._in_flight.clear()
+        self._next_seq = 0
+        self.close()
+
+    def pipeline_send(self, message):
+        """envía un mensaje sin esperar su confirmación; bloquea solo si la ventana está llena
+
+        devuelve el número de secuencia asignado. Requiere framed=True porque
+        las confirmaciones se separan por frame. Si falla, la conexión se
+        cierra y hay que volver a conectar.
+        """
+        if not self.framed:
+            raise ValueError("el envío en pipeline requiere framed=True")
+        payload = message.encode() if isinstance(message, str) else bytes(message)
+        try:
+            while len(self._in_flight) >= self.window:
+                self._receive_ack()
+            seq = self._next_seq
+            self._next_seq += 1
+            self._in_flight.append((seq, payload, time.perf_counter_ns()))
+            self._send_pipelined(self.codec.encode(payload) if self.codec else payload)
+        except BaseException:
+            self._abort_pipeline()
+            raise
+        self.message_count += 1
+        return seq
+
+    def pipeline_flush(self):
+        """espera las confirmaciones de todos los mensajes en vuelo"""
+        try:
+            while self._in_flight:
+                self._receive_ack()
+        except BaseException:
+            self._abort_pipeline()
+            raise
+
+    def send_many(self, messages):
+        """envía un iterable de mensajes en pipeline y espera todas las confirmaciones
+
+        devuelve la cantidad de mensajes confirmados, o -1 si hubo un error
+        """
+        acked_before = self.acked
+        start = time.perf_counter()
+        try:
+            for message in messages:
+                self.pipeline_send(message)
+            self.pipeline_flush()
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al enviar mensajes en pipeline: {e}")
+            return -1
+        count = self.acked - acked_before
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else 0.0
+        self._log(f"{count} mensajes confirmados en {elapsed:.3f} s ({rate:.0f} msg/s, ventana {self.window})")
+        return count
+
     def close(self):
         """cierra la conexión con el servidor"""
         if self.socket:
             try:
                 self.socket.close()
+                self.metrics.connection_closed()
                 self._log("Conexión cerrada")
             except Exception as e:
                 self._log(f"Error al cerrar la conexión: {e}")
             finally:
                 self.socket = None
+                if self._reader:
+                    self._reader.close()
+                    self._reader = None
+                if self.codec:
+                    self._log(f"Compresión: {self.codec.stats.summary()}")
+                    self.codec = None
 
 class UDPClient(BaseClient):
-    def __init__(self, port=5555, log_callback=None):
-        super().__init__()
+    def __init__(self, port=5555, log_callback=None, log_sink=None, compression=None,
+                 compress_threshold=DEFAULT_THRESHOLD):
+        super().__init__(log_sink=log_sink)
         self.port = port
         self.log_callback = log_callback
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.settimeout(5.0)  # timeout de 5 segundos
+        # sin conexión, la compresión se negocia antes del primer mensaje
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self._negotiated = False
 
     def _log(self, message):
         """envía el log al callback si existe, sino usa logger"""
-        if self.log_callback:
+        if self.log_sink is not None:
+            self.log_sink.emit(message)
+        elif self.log_callback:
             self.log_callback(message)
         else:
             logger.info(message)
@@ -105,29 +326,52 @@ class UDPClient(BaseClient):
                     return True
                 return False
 
+            if self.compression and not self._negotiated:
+                self._negotiate()
+
             # envía mensaje
-            self.socket.sendto(message.encode(), (self.host, self.port))
+            payload = message.encode()
+            started = time.perf_counter_ns()
+            self.socket.sendto(self.codec.encode(payload) if self.codec else payload, (self.host, self.port))
             self.message_count += 1
             
             # información del envío
-            timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
-            self._log(f"Mensaje: {message}")
-            self._log(f"IP de destino: {self.host}")
-            self._log(f"Puerto de destino: {self.port}")
-            self._log(f"Tiempo de envío: {timestamp}")
+            self._emit("Mensaje: {}", message)
+            self._emit("IP de destino: {}", self.host)
+            self._emit("Puerto de destino: {}", self.port)
+            self._emit("Tiempo de envío: {ts}")
             
             # recibe respuesta
-            data, addr = self.socket.recvfrom(1024)
+            if self.codec:
+                data, addr = self.socket.recvfrom(65535)
+                data = self.codec.decode(data)
+            else:
+                data, addr = self.socket.recvfrom(1024)
+            self.metrics.message(len(payload), time.perf_counter_ns() - started)
             #response = data.decode()
             #self._log(f"Respuesta: {response}")
             return True
         except socket.timeout:
+            self.metrics.error()
             self._log("Timeout: No se recibió respuesta del servidor")
             return False
         except Exception as e:
+            self.metrics.error()
             self._log(f"Error al enviar mensaje UDP: {e}")
             return False
 
+    def _negotiate(self):
+        """ofrece el códec al servidor; sin respuesta o sin soporte se sigue sin comprimir"""
+        self._negotiated = True
+        self.socket.sendto(encode_hello((self.compression,)), (self.host, self.port))
+        try:
+            reply, _ = self.socket.recvfrom(1024)
+        except socket.timeout:
+            reply = b''
+        name = parse_hello(reply)[0] if is_hello(reply) else NONE
+        self.codec = make_codec(name, False, self.compress_threshold)
+        self._log(f"Compresión: {name}")
+
     def close(self):
         """cierra el socket UDP"""
         if self.socket:
@@ -0,0 +1,449 @@
+"""
+Pool de conexiones TCP con chequeo de salud y reconexión automática.
+
+Mantiene hasta size conexiones TCPClient abiertas y las presta a quien
+envía, así los scripts y la TUI reutilizan conexiones ya establecidas en
+vez de pagar el handshake (y la negociación de compresión) por sesión.
+Antes de prestar una conexión se verifica que el servidor no la haya
+cerrado; si está muerta, o si el envío falla, se reconecta con backoff
+exponencial y el mensaje se reintenta.
+
+    pool = shared_pool(54321, size=4)
+    pool.send_message("hola")              # True si llegó la confirmación
+    with pool.connection() as client:      # TCPClient prestado
+        client.request(b"ping")
+    pool.stats()['per_connection']
+
+shared_pool() devuelve el mismo pool para el mismo servidor y opciones
+dentro del proceso, de modo que los envíos por script comparten las
+conexiones. AsyncTCPConnectionPool es la versión para un event loop (la
+TUI): presta AsyncTCPClient con el mismo chequeo de salud, backoff y
+estadísticas, sin hilos.
+
+    pool = AsyncTCPConnectionPool(54321, size=4)
+    await pool.send_message("hola")
+"""
+import asyncio
+import collections
+import contextlib
+import logging
+import select
+import threading
+import time
+import sys
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.async_client import AsyncTCPClient
+from src.client import TCPClient
+
+logger = logging.getLogger(__name__)
+
+def is_alive(sock):
+    """True si el socket sigue conectado y sin datos pendientes
+
+    Una conexión ociosa no debería tener nada para leer: si select la marca
+    legible es que el servidor la cerró (EOF o RST) o que quedó una
+    confirmación vieja; en ambos casos no sirve para el próximo mensaje.
+    """
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+def is_stream_alive(client):
+    """is_alive para AsyncTCPClient: el transporte ya leyó lo pendiente, se mira si vio EOF"""
+    writer = client.writer
+    return writer is not None and not writer.is_closing() and not client.reader.at_eof()
+
+class PooledConnection:
+    """una conexión del pool con su TCPClient y sus estadísticas de reconexión"""
+    def __init__(self, index, client):
+        self.index = index
+        self.client = client
+        self.connects = 0
+        self.reconnects = 0
+        self.health_failures = 0
+        self.send_failures = 0
+        self.last_used = None
+
+    @property
+    def connected(self):
+        return self.client.socket is not None
+
+    def stats(self):
+        snapshot = self.client.metrics.snapshot()
+        percentiles = snapshot['latency'].percentiles((50, 99))
+        return {
+            'index': self.index,
+            'connected': self.connected,
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'health_failures': self.health_failures,
+            'send_failures': self.send_failures,
+            'messages': snapshot['messages'],
+            'bytes': snapshot['bytes'],
+            'errors': snapshot['errors'],
+            'p50_us': percentiles[50] / 1000,
+            'p99_us': percentiles[99] / 1000,
+            'idle_seconds': None if self.last_used is None else time.monotonic() - self.last_used,
+        }
+
+class TCPConnectionPool:
+    """hasta size conexiones TCP al mismo servidor, prestadas de a una (seguro entre hilos)"""
+    def __init__(self, port=54321, host='localhost', size=4, log_callback=None, framed=False,
+                 compression=None, timeout=5.0, retries=3, backoff=0.05, max_backoff=2.0):
+        if size < 1:
+            raise ValueError("El pool necesita al menos una conexión")
+        self.port = port
+        self.host = host
+        self.size = size
+        self.log_callback = log_callback
+        self.framed = framed
+        self.compression = compression
+        self.timeout = timeout
+        # reintentos de un envío y de cada conexión, con espera backoff * 2^intento (hasta max_backoff)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._connections = []
+        self._idle = collections.deque()
+        self._available = threading.Condition()
+        self._closed = False
+
+    def _log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+        else:
+            logger.info(message)
+
+    def _new_connection(self):
+        client = TCPClient(self.port, log_callback=self.log_callback, framed=self.framed,
+                           compression=self.compression, timeout=self.timeout)
+        client.host = self.host
+        connection = PooledConnection(len(self._connections), client)
+        self._connections.append(connection)
+        return connection
+
+    def acquire(self, timeout=None):
+        """presta una conexión sana (abre una nueva si hay lugar); espera hasta timeout segundos"""
+        with self._available:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                if self._closed:
+                    raise RuntimeError("El pool está cerrado")
+                if self._idle:
+                    # la más reciente primero: es la que más probablemente sigue viva
+                    connection = self._idle.pop()
+                    break
+                if len(self._connections) < self.size:
+                    connection = self._new_connection()
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"Sin conexiones libres en el pool tras {timeout:g} s")
+                self._available.wait(remaining)
+        try:
+            self._ensure_healthy(connection)
+        except BaseException:
+            self.release(connection)
+            raise
+        return connection
+
+    def release(self, connection):
+        connection.last_used = time.monotonic()
+        with self._available:
+            if self._closed:
+                connection.client.close()
+                return
+            self._idle.append(connection)
+            self._available.notify()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """TCPClient prestado durante el bloque with"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection.client
+        finally:
+            self.release(connection)
+
+    def _ensure_healthy(self, connection):
+        client = connection.client
+        if client.socket is not None:
+            if is_alive(client.socket):
+                return
+            connection.health_failures += 1
+            self._log(f"Conexión {connection.index} del pool inactiva, reconectando")
+        self._connect(connection)
+
+    def _connect(self, connection):
+        """(re)abre la conexión con backoff exponencial; ConnectionError si no lo logra"""
+        client = connection.client
+        client.close()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+            if client.connect():
+                if connection.connects:
+                    connection.reconnects += 1
+                connection.connects += 1
+                return
+        raise ConnectionError(f"No se pudo conectar a {self.host}:{self.port} tras {self.retries + 1} intentos")
+
+    def request(self, payload):
+        """envía payload por una conexión del pool y devuelve la confirmación
+
+        Si la conexión se cae a mitad del intercambio se reconecta y se
+        reintenta hasta retries veces: la entrega es al menos una vez (el
+        servidor puede haber procesado el mensaje antes del corte).
+        """
+        connection = self.acquire()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    return connection.client.request(payload)
+                except OSError as e:
+                    connection.send_failures += 1
+                    connection.client.metrics.error()
+                    if attempt == self.retries:
+                        raise
+                    self._log(f"Error en la conexión {connection.index} del pool: {e}; reintentando")
+                    self._connect(connection)
+        finally:
+            self.release(connection)
+
+    def send_message(self, message):
+        """envía un mensaje de texto; True si llegó la confirmación (errores al log, como TCPClient)"""
+        started = time.perf_counter()
+        try:
+            self.request(message.encode())
+        except (OSError, RuntimeError) as e:
+            self._log(f"Error al enviar mensaje: {e}")
+            return False
+        self._log(f"Mensaje: {message} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        return True
+
+    def metrics_sources(self):
+        """Metrics de cada conexión abierta alguna vez (para MetricsSampler o el exportador)"""
+        return [connection.client.metrics for connection in list(self._connections)]
+
+    def stats(self):
+        with self._available:
+            connections = list(self._connections)
+            idle = len(self._idle)
+        return {
+            'size': self.size,
+            'connections': len(connections),
+            'idle': idle,
+            'in_use': len(connections) - idle,
+            'per_connection': [connection.stats() for connection in connections],
+        }
+
+    def close(self):
+        """cierra las conexiones libres; las prestadas se cierran al devolverlas"""
+        with self._available:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+        for connection in idle:
+            connection.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class AsyncTCPConnectionPool:
+    """TCPConnectionPool para un solo event loop: conexiones AsyncTCPClient prestadas de a una"""
+    def __init__(self, port=54321, host='localhost', size=4, log_callback=None, framed=False,
+                 compression=None, timeout=5.0, retries=3, backoff=0.05, max_backoff=2.0):
+        if size < 1:
+            raise ValueError("El pool necesita al menos una conexión")
+        self.port = port
+        self.host = host
+        self.size = size
+        self.log_callback = log_callback
+        self.framed = framed
+        self.compression = compression
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._connections = []
+        self._idle = collections.deque()
+        self._available = asyncio.Condition()
+        self._closed = False
+
+    def _log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+        else:
+            logger.info(message)
+
+    def _new_connection(self):
+        client = AsyncTCPClient(self.port, log_callback=self.log_callback, framed=self.framed,
+                                compression=self.compression, timeout=self.timeout)
+        client.host = self.host
+        connection = PooledConnection(len(self._connections), client)
+        self._connections.append(connection)
+        return connection
+
+    async def acquire(self, timeout=None):
+        """presta una conexión sana (abre una nueva si hay lugar); espera hasta timeout segundos"""
+        async with self._available:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                if self._closed:
+                    raise RuntimeError("El pool está cerrado")
+                if self._idle:
+                    connection = self._idle.pop()
+                    break
+                if len(self._connections) < self.size:
+                    connection = self._new_connection()
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"Sin conexiones libres en el pool tras {timeout:g} s")
+                try:
+                    await asyncio.wait_for(self._available.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        try:
+            await self._ensure_healthy(connection)
+        except BaseException:
+            await self.release(connection)
+            raise
+        return connection
+
+    async def release(self, connection):
+        connection.last_used = time.monotonic()
+        async with self._available:
+            if self._closed:
+                await connection.client.close()
+                return
+            self._idle.append(connection)
+            self._available.notify()
+
+    @contextlib.asynccontextmanager
+    async def connection(self, timeout=None):
+        """AsyncTCPClient prestado durante el bloque async with"""
+        connection = await self.acquire(timeout)
+        try:
+            yield connection.client
+        finally:
+            await self.release(connection)
+
+    async def _ensure_healthy(self, connection):
+        client = connection.client
+        if client.writer is not None:
+            if is_stream_alive(client):
+                return
+            connection.health_failures += 1
+            self._log(f"Conexión {connection.index} del pool inactiva, reconectando")
+        await self._connect(connection)
+
+    async def _connect(self, connection):
+        """(re)abre la conexión con backoff exponencial; ConnectionError si no lo logra"""
+        client = connection.client
+        await client.close()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+            if await client.connect():
+                if connection.connects:
+                    connection.reconnects += 1
+                connection.connects += 1
+                return
+        raise ConnectionError(f"No se pudo conectar a {self.host}:{self.port} tras {self.retries + 1} intentos")
+
+    async def send_message(self, message):
+        """envía un mensaje de texto; True si llegó la confirmación
+
+        Si la conexión se cae en el intercambio (o vence el timeout, que la
+        descarta) se reconecta y se reintenta hasta retries veces, como
+        TCPConnectionPool.request: al menos una vez.
+        """
+        started = time.perf_counter()
+        try:
+            connection = await self.acquire()
+        except (OSError, RuntimeError) as e:
+            self._log(f"Error al enviar mensaje: {e}")
+            return False
+        try:
+            for attempt in range(self.retries + 1):
+                if await connection.client.send_message(message):
+                    self._log(f"Mensaje: {message} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+                    return True
+                connection.send_failures += 1
+                if attempt == self.retries or is_stream_alive(connection.client):
+                    return False
+                self._log(f"Error en la conexión {connection.index} del pool; reintentando")
+                await self._connect(connection)
+        except OSError as e:
+            self._log(f"Error al enviar mensaje: {e}")
+            return False
+        finally:
+            await self.release(connection)
+
+    def metrics_sources(self):
+        """Metrics de cada conexión abierta alguna vez (para MetricsSampler o el exportador)"""
+        return [connection.client.metrics for connection in self._connections]
+
+    def stats(self):
+        idle = len(self._idle)
+        return {
+            'size': self.size,
+            'connections': len(self._connections),
+            'idle': idle,
+            'in_use': len(self._connections) - idle,
+            'per_connection': [connection.stats() for connection in self._connections],
+        }
+
+    async def close(self):
+        """cierra las conexiones libres; las prestadas se cierran al devolverlas"""
+        async with self._available:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+        for connection in idle:
+            await connection.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_pool(port=54321, host='localhost', **options):
+    """pool del proceso para (host, port, framed, compression); lo crea la primera vez
+
+    Las demás opciones (size, log_callback, timeout...) solo cuentan al
+    crearlo. Un pool cerrado se reemplaza por uno nuevo.
+    """
+    key = (host, port, options.get('framed', False), options.get('compression'))
+    with _shared_lock:
+        pool = _shared.get(key)
+        if pool is None or pool._closed:
+            pool = _shared[key] = TCPConnectionPool(port, host, **options)
+        return pool
+
+def close_shared_pools():
+    with _shared_lock:
+        pools = list(_shared.values())
+        _shared.clear()
+    for pool in pools:
+        pool.close()
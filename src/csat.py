@@ -0,0 +1,370 @@
+"""
+CLI no interactiva de CSAT: serve, send, bench, replay y profile.
+
+No importa Textual y carga los módulos de red recién al ejecutar el
+subcomando, así que arrancar una instancia cuesta poco más que el
+intérprete. `serve` avisa cuando el socket ya está escuchando con una línea
+READY en stdout y, opcionalmente, con un archivo JSON (escrito de forma
+atómica) para que un orquestador sepa el puerto real sin carreras:
+
+    python -m src.csat serve --protocol tcp --port 0 --ready-file /tmp/csat.json
+    python -m src.csat send --protocol tcp --port 54321 hola mundo
+    python -m src.csat bench --protocol udp --duration 5
+    python -m src.csat replay /tmp/trafico.rec --speed 2
+
+Con --profile-dir el endpoint de métricas también acepta capturas de
+cProfile o tracemalloc del servidor en marcha, que se piden con profile:
+
+    python -m src.csat serve --metrics-port 9464 --profile-dir /tmp/perfiles
+    python -m src.csat profile --metrics-port 9464 --kind cprofile --seconds 10 --wait
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+if not __package__:
+    # ejecutado como script (python src/csat.py): agregamos el directorio root al path
+    root_dir = str(Path(__file__).parent.parent)
+    if root_dir not in sys.path:
+        sys.path.insert(0, root_dir)
+
+DEFAULT_PORTS = {'tcp': 54321, 'udp': 5555}
+MODES = ('echo', 'framed', 'reliable', 'bulk')
+
+def _quiet(message):
+    pass
+
+def _check_mode(protocol, mode):
+    if mode in ('framed', 'bulk') and protocol != 'tcp':
+        raise ValueError(f"El modo {mode} solo existe para TCP")
+    if mode == 'reliable' and protocol != 'udp':
+        raise ValueError("El modo reliable solo existe para UDP")
+
+def build_server(args):
+    """crea el servidor pedido importando solo el módulo que hace falta"""
+    protocol, mode = args.protocol, args.mode
+    _check_mode(protocol, mode)
+    port = DEFAULT_PORTS[protocol] if args.port is None else args.port
+    log_callback = _quiet if args.quiet else None
+    if args.record and mode in ('bulk', 'reliable'):
+        raise ValueError(f"El modo {mode} no se puede grabar")
+    limits = (args.rate_limit, args.rate_limit_bytes, args.global_rate, args.global_bytes)
+    if any(limits) and mode in ('bulk', 'reliable'):
+        raise ValueError(f"El modo {mode} no admite límites de tasa")
+    if args.rcvbuf and (protocol != 'udp' or mode != 'echo' or args.engine != 'thread' or args.listen):
+        raise ValueError("--rcvbuf solo se aplica al servidor UDP con hilos (--mode echo --engine thread)")
+    if args.listen and (mode != 'echo' or args.engine != 'thread'):
+        raise ValueError("--listen solo admite --mode echo con --engine thread")
+    options = {'compression': args.compression}
+    if args.record:
+        from src.base.recording import Recorder
+        options['recorder'] = Recorder(args.record)
+    if any(limits):
+        from src.base.rate_limit import RateLimiter
+        options['rate_limiter'] = RateLimiter(*limits, action=args.limit_action)
+    if args.listen:
+        from src.listeners import ListenerManager, parse_endpoint
+        return ListenerManager([parse_endpoint(endpoint) for endpoint in args.listen], log_callback,
+                               backlog=args.backlog, **options)
+    if mode == 'bulk':
+        from src.bulk import BulkServer
+        return BulkServer(args.host, port, log_callback)
+    if mode == 'reliable':
+        from src.reliable_udp import ReliableUDPServer
+        return ReliableUDPServer(args.host, port, log_callback)
+    if args.engine == 'async':
+        from src.async_server import AsyncTCPServer, AsyncUDPServer
+        if protocol == 'tcp':
+            return AsyncTCPServer(args.host, port, log_callback, backlog=args.backlog, framed=mode == 'framed',
+                                  **options)
+        return AsyncUDPServer(args.host, port, log_callback, **options)
+    from src.server import TCPServer, UDPServer
+    if protocol == 'tcp':
+        return TCPServer(args.host, port, log_callback, backlog=args.backlog, framed=mode == 'framed',
+                         max_connections=args.max_connections, idle_timeout=args.idle_timeout, **options)
+    rcvbuf = None
+    if args.rcvbuf:
+        from src.bulk import parse_size
+        rcvbuf = parse_size(args.rcvbuf)
+    return UDPServer(args.host, port, log_callback, rcvbuf=rcvbuf, **options)
+
+def write_ready_file(path, info):
+    """escribe el archivo de listo de forma atómica (nunca se lee a medio escribir)"""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as f:
+        json.dump(info, f)
+    os.replace(temporary, path)
+
+def serve(args):
+    if args.profile_dir and args.metrics_port is None:
+        print("--profile-dir necesita --metrics-port", file=sys.stderr)
+        return 2
+    try:
+        server = build_server(args)
+    except (ValueError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    thread = threading.Thread(target=server.start, name='csat-server', daemon=True)
+    thread.start()
+    deadline = time.monotonic() + args.ready_timeout
+    while not server.ready.wait(0.05):
+        if not thread.is_alive() or time.monotonic() > deadline:
+            print(f"El servidor {args.protocol.upper()} no inició en {args.host}:{server.port}", file=sys.stderr)
+            return 1
+
+    if args.listen:
+        # un READY por listener; protocol/host/port del primero
+        listeners = server.listener_stats()
+        first = listeners[0]
+        info = {'protocol': first['protocol'], 'host': first['host'], 'port': first['port'],
+                'listeners': [{key: listener[key] for key in ('protocol', 'host', 'port')} for listener in listeners]}
+    else:
+        info = {'protocol': args.protocol, 'host': server.local_address[0], 'port': server.local_address[1]}
+    info.update(mode=args.mode, engine=args.engine, pid=os.getpid())
+    exporter = None
+    if args.metrics_port is not None:
+        from src.base.exporter import MetricsExporter
+        label = 'listeners' if args.listen else args.protocol
+        exporter = MetricsExporter({label: server}, port=args.metrics_port,
+                                   profile_dir=args.profile_dir).start()
+        info['metrics_url'] = exporter.url
+    # el manejador va antes del READY: un SIGTERM apenas listo igual limpia al salir
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    if args.ready_file:
+        write_ready_file(args.ready_file, info)
+    for listener in info.get('listeners', [info]):
+        print(f"READY {listener['protocol']} {listener['host']} {listener['port']} {info['pid']}", flush=True)
+
+    try:
+        while thread.is_alive() and not stopping.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        pass
+    if exporter is not None:
+        exporter.stop()
+    server.stop()
+    thread.join(timeout=5.0)
+    if server.recorder is not None:
+        server.recorder.close()
+    if args.ready_file:
+        try:
+            os.remove(args.ready_file)
+        except OSError:
+            pass
+    return 0
+
+def _messages(args):
+    """mensajes de los argumentos, de stdin (con '-') o generados con --count/--size"""
+    if args.messages == ['-']:
+        return [line.rstrip('\n') for line in sys.stdin if line.strip()]
+    if args.messages:
+        return list(args.messages)
+    return [f"{i:0{args.size}d}"[-args.size:] for i in range(args.count)]
+
+def send(args):
+    protocol, mode = args.protocol, args.mode
+    try:
+        _check_mode(protocol, mode)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    port = DEFAULT_PORTS[protocol] if args.port is None else args.port
+    log_callback = _quiet if args.quiet else None
+
+    if mode == 'bulk':
+        from src.bulk import BulkClient, parse_size
+        client = BulkClient(port, log_callback)
+        client.host = args.host
+        report = client.send_file(args.file) if args.file else client.send_payload(parse_size(args.bytes))
+        if report is None:
+            return 1
+        print(json.dumps(report, indent=2) if args.json else
+              f"{report['client']['bytes']} bytes, {report['client']['gbps']:.2f} Gbit/s")
+        return 0
+
+    messages = _messages(args)
+    compression = 'zlib' if args.compression else None
+    if mode == 'reliable':
+        from src.reliable_udp import ReliableUDPClient
+        client = ReliableUDPClient(port, log_callback)
+    elif protocol == 'udp':
+        from src.client import UDPClient
+        client = UDPClient(port, log_callback, compression=compression)
+    else:
+        from src.client import TCPClient
+        client = TCPClient(port, log_callback, framed=mode == 'framed', compression=compression)
+    client.host = args.host
+
+    started = time.perf_counter()
+    compression_stats = None
+    try:
+        if protocol == 'tcp' and not client.connect():
+            return 1
+        if mode in ('framed', 'reliable'):
+            confirmed = max(0, client.send_many(messages))
+        else:
+            confirmed = sum(1 for message in messages if client.send_message(message))
+        compression_stats = client.compression_stats()
+    finally:
+        client.close()
+    elapsed = time.perf_counter() - started
+
+    latency = client.metrics.latency().percentiles((50, 99))
+    summary = {
+        'sent': len(messages),
+        'confirmed': confirmed,
+        'seconds': elapsed,
+        'p50_us': latency[50] / 1000,
+        'p99_us': latency[99] / 1000,
+        'compression': compression_stats,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{confirmed}/{len(messages)} mensajes confirmados en {elapsed:.3f} s "
+              f"(p50 {summary['p50_us']:.1f} us, p99 {summary['p99_us']:.1f} us)")
+        if compression_stats:
+            print(f"Compresión: {compression_stats['ratio']:.2f}x, "
+                  f"{compression_stats['cpu_us_per_message']:.1f} us de CPU por mensaje")
+    return 0 if confirmed == len(messages) else 1
+
+def _profile_request(base, path, method='GET'):
+    request = urllib.request.Request(base + path, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # 409: captura en curso o parámetros inválidos; el cuerpo trae el motivo
+        return json.loads(e.read() or b'{}')
+
+def _print_profile(status):
+    from src.base.profiling import format_stages
+    capture = status.get('capture')
+    if capture:
+        state = "en curso" if capture['active'] else "terminada"
+        print(f"Captura {capture['kind']} de {capture['seconds']:g} s {state}: {capture['path']}")
+        if capture['summary']:
+            print(capture['summary'])
+    if status.get('stages'):
+        print("\n".join(format_stages(status['stages'])))
+
+def profile(args):
+    """pide una captura de perfilado a un serve con --profile-dir"""
+    base = f"http://{args.host}:{args.metrics_port}"
+    try:
+        if args.stop:
+            status = _profile_request(base, '/profile/stop', 'POST')
+        elif args.status:
+            status = _profile_request(base, '/profile')
+        else:
+            status = _profile_request(base, f"/profile/start?kind={args.kind}&seconds={args.seconds:g}", 'POST')
+            if 'error' not in status and args.wait:
+                time.sleep(args.seconds)
+                status = _profile_request(base, '/profile')
+                # la captura se guarda en el hilo del timer, puede tardar un poco más
+                while status['capture'] and status['capture']['summary'] is None:
+                    time.sleep(0.2)
+                    status = _profile_request(base, '/profile')
+    except (OSError, ValueError) as e:
+        print(f"No se pudo contactar el endpoint de perfilado en {base}: {e}", file=sys.stderr)
+        return 1
+    if 'error' in status:
+        print(status['error'], file=sys.stderr)
+        return 1
+    if args.json:
+        print(json.dumps(status, indent=2))
+    else:
+        _print_profile(status)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='csat', description="CSAT sin interfaz: servidores, envío y benchmark")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def network_options(command):
+        command.add_argument('--protocol', choices=('tcp', 'udp'), default='tcp')
+        command.add_argument('--mode', choices=MODES, default='echo')
+        command.add_argument('--host', default='localhost')
+        command.add_argument('--port', type=int, default=None, help="0 para que el sistema elija uno libre")
+        command.add_argument('--quiet', '-q', action='store_true', help="sin logs de cada mensaje")
+        command.add_argument('--compression', action='store_true', help="compresión zlib negociada (TCP con --mode framed)")
+
+    serve_parser = commands.add_parser('serve', help="iniciar un servidor")
+    network_options(serve_parser)
+    serve_parser.add_argument('--engine', choices=('thread', 'async'), default='thread')
+    serve_parser.add_argument('--listen', action='append', metavar='PROTO:HOST:PUERTO',
+                              help="varios listeners en un solo hilo, p. ej. tcp:0.0.0.0:54321 o udp:[::]:5555 "
+                                   "(repetible; reemplaza --protocol/--host/--port)")
+    serve_parser.add_argument('--backlog', type=int, default=128)
+    serve_parser.add_argument('--max-connections', type=int, default=None, help="pool fijo de workers (TCP con hilos)")
+    serve_parser.add_argument('--rcvbuf', help="SO_RCVBUF del servidor UDP (acepta K y M); los descartes "
+                                               "del kernel salen en las métricas como csat_udp_rx_dropped")
+    serve_parser.add_argument('--idle-timeout', type=float, default=None, help="cerrar conexiones inactivas (s)")
+    serve_parser.add_argument('--ready-file', help="escribir host, puerto y pid en JSON cuando esté escuchando")
+    serve_parser.add_argument('--ready-timeout', type=float, default=10.0)
+    serve_parser.add_argument('--metrics-port', type=int, default=None,
+                              help="métricas Prometheus en http://127.0.0.1:PUERTO/metrics (0 elige uno libre)")
+    serve_parser.add_argument('--rate-limit', type=float, default=None, metavar='MSGS', help="mensajes/s por IP")
+    serve_parser.add_argument('--rate-limit-bytes', type=float, default=None, metavar='BYTES', help="bytes/s por IP")
+    serve_parser.add_argument('--global-rate', type=float, default=None, metavar='MSGS', help="mensajes/s en total")
+    serve_parser.add_argument('--global-bytes', type=float, default=None, metavar='BYTES', help="bytes/s en total")
+    serve_parser.add_argument('--limit-action', choices=('drop', 'delay', 'slow_down'), default='drop',
+                              help="qué hacer con los mensajes que exceden el límite")
+    serve_parser.add_argument('--record', help="grabar los mensajes de los clientes en este archivo (ver replay)")
+    serve_parser.add_argument('--profile-dir', help="aceptar capturas de perfilado (ver profile) y guardarlas acá")
+
+    send_parser = commands.add_parser('send', help="enviar mensajes y esperar las confirmaciones")
+    network_options(send_parser)
+    send_parser.add_argument('messages', nargs='*', help="mensajes ('-' para leerlos de stdin)")
+    send_parser.add_argument('--count', '-n', type=int, default=5, help="mensajes generados si no hay otros")
+    send_parser.add_argument('--size', '-s', type=int, default=16, help="tamaño de los mensajes generados")
+    send_parser.add_argument('--file', help="archivo a enviar (modo bulk)")
+    send_parser.add_argument('--bytes', default='100M', help="bytes generados (modo bulk, acepta K, M y G)")
+    send_parser.add_argument('--json', action='store_true')
+
+    profile_parser = commands.add_parser('profile', help="capturar cProfile o tracemalloc de un serve en marcha")
+    profile_parser.add_argument('--host', default='127.0.0.1')
+    profile_parser.add_argument('--metrics-port', type=int, required=True, help="el --metrics-port del serve")
+    profile_parser.add_argument('--kind', choices=('cprofile', 'tracemalloc'), default='cprofile')
+    profile_parser.add_argument('--seconds', type=float, default=10.0, help="duración de la captura")
+    profile_parser.add_argument('--wait', action='store_true', help="esperar a que termine y mostrar el resumen")
+    profile_parser.add_argument('--stop', action='store_true', help="terminar antes la captura en curso")
+    profile_parser.add_argument('--status', action='store_true', help="mostrar la última captura y los tiempos por etapa")
+    profile_parser.add_argument('--json', action='store_true')
+
+    # bench reenvía sus argumentos a src/bench.py
+    commands.add_parser('bench', help="benchmark de los caminos de eco (ver csat bench --help)", add_help=False)
+    # replay reenvía sus argumentos a src/replay.py
+    commands.add_parser('replay', help="reproducir tráfico grabado (ver csat replay --help)", add_help=False)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'bench':
+        from src.bench import main as bench_main
+        return bench_main(extra)
+    if args.command == 'replay':
+        from src.replay import main as replay_main
+        return replay_main(extra)
+    if extra:
+        parser.error(f"argumentos no reconocidos: {' '.join(extra)}")
+    if getattr(args, 'compression', False) and args.protocol == 'tcp' and args.mode == 'echo':
+        # sin framing no hay límites de mensaje para comprimir: el cliente pasaría a framed solo
+        parser.error("--compression en TCP requiere --mode framed")
+    if args.command == 'serve':
+        return serve(args)
+    if args.command == 'profile':
+        return profile(args)
+    return send(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
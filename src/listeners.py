@@ -0,0 +1,529 @@
+"""
+Muchos listeners TCP y UDP (IPv4 e IPv6) en un solo hilo con selectors.
+
+Cada endpoint (protocolo, host, puerto) es un socket no bloqueante
+registrado en el mismo selector (epoll en Linux) junto con las conexiones
+TCP aceptadas, así que decenas de puertos cuestan un hilo en total. Los
+listeners se agregan y se quitan con el servidor en marcha sin tocar a los
+demás: desde otro hilo el cambio se encola y el bucle se despierta con un
+socketpair.
+
+    manager = ListenerManager([('tcp', '0.0.0.0', 54321), ('udp', '::', 5555)])
+    threading.Thread(target=manager.start, daemon=True).start()
+    manager.add_listener('tcp', '::1', 0)        # puerto elegido por el sistema
+    manager.remove_listener('tcp', '0.0.0.0', 54321)
+
+Responde como TCPServer/UDPServer en modo eco (prefijo + payload) y admite
+log_sink, capture, flow_table, recorder y rate_limiter de BaseServer.
+"""
+import collections
+import heapq
+import itertools
+import logging
+import selectors
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.server import ACK_PREFIX, BaseServer, send_ack_to
+from src.base.log_sink import LazyText
+from src.base.rate_limit import DELAY, SLOW_DOWN, slow_down_reply
+
+logger = logging.getLogger(__name__)
+
+TCP = 'tcp'
+UDP = 'udp'
+PROTOCOLS = (TCP, UDP)
+SOCKET_TYPES = {TCP: socket.SOCK_STREAM, UDP: socket.SOCK_DGRAM}
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+def parse_endpoint(text):
+    """'tcp:0.0.0.0:54321' o 'udp:[::1]:5555' -> ('tcp', '0.0.0.0', 54321)"""
+    protocol, _, rest = text.partition(':')
+    host, _, port = rest.rpartition(':')
+    if protocol not in PROTOCOLS or not host or not port.isdigit():
+        raise ValueError(f"Endpoint inválido: {text} (se espera protocolo:host:puerto)")
+    return protocol, host.strip('[]'), int(port)
+
+def format_endpoint(protocol, host, port):
+    return f"{protocol}:[{host}]:{port}" if ':' in host else f"{protocol}:{host}:{port}"
+
+class Listener:
+    """un endpoint en escucha y sus contadores"""
+    def __init__(self, protocol, host, sock):
+        self.protocol = protocol
+        self.host = host
+        self.sock = sock
+        self.local_address = sock.getsockname()[:2]
+        # con port=0 el puerto real lo eligió el sistema
+        self.port = self.local_address[1]
+        self.connections = set()
+        self.accepted = 0
+        self.messages = 0
+        self.bytes = 0
+
+    @property
+    def key(self):
+        return (self.protocol, self.host, self.port)
+
+    def stats(self):
+        return {
+            'protocol': self.protocol,
+            'host': self.host,
+            'port': self.port,
+            'connections': len(self.connections),
+            'accepted': self.accepted,
+            'messages': self.messages,
+            'bytes': self.bytes,
+        }
+
+class _Connection:
+    """conexión TCP aceptada: socket no bloqueante y lo que falta enviarle"""
+    __slots__ = ('sock', 'address', 'listener', 'pending', 'held', 'events', 'closed')
+
+    def __init__(self, sock, address, listener):
+        self.sock = sock
+        self.address = address
+        self.listener = listener
+        self.pending = bytearray()
+        # respuestas en orden detrás de un mensaje demorado: [lista, función, args]
+        self.held = collections.deque()
+        self.events = selectors.EVENT_READ
+        self.closed = False
+
+class ListenerManager(BaseServer):
+    """servidor eco con un conjunto variable de listeners TCP/UDP sobre un solo selector"""
+    RECV_SIZE = 1024
+    # datagramas que se leen por evento antes de atender a los demás sockets
+    UDP_BATCH = 64
+    # con más bytes sin enviar se deja de leer la conexión hasta que el cliente los reciba
+    MAX_PENDING = 1024 * 1024
+
+    def __init__(self, endpoints=(), log_callback=None, backlog=128, **options):
+        # options: log_sink, capture, flow_table, recorder, rate_limiter (ver BaseServer)
+        if options.get('compression'):
+            raise ValueError("ListenerManager no admite compresión")
+        super().__init__(None, None, log_callback, **options)
+        self.backlog = backlog
+        self.listeners = {}
+        self.selector = None
+        # protege listeners y el traspaso al hilo del selector
+        self._lock = threading.Lock()
+        self._loop_thread = None
+        self._calls = collections.deque()
+        self._wakeup_r = self._wakeup_w = None
+        self._connections = set()
+        # mensajes demorados por el rate_limiter: (instante, orden, función, argumentos)
+        self._deferred = []
+        self._sequence = itertools.count()
+        for protocol, host, port in endpoints:
+            self.add_listener(protocol, host, port)
+
+    def _bind(self, protocol, host, port):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Protocolo no soportado: {protocol}")
+        family, kind, proto, _, address = socket.getaddrinfo(
+            host, port, type=SOCKET_TYPES[protocol], flags=socket.AI_PASSIVE)[0]
+        sock = socket.socket(family, kind, proto)
+        try:
+            self._set_socket_options(sock)
+            if family == socket.AF_INET6:
+                # solo IPv6: '0.0.0.0' y '::' pueden escuchar el mismo puerto por separado
+                sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            sock.bind(address)
+            if protocol == TCP:
+                sock.listen(self.backlog)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def add_listener(self, protocol, host='localhost', port=0):
+        """abre un endpoint, también con el servidor en marcha; devuelve el Listener
+
+        El bind se hace en el hilo que llama, así los errores (puerto en uso,
+        host inválido) se lanzan acá y el puerto real ya se conoce.
+        """
+        listener = Listener(protocol, host, self._bind(protocol, host, port))
+        with self._lock:
+            if listener.key in self.listeners:
+                listener.sock.close()
+                raise ValueError(f"Ya existe el listener {format_endpoint(*listener.key)}")
+            self.listeners[listener.key] = listener
+        self._call(self._register, listener)
+        self._log(f"Escuchando en {format_endpoint(*listener.key)}")
+        return listener
+
+    def remove_listener(self, protocol, host, port, close_connections=False):
+        """deja de escuchar en el endpoint; las conexiones TCP ya aceptadas siguen salvo close_connections"""
+        with self._lock:
+            listener = self.listeners.pop((protocol, host, port), None)
+        if listener is None:
+            raise ValueError(f"No existe el listener {format_endpoint(protocol, host, port)}")
+        self._call(self._close_listener, listener, close_connections)
+        self._log(f"Listener {format_endpoint(*listener.key)} cerrado")
+        return listener
+
+    def listener_stats(self):
+        with self._lock:
+            return [listener.stats() for listener in self.listeners.values()]
+
+    def _call(self, function, *args):
+        """ejecuta function en el hilo del selector (directo si no está corriendo o ya estamos en él)"""
+        with self._lock:
+            queued = self._loop_thread is not None and threading.current_thread() is not self._loop_thread
+            if queued:
+                self._calls.append((function, args))
+        if queued:
+            self._wake()
+        else:
+            function(*args)
+
+    def _wake(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except (AttributeError, OSError):
+            # sin bucle, o el socketpair ya está lleno: el bucle se va a despertar igual
+            pass
+
+    def _drain_wakeup(self, _, mask):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        self._run_calls()
+
+    def _run_calls(self):
+        calls = self._calls
+        while calls:
+            function, args = calls.popleft()
+            function(*args)
+
+    def _register(self, listener):
+        # sin selector (todavía no arrancó) el listener se registra en start()
+        if self.selector is None or listener.sock.fileno() == -1:
+            return
+        handler = self._accept if listener.protocol == TCP else self._read_datagrams
+        try:
+            self.selector.register(listener.sock, selectors.EVENT_READ, (handler, listener))
+        except KeyError:
+            pass
+
+    def _close_listener(self, listener, close_connections):
+        if self.selector is not None:
+            try:
+                self.selector.unregister(listener.sock)
+            except (KeyError, ValueError):
+                pass
+        listener.sock.close()
+        if close_connections:
+            for connection in list(listener.connections):
+                self._close_connection(connection)
+
+    def start(self):
+        """corre el bucle del selector en el hilo actual hasta stop()"""
+        try:
+            with self._lock:
+                self.selector = selectors.DefaultSelector()
+                self._wakeup_r, self._wakeup_w = socket.socketpair()
+                self._wakeup_r.setblocking(False)
+                self._wakeup_w.setblocking(False)
+                self.selector.register(self._wakeup_r, selectors.EVENT_READ, (self._drain_wakeup, None))
+                self._loop_thread = threading.current_thread()
+                listeners = list(self.listeners.values())
+            for listener in listeners:
+                self._register(listener)
+            self.running = True
+            self.ready.set()
+            self._log(f"Servidor con {len(listeners)} listeners iniciado")
+            self._run()
+        except Exception as e:
+            self._log(f"Error en el servidor de listeners: {e}")
+        finally:
+            self._shutdown()
+            self._log("Servidor de listeners terminado")
+
+    def _run(self):
+        select = self.selector.select
+        while self.running:
+            # sin demorados el select espera sin timeout: stop() despierta con el socketpair
+            timeout = self._run_deferred() if self._deferred else None
+            for key, mask in select(timeout):
+                handler, target = key.data
+                try:
+                    handler(target, mask)
+                except Exception as e:
+                    self.metrics.error()
+                    self._log(f"Error en el bucle de listeners: {e}")
+
+    def _run_deferred(self):
+        """procesa los mensajes demorados que ya llegaron a su turno; devuelve el próximo timeout"""
+        deferred = self._deferred
+        now = time.monotonic()
+        while deferred and deferred[0][0] <= now:
+            _, _, function, args = heapq.heappop(deferred)
+            try:
+                function(*args)
+            except Exception as e:
+                self.metrics.error()
+                self._log(f"Error al procesar mensaje demorado: {e}")
+        return deferred[0][0] - now if deferred else None
+
+    def _defer(self, wait, function, *args):
+        heapq.heappush(self._deferred, (time.monotonic() + wait, next(self._sequence), function, args))
+
+    def stop(self):
+        """detiene el bucle; los listeners y conexiones se cierran en su hilo"""
+        self.running = False
+        self.ready.clear()
+        self._wake()
+        self._log(f"Servidor {self.__class__.__name__} detenido")
+
+    def _shutdown(self):
+        with self._lock:
+            self._loop_thread = None
+            listeners = list(self.listeners.values())
+            self.listeners.clear()
+        # cierres de listeners pedidos justo antes de detener
+        self._run_calls()
+        for connection in list(self._connections):
+            self._close_connection(connection)
+        for listener in listeners:
+            listener.sock.close()
+        self._deferred.clear()
+        if self.capture is not None:
+            self.capture.close()
+        if self.selector is not None:
+            self.selector.close()
+            self.selector = None
+        for sock in (self._wakeup_r, self._wakeup_w):
+            if sock is not None:
+                sock.close()
+        self._wakeup_r = self._wakeup_w = None
+
+    def _accept(self, listener, mask):
+        # se aceptan todas las conexiones en cola (hasta backlog) por evento
+        for _ in range(self.backlog):
+            try:
+                sock, address = listener.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self.metrics.error()
+                self._log(f"Error al aceptar conexión en {format_endpoint(*listener.key)}: {e}")
+                return
+            sock.setblocking(False)
+            connection = _Connection(sock, address[:2], listener)
+            self.selector.register(sock, selectors.EVENT_READ, (self._on_connection, connection))
+            self._connections.add(connection)
+            listener.connections.add(connection)
+            listener.accepted += 1
+            self.metrics.connection_opened()
+            self._emit("Conexión aceptada de {}", connection.address)
+
+    def _on_connection(self, connection, mask):
+        if mask & selectors.EVENT_WRITE:
+            self._flush(connection)
+        if mask & selectors.EVENT_READ and not connection.closed:
+            self._read_tcp(connection)
+
+    def _read_tcp(self, connection):
+        try:
+            data = connection.sock.recv(self.RECV_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self.metrics.error()
+            self._log(f"Error al manejar cliente {connection.address}: {e}")
+            data = b''
+        if not data:
+            self._close_connection(connection)
+            return
+        started = time.perf_counter_ns()
+        address = connection.address
+        if self.capture is not None:
+            self.capture.write('tcp', address, connection.listener.local_address, data)
+        if self.flow_table is not None:
+            self.flow_table.record('tcp', address, len(data))
+        if self.rate_limiter is not None:
+            action, wait = self._limit(address, len(data))
+            if action == DELAY:
+                # solo se demora a este cliente: el bucle sigue con los demás
+                entry = [False, self._reply_tcp, (connection, data)]
+                connection.held.append(entry)
+                self._defer(wait, self._release_tcp, connection, entry)
+                return
+            if action == SLOW_DOWN:
+                self._reply_in_order(connection, self._send, connection, (slow_down_reply(wait),))
+                return
+            if action is not None:
+                return
+        self._reply_in_order(connection, self._reply_tcp, connection, data, started)
+
+    def _reply_in_order(self, connection, function, *args):
+        """responde ya, salvo que haya un mensaje demorado antes: entonces espera detrás de él"""
+        if connection.held:
+            connection.held.append([True, function, args])
+        else:
+            function(*args)
+
+    def _release_tcp(self, connection, entry):
+        """el mensaje demorado llegó a su turno: salen él y los que esperaban detrás"""
+        entry[0] = True
+        held = connection.held
+        while held and held[0][0]:
+            _, function, args = held.popleft()
+            function(*args)
+
+    def _reply_tcp(self, connection, data, started=None):
+        if connection.closed:
+            # se cerró mientras el mensaje estaba demorado
+            return
+        if started is None:
+            started = time.perf_counter_ns()
+        address = connection.address
+        if self.recorder is not None:
+            self.recorder.record('tcp', address, data)
+        listener = connection.listener
+        listener.messages += 1
+        listener.bytes += len(data)
+
+        client_ip, client_port = address
+        self._emit("Mensaje recibido desde la IP {} puerto {}.", client_ip, client_port)
+        self._emit("Tiempo de recepción: {ts}")
+
+        self._send(connection, (ACK_PREFIX, data))
+        self.metrics.message(len(data), time.perf_counter_ns() - started)
+
+    def _send(self, connection, buffers):
+        """envía sin bloquear; lo que no entra queda en pending hasta que el socket acepte más"""
+        if connection.pending:
+            for buffer in buffers:
+                connection.pending += buffer
+        else:
+            try:
+                if _HAS_SENDMSG:
+                    sent = connection.sock.sendmsg(buffers)
+                else:
+                    sent = connection.sock.send(b''.join(buffers))
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError as e:
+                self.metrics.error()
+                self._log(f"Error al responder a {connection.address}: {e}")
+                self._close_connection(connection)
+                return
+            if sent == sum(len(buffer) for buffer in buffers):
+                return
+            connection.pending += b''.join(buffers)[sent:]
+        self._update_events(connection)
+
+    def _flush(self, connection):
+        try:
+            sent = connection.sock.send(connection.pending)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self.metrics.error()
+            self._log(f"Error al responder a {connection.address}: {e}")
+            self._close_connection(connection)
+            return
+        del connection.pending[:sent]
+        self._update_events(connection)
+
+    def _update_events(self, connection):
+        events = 0
+        if connection.pending:
+            events |= selectors.EVENT_WRITE
+        if len(connection.pending) < self.MAX_PENDING:
+            events |= selectors.EVENT_READ
+        if events != connection.events:
+            connection.events = events
+            self.selector.modify(connection.sock, events, (self._on_connection, connection))
+
+    def _close_connection(self, connection):
+        if connection.closed:
+            return
+        connection.closed = True
+        connection.held.clear()
+        self._connections.discard(connection)
+        connection.listener.connections.discard(connection)
+        if self.selector is not None:
+            try:
+                self.selector.unregister(connection.sock)
+            except (KeyError, ValueError):
+                pass
+        self._end_tcp_session(connection.address, connection.listener.local_address)
+        self._sample_tcp_rtt(connection.sock, connection.address)
+        connection.sock.close()
+        self.metrics.connection_closed()
+        self._emit("Conexión cerrada con {}", connection.address)
+
+    def _read_datagrams(self, listener, mask):
+        sock = listener.sock
+        for _ in range(self.UDP_BATCH):
+            try:
+                data, address = sock.recvfrom(self.RECV_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self.metrics.error()
+                self._log(f"Error al recibir mensaje UDP en {format_endpoint(*listener.key)}: {e}")
+                return
+            self._handle_datagram(listener, data, address)
+
+    def _handle_datagram(self, listener, data, address):
+        started = time.perf_counter_ns()
+        # address completa para responder (4 elementos en IPv6), (ip, puerto) para el resto
+        client = address[:2]
+        if self.capture is not None:
+            self.capture.write('udp', client, listener.local_address, data)
+        if self.flow_table is not None:
+            self.flow_table.record('udp', client, len(data))
+        if self.rate_limiter is not None:
+            action, wait = self._limit(client, len(data))
+            if action == DELAY:
+                self._defer(wait, self._reply_udp, listener, data, address)
+                return
+            if action == SLOW_DOWN:
+                try:
+                    listener.sock.sendto(slow_down_reply(wait), address)
+                except (BlockingIOError, InterruptedError):
+                    self.metrics.error()
+                return
+            if action is not None:
+                return
+        self._reply_udp(listener, data, address, started)
+
+    def _reply_udp(self, listener, data, address, started=None):
+        if listener.sock.fileno() == -1:
+            # el listener se quitó mientras el datagrama estaba demorado
+            return
+        if started is None:
+            started = time.perf_counter_ns()
+        client = address[:2]
+        if self.recorder is not None:
+            self.recorder.record('udp', client, data)
+        listener.messages += 1
+        listener.bytes += len(data)
+
+        self._emit("Mensaje recibido desde la IP {} puerto {}: {}", client[0], client[1], LazyText(data))
+        self._emit("Tiempo de recepción: {ts}")
+
+        try:
+            send_ack_to(listener.sock, data, address)
+        except (BlockingIOError, InterruptedError):
+            # buffer de envío lleno: en UDP la confirmación se pierde como un datagrama más
+            self.metrics.error()
+            return
+        self.metrics.message(len(data), time.perf_counter_ns() - started)
+        self._emit("Respuesta enviada a {}", client)
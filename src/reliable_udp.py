@@ -0,0 +1,362 @@
+"""
+Modo UDP confiable: números de secuencia, ventana deslizante, ACK acumulativo
+y selectivo (SACK) y RTO adaptativo según la estimación de RTT (RFC 6298).
+
+Los paquetes confiables empiezan con el byte 0xFF, que nunca aparece al
+inicio de un texto UTF-8, así que ReliableUDPServer sigue atendiendo a los
+clientes UDP normales igual que UDPServer.
+"""
+import random
+import socket
+import struct
+import time
+import logging
+from collections import OrderedDict
+import sys
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.base.log_sink import LazyText
+from src.client import UDPClient
+from src.server import UDPServer
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0xFF
+DATA = 1
+ACK = 2
+# magic, tipo, id de sesión, secuencia
+DATA_HEADER = struct.Struct('!BBII')
+# magic, tipo, id de sesión, ack acumulativo (próxima secuencia esperada), bitmap SACK
+ACK_PACKET = struct.Struct('!BBIIQ')
+SACK_BITS = 64
+# segmentos posteriores confirmados que hacen falta para dar uno por perdido
+DUP_THRESHOLD = 3
+MAX_PAYLOAD = 1400 - DATA_HEADER.size
+
+class LossInjector:
+    """descarta paquetes salientes con probabilidad loss_rate (para pruebas locales)"""
+    def __init__(self, loss_rate=0.0, seed=None):
+        self.loss_rate = loss_rate
+        self.random = random.Random(seed)
+        self.dropped = 0
+
+    def should_drop(self):
+        if self.loss_rate and self.random.random() < self.loss_rate:
+            self.dropped += 1
+            return True
+        return False
+
+class _Segment:
+    __slots__ = ('payload', 'packet', 'sent_at', 'retries', 'retransmitted')
+
+    def __init__(self, payload, packet, sent_at):
+        self.payload = payload
+        self.packet = packet
+        self.sent_at = sent_at
+        self.retries = 0
+        self.retransmitted = False
+
+class ReliableUDPClient(UDPClient):
+    def __init__(self, port=5555, log_callback=None, log_sink=None, window=64,
+                 min_rto=0.02, max_rto=2.0, max_retries=12, loss_rate=0.0, seed=None):
+        super().__init__(port, log_callback, log_sink)
+        self.window = window
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.max_retries = max_retries
+        self.loss = LossInjector(loss_rate, seed)
+        self.session_id = random.getrandbits(32)
+        self._next_seq = 0
+        self._in_flight = OrderedDict()
+        # estimación de RTT (RFC 6298)
+        self.srtt = None
+        self.rttvar = None
+        self.rto = 1.0
+        self.retransmissions = 0
+        self.fast_retransmits = 0
+        self.acked = 0
+
+    def _send_packet(self, packet):
+        if self.loss.should_drop():
+            return
+        self.socket.sendto(packet, (self.host, self.port))
+
+    def _update_rtt(self, sample):
+        """actualiza SRTT/RTTVAR y recalcula el RTO"""
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - sample)
+            self.srtt = 0.875 * self.srtt + 0.125 * sample
+        self.rto = min(self.max_rto, max(self.min_rto, self.srtt + 4 * self.rttvar))
+
+    def _send_new(self, payload):
+        if len(payload) > MAX_PAYLOAD:
+            raise ValueError(f"Mensaje de {len(payload)} bytes supera el máximo de {MAX_PAYLOAD}")
+        seq = self._next_seq
+        self._next_seq += 1
+        packet = DATA_HEADER.pack(MAGIC, DATA, self.session_id, seq) + payload
+        self._in_flight[seq] = _Segment(payload, packet, time.monotonic())
+        self._send_packet(packet)
+        return seq
+
+    def _retransmit(self, seq, segment, now):
+        segment.retries += 1
+        if segment.retries > self.max_retries:
+            raise TimeoutError(f"Sin confirmación para el mensaje {seq} tras {self.max_retries} reintentos")
+        segment.retransmitted = True
+        segment.sent_at = now
+        self.retransmissions += 1
+        self._send_packet(segment.packet)
+
+    def _acknowledge(self, seq, now):
+        segment = self._in_flight.pop(seq, None)
+        if segment is None:
+            return None
+        self.acked += 1
+        self.metrics.message(len(segment.payload), int((now - segment.sent_at) * 1e9))
+        # algoritmo de Karn: no se mide RTT con segmentos retransmitidos
+        return None if segment.retransmitted else now - segment.sent_at
+
+    def _process_ack(self, packet):
+        try:
+            magic, kind, session_id, cumulative, sack = ACK_PACKET.unpack(packet)
+        except struct.error:
+            return
+        if magic != MAGIC or kind != ACK or session_id != self.session_id:
+            return
+        now = time.monotonic()
+        sample = None
+        highest = cumulative - 1
+        while self._in_flight:
+            seq = next(iter(self._in_flight))
+            if seq >= cumulative:
+                break
+            sample = self._acknowledge(seq, now) or sample
+        for bit in range(SACK_BITS):
+            if sack >> bit & 1:
+                highest = cumulative + 1 + bit
+                sample = self._acknowledge(highest, now) or sample
+        if sample is not None:
+            self._update_rtt(sample)
+        if highest - cumulative < DUP_THRESHOLD:
+            return
+
+        # detección de pérdidas por SACK: si llegaron DUP_THRESHOLD segmentos
+        # posteriores, los huecos se retransmiten sin esperar el RTO
+        recent = self.srtt or self.min_rto
+        for seq, segment in list(self._in_flight.items()):
+            if seq > highest - DUP_THRESHOLD:
+                break
+            if now - segment.sent_at >= recent:
+                self.fast_retransmits += 1
+                self._retransmit(seq, segment, now)
+
+    def _service(self):
+        """espera ACKs hasta el próximo vencimiento de RTO y retransmite lo vencido"""
+        now = time.monotonic()
+        deadline = min(segment.sent_at for segment in self._in_flight.values()) + self.rto
+        self.socket.settimeout(max(0.0005, deadline - now))
+        try:
+            packet, _ = self.socket.recvfrom(2048)
+            self._process_ack(packet)
+            self.socket.setblocking(False)
+            # vaciamos los ACK que ya estén en cola
+            while True:
+                try:
+                    packet, _ = self.socket.recvfrom(2048)
+                except BlockingIOError:
+                    break
+                self._process_ack(packet)
+        except socket.timeout:
+            pass
+        now = time.monotonic()
+        expired = [(seq, segment) for seq, segment in self._in_flight.items()
+                   if now - segment.sent_at >= self.rto]
+        if expired:
+            # backoff exponencial ante timeout
+            self.rto = min(self.max_rto, self.rto * 2)
+            for seq, segment in expired:
+                self._retransmit(seq, segment, now)
+
+    def send_many(self, messages):
+        """envía mensajes con ventana deslizante; devuelve cuántos se confirmaron o -1 si falló"""
+        acked_before = self.acked
+        pending = iter(messages)
+        exhausted = False
+        start = time.perf_counter()
+        try:
+            while True:
+                while not exhausted and len(self._in_flight) < self.window:
+                    try:
+                        message = next(pending)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    self._send_new(message.encode() if isinstance(message, str) else bytes(message))
+                    self.message_count += 1
+                if not self._in_flight:
+                    if exhausted:
+                        break
+                    continue
+                self._service()
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al enviar mensajes UDP confiables: {e}")
+            return -1
+        finally:
+            self.socket.settimeout(5.0)
+        count = self.acked - acked_before
+        elapsed = time.perf_counter() - start
+        self._log(f"{count} mensajes confirmados en {elapsed:.3f} s "
+                  f"({self.retransmissions} retransmisiones, RTO {self.rto * 1000:.1f} ms)")
+        return count
+
+    def send_message(self, message):
+        """envía un mensaje de forma confiable (mismas reglas que UDPClient: mínimo 5 y 'end')"""
+        if message.lower() == 'end':
+            if self.message_count < 5:
+                self._log(f"Error: Debes enviar al menos 5 mensajes. Llevas {self.message_count}")
+                return True
+            return False
+        try:
+            self._send_new(message.encode())
+            self.message_count += 1
+            self._emit("Mensaje: {}", message)
+            self._emit("IP de destino: {}", self.host)
+            self._emit("Puerto de destino: {}", self.port)
+            self._emit("Tiempo de envío: {ts}")
+            while self._in_flight:
+                self._service()
+            return True
+        except TimeoutError:
+            self.metrics.error()
+            self._log("Timeout: No se recibió respuesta del servidor")
+            return False
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al enviar mensaje UDP: {e}")
+            return False
+        finally:
+            if self.socket:
+                self.socket.settimeout(5.0)
+
+    def stats(self):
+        return {
+            'acked': self.acked,
+            'in_flight': len(self._in_flight),
+            'retransmissions': self.retransmissions,
+            'fast_retransmits': self.fast_retransmits,
+            'srtt_ms': (self.srtt or 0.0) * 1000,
+            'rto_ms': self.rto * 1000,
+            'injected_losses': self.loss.dropped,
+        }
+
+class _Receiver:
+    """estado de recepción de una sesión confiable"""
+    __slots__ = ('expected', 'buffered', 'last_seen')
+
+    def __init__(self):
+        self.expected = 0
+        self.buffered = {}
+        self.last_seen = time.monotonic()
+
+class ReliableUDPServer(UDPServer):
+    RECV_SIZE = 2048
+    # segmentos fuera de orden que se guardan por sesión
+    MAX_OUT_OF_ORDER = 1024
+    SESSION_TIMEOUT = 60.0
+
+    def __init__(self, host='localhost', port=5555, log_callback=None, loss_rate=0.0, seed=None, **options):
+        super().__init__(host, port, log_callback, **options)
+        self.loss = LossInjector(loss_rate, seed)
+        self.sessions = {}
+        self._last_sweep = time.monotonic()
+
+    def _handle_datagram(self, data, address):
+        """atiende paquetes confiables; cualquier otro datagrama sigue el camino normal"""
+        if not data or data[0] != MAGIC:
+            return super()._handle_datagram(data, address)
+        if len(data) < DATA_HEADER.size:
+            return
+        started = time.perf_counter_ns()
+        if self.loss.should_drop():
+            # simulamos la pérdida del paquete entrante
+            return
+        magic, kind, session_id, seq = DATA_HEADER.unpack_from(data)
+        if kind != DATA:
+            return
+        key = (address, session_id)
+        receiver = self.sessions.get(key)
+        if receiver is None:
+            receiver = self.sessions[key] = _Receiver()
+            self._emit("Sesión UDP confiable {} iniciada desde {}", session_id, address)
+        receiver.last_seen = time.monotonic()
+
+        payload = data[DATA_HEADER.size:]
+        if seq == receiver.expected:
+            self._deliver(payload, address, started)
+            receiver.expected += 1
+            while receiver.expected in receiver.buffered:
+                self._deliver(receiver.buffered.pop(receiver.expected), address, started)
+                receiver.expected += 1
+        elif seq > receiver.expected and seq - receiver.expected <= self.MAX_OUT_OF_ORDER:
+            receiver.buffered.setdefault(seq, payload)
+
+        sack = 0
+        for bit in range(SACK_BITS):
+            if receiver.expected + 1 + bit in receiver.buffered:
+                sack |= 1 << bit
+        ack = ACK_PACKET.pack(MAGIC, ACK, session_id, receiver.expected, sack)
+        self.server_socket.sendto(ack, address)
+        self._sweep_sessions()
+
+    def _deliver(self, payload, address, started):
+        """entrega en orden un mensaje confiable a la capa de aplicación"""
+        client_ip, client_port = address
+        self._emit("Mensaje recibido desde la IP {} puerto {}: {}", client_ip, client_port, LazyText(payload))
+        self._emit("Tiempo de recepción: {ts}")
+        self.metrics.message(len(payload), time.perf_counter_ns() - started)
+
+    def _sweep_sessions(self):
+        """elimina sesiones inactivas (como mucho una pasada por segundo)"""
+        now = time.monotonic()
+        if now - self._last_sweep < 1.0:
+            return
+        self._last_sweep = now
+        for key in [k for k, r in self.sessions.items() if now - r.last_seen > self.SESSION_TIMEOUT]:
+            del self.sessions[key]
+
+if __name__ == '__main__':
+    print("Seleccione el modo UDP confiable:")
+    print("1. Servidor")
+    print("2. Cliente")
+    eleccion = input("Ingrese su elección (1 o 2): ")
+
+    if eleccion == "1":
+        server = ReliableUDPServer()
+        try:
+            server.start()
+        except KeyboardInterrupt:
+            server.stop()
+    elif eleccion == "2":
+        client = ReliableUDPClient()
+        try:
+            print("\n=== Cliente UDP confiable ===")
+            print("Ingresa mensajes (min 5). Escribe 'end' para terminar.")
+            while True:
+                message = input()
+                if not client.send_message(message):
+                    break
+        except KeyboardInterrupt:
+            logger.info("Programa interrumpido por el usuario")
+        finally:
+            client.close()
+    else:
+        print("Opción inválida")
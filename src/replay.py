@@ -0,0 +1,298 @@
+"""
+Reproducción de tráfico grabado (src/base/recording.py) para pruebas de carga repetibles.
+
+Cada sesión grabada se reproduce como una conexión TCP o un socket UDP
+propio, todas en un mismo event loop. Los mensajes salen en el instante
+que les toca según la grabación (a 1x, Nx o a máxima velocidad), sin
+esperar la confirmación del anterior, así que se conservan los tiempos
+entre llegadas aunque el servidor se atrase. Se reporta cuánto se desvió
+cada envío del instante programado (drift) y la latencia de confirmación.
+
+    python -m src.csat serve --protocol tcp --record /tmp/trafico.rec
+    python -m src.replay /tmp/trafico.rec --port 54321 --speed 2
+"""
+import argparse
+import asyncio
+import collections
+import json
+import sys
+import time
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.base.acks import PlainAckMatcher
+from src.base.framing import HEADER, encode_frame
+from src.base.histogram import LatencyHistogram
+from src.base.recording import load_sessions
+from src.server import ACK_PREFIX
+
+DEFAULT_PORTS = {'tcp': 54321, 'udp': 5555}
+
+def parse_speed(value):
+    """'max' (sin esperas) o un factor de velocidad: 1 = tiempo real, 2 = el doble de rápido"""
+    if value.lower() == 'max':
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("la velocidad debe ser mayor que 0 o 'max'")
+    return speed
+
+class _ReplayDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, session):
+        self.session = session
+
+    def datagram_received(self, data, address):
+        self.session.acked()
+
+    def error_received(self, exc):
+        self.session.replayer.errors += 1
+
+class _Session:
+    """sesión UDP en reproducción: instantes de envío pendientes de confirmar"""
+    def __init__(self, replayer):
+        self.replayer = replayer
+        self.pending = collections.deque()
+        self.done = asyncio.Event()
+        self.closing = False
+
+    def acked(self):
+        if self.pending:
+            self.replayer._acked(self.pending.popleft())
+        if self.closing and not self.pending:
+            self.done.set()
+
+class Replayer:
+    """reproduce las sesiones de una grabación contra host:port
+
+    speed=None reproduce a máxima velocidad (sin drift que medir); copies > 1
+    lanza cada sesión varias veces a la vez para multiplicar la carga.
+    """
+    def __init__(self, sessions, host='localhost', port=None, speed=1.0, framed=False, copies=1, timeout=5.0):
+        self.sessions = sessions
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.framed = framed
+        self.copies = copies
+        self.timeout = timeout
+        self.drift = LatencyHistogram()
+        self.latency = LatencyHistogram()
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.failures = []
+        self.origin = None
+        self.first_ts = None
+
+    def _port(self, protocol):
+        return DEFAULT_PORTS[protocol] if self.port is None else self.port
+
+    async def _wait_turn(self, ts):
+        """duerme hasta el instante programado del mensaje y registra el drift"""
+        if self.speed is None:
+            return
+        target = self.origin + (ts - self.first_ts) / self.speed / 1e9
+        delay = target - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # un envío adelantado (sleep impreciso) cuenta como drift 0
+        self.drift.record(max(0, int((time.monotonic() - target) * 1e9)))
+
+    async def _read_acks(self, reader, sent):
+        """lee las confirmaciones en orden; sent trae (instante de envío, payload) y None al final"""
+        if not self.framed:
+            return await self._read_plain_acks(reader, sent)
+        while True:
+            item = await sent.get()
+            if item is None:
+                return
+            (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+            await reader.readexactly(length)
+            self._acked(item[0])
+
+    async def _read_plain_acks(self, reader, sent):
+        """confirmaciones sin framing: el servidor responde prefijo + lo que leyó en cada recv
+
+        Si junta varios mensajes en un recv llega un solo prefijo para todos,
+        así que se recorre el eco contra lo enviado en vez de esperar una
+        confirmación por mensaje.
+        """
+        acks = PlainAckMatcher(ACK_PREFIX, pipelined=True)
+        while True:
+            item = await sent.get()
+            if item is None:
+                return
+            started, payload = item
+            acks.expect(payload)
+            done = acks.feed()
+            while not done:
+                data = await reader.read(65536)
+                if not data:
+                    raise ConnectionError("el servidor cerró la conexión")
+                done = acks.feed(data)
+            self._acked(started)
+
+    def _acked(self, started):
+        self.latency.record(time.perf_counter_ns() - started)
+        self.acked += 1
+
+    async def _replay_tcp(self, messages):
+        await self._wait_turn(messages[0][0])
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self._port('tcp')), self.timeout)
+        sent = asyncio.Queue()
+        acks = asyncio.ensure_future(self._read_acks(reader, sent))
+        try:
+            for index, (ts, payload) in enumerate(messages):
+                if index:
+                    await self._wait_turn(ts)
+                sent.put_nowait((time.perf_counter_ns(), payload))
+                writer.write(encode_frame(payload) if self.framed else payload)
+                self.sent += 1
+                await writer.drain()
+            sent.put_nowait(None)
+            await asyncio.wait_for(acks, self.timeout)
+        finally:
+            acks.cancel()
+            writer.close()
+
+    async def _replay_udp(self, messages):
+        session = _Session(self)
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ReplayDatagramProtocol(session), remote_addr=(self.host, self._port('udp')))
+        try:
+            for ts, payload in messages:
+                await self._wait_turn(ts)
+                session.pending.append(time.perf_counter_ns())
+                transport.sendto(payload)
+                self.sent += 1
+            session.closing = True
+            if session.pending:
+                try:
+                    await asyncio.wait_for(session.done.wait(), self.timeout)
+                except asyncio.TimeoutError:
+                    # datagramas sin confirmar: se reportan como perdidos
+                    pass
+        finally:
+            transport.close()
+
+    async def _replay_session(self, protocol, messages):
+        try:
+            if protocol == 'tcp':
+                await self._replay_tcp(messages)
+            else:
+                await self._replay_udp(messages)
+        except Exception as e:
+            self.errors += 1
+            if len(self.failures) < 10:
+                self.failures.append(f"{type(e).__name__}: {e}")
+
+    async def run(self):
+        from src.async_server import raise_nofile_limit
+        raise_nofile_limit()
+        timestamps = [messages[0][0] for _, messages in self.sessions.values() if messages]
+        if not timestamps:
+            return
+        self.first_ts = min(timestamps)
+        self.origin = time.monotonic()
+        await asyncio.gather(*(
+            self._replay_session(protocol, messages)
+            for protocol, messages in self.sessions.values() if messages
+            for _ in range(self.copies)
+        ))
+
+def replay(path, host='localhost', port=None, speed=1.0, framed=False, copies=1, timeout=5.0):
+    """reproduce una grabación y devuelve el resultado como dict (mismo estilo que src/bench.py)"""
+    sessions = load_sessions(path)
+    replayer = Replayer(sessions, host, port, speed, framed, copies, timeout)
+    started = time.monotonic()
+    asyncio.run(replayer.run())
+    elapsed = time.monotonic() - started
+
+    timestamps = [ts for _, messages in sessions.values() for ts, _ in messages]
+    recorded = (max(timestamps) - min(timestamps)) / 1e9 if timestamps else 0.0
+    drift = replayer.drift.percentiles((50, 99))
+    latency = replayer.latency.percentiles((50, 99))
+    return {
+        'config': {
+            'recording': str(path),
+            'host': host,
+            'port': port,
+            'speed': speed,
+            'framed': framed,
+            'copies': copies,
+        },
+        'results': {
+            'sessions': len(sessions) * copies,
+            'messages': replayer.sent,
+            'acked': replayer.acked,
+            'lost': replayer.sent - replayer.acked,
+            'errors': replayer.errors,
+            'recorded_seconds': recorded,
+            'target_seconds': recorded / speed if speed else 0.0,
+            'elapsed_seconds': elapsed,
+            'drift_us': {
+                'mean': replayer.drift.mean() / 1000,
+                'p50': drift[50] / 1000,
+                'p99': drift[99] / 1000,
+                'max': replayer.drift.max / 1000,
+            },
+            'latency_us': {
+                'p50': latency[50] / 1000,
+                'p99': latency[99] / 1000,
+                'max': replayer.latency.max / 1000,
+            },
+            'failures': replayer.failures,
+        },
+    }
+
+def format_report(result):
+    """reporte legible de un resultado de replay"""
+    config = result['config']
+    results = result['results']
+    speed = "máxima velocidad" if config['speed'] is None else f"{config['speed']:g}x"
+    drift = results['drift_us']
+    latency = results['latency_us']
+    lines = [
+        f"=== Reproducción de {config['recording']} ({speed}) ===",
+        f"Sesiones: {results['sessions']}  Mensajes: {results['messages']}  "
+        f"Confirmados: {results['acked']}  Perdidos: {results['lost']}  Errores: {results['errors']}",
+        f"Duración: {results['elapsed_seconds']:.2f} s (grabación {results['recorded_seconds']:.2f} s, "
+        f"objetivo {results['target_seconds']:.2f} s)",
+    ]
+    if config['speed'] is not None:
+        lines.append("Drift (us): " + "  ".join(f"{name}={drift[name]:.1f}" for name in ('mean', 'p50', 'p99', 'max')))
+    lines.append("Latencia (us): " + "  ".join(f"{name}={latency[name]:.1f}" for name in ('p50', 'p99', 'max')))
+    for failure in results['failures']:
+        lines.append(f"Error: {failure}")
+    return "\n".join(lines)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Reproduce una grabación de tráfico de CSAT")
+    parser.add_argument('recording', help="archivo grabado con serve --record")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=None, help="por defecto el del protocolo de cada sesión")
+    parser.add_argument('--speed', type=parse_speed, default=1.0, help="factor de velocidad (2 = el doble) o 'max'")
+    parser.add_argument('--framed', action='store_true', help="enviar con framing (servidor TCP framed)")
+    parser.add_argument('--copies', type=int, default=1, help="veces que se lanza cada sesión a la vez")
+    parser.add_argument('--timeout', type=float, default=5.0)
+    parser.add_argument('--json', action='store_true', help="imprimir el resultado en JSON")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        result = replay(args.recording, args.host, args.port, args.speed, args.framed, args.copies, args.timeout)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(json.dumps(result, indent=2) if args.json else format_report(result))
+    return 0 if not result['results']['errors'] and not result['results']['lost'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
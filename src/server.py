@@ -1,10 +1,14 @@
 """
 Servidores TCP y UDP para prueba de concepto
 """
+import heapq
+import itertools
+import selectors
 import socket
+import struct
 import threading
 import logging
-from datetime import datetime
+import time
 import sys
 from pathlib import Path
 
@@ -13,150 +17,702 @@ root_dir = str(Path(__file__).parent.parent.parent)
 if root_dir not in sys.path:
     sys.path.append(root_dir)
 
+from src.base.framing import BufferPool, FramedReader, send_frame, sendmsg_all
+from src.base.log_sink import LazyText, format_event
+from src.base.metrics import Metrics
+from src.base.flows import tcp_rtt
+from src.base.worker_pool import QUEUE, WorkerPool
+from src.base.reaper import ConnectionReaper, set_keepalive
+from src.base.compression import (CODECS, DEFAULT_THRESHOLD, CodecTable, CompressionError, CompressionStats,
+                                  choose_codec, encode_hello, is_hello, make_codec, parse_hello)
+from src.base.rate_limit import DELAY, SLOW_DOWN, slow_down_reply
+from src.base.profiling import LOG, PROCESS, RECV, RESPOND, HotPathProfiler
+
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
-def used_port(port, host='localhost'):
-    """verificamos si un puerto está en uso"""
+# prefijo de la confirmación ya codificado: las respuestas se arman como prefijo + payload
+# en bytes, sin decodificar el mensaje ni crear un str
+ACK_PREFIX = "Confirmación recibida: ".encode()
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+# con SO_RXQ_OVFL (Linux) el kernel adjunta a los datagramas cuántos descartó el socket por
+# tener el buffer de recepción lleno (contador acumulado de 32 bits)
+SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL', 40 if sys.platform.startswith('linux') else None)
+_DROP_COUNTER = struct.Struct('=I')
+
+def send_ack(sock, payload):
+    """envía ACK_PREFIX + payload por TCP con scatter-gather (sin concatenar)"""
+    if _HAS_SENDMSG:
+        sendmsg_all(sock, (ACK_PREFIX, payload))
+    else:
+        sock.sendall(ACK_PREFIX + payload)
+
+def send_ack_to(sock, payload, address):
+    """envía ACK_PREFIX + payload en un solo datagrama con scatter-gather"""
+    if _HAS_SENDMSG:
+        sock.sendmsg((ACK_PREFIX, payload), (), 0, address)
+    else:
+        sock.sendto(ACK_PREFIX + payload, address)
+
+def used_port(port, host='localhost', reuse_port=False):
+    """verificamos si un puerto está en uso
+
+    con reuse_port=True el puerto solo cuenta como ocupado si lo tiene un
+    socket sin SO_REUSEPORT (otro shard del mismo servidor no lo bloquea)
+    """
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         try:
+            if reuse_port:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             s.bind((host, port))
             return False
         except socket.error:
             return True
 
-def used_port_udp(port, host='localhost'):
-    """verificamos si un puerto UDP está en uso"""
+def used_port_udp(port, host='localhost', reuse_port=False):
+    """verificamos si un puerto UDP está en uso (ver used_port para reuse_port)"""
     with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
         try:
+            if reuse_port:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             s.bind((host, port))
             return False
         except socket.error:
             return True
 
 class BaseServer:
-    def __init__(self, host='localhost', port=None, log_callback=None):
+    # contadores que el supervisor de shards (src/sharded.py) suma entre procesos
+    COUNTER_FIELDS = ('connections', 'messages', 'bytes', 'errors')
+
+    def __init__(self, host='localhost', port=None, log_callback=None, reuse_port=False, log_sink=None,
+                 capture=None, flow_table=None, compression=False, compress_threshold=DEFAULT_THRESHOLD,
+                 recorder=None, rate_limiter=None):
         self.host = host
         self.port = port
         self.server_socket = None
         self.running = False
         self.log_callback = log_callback
+        self.reuse_port = reuse_port
+        self.metrics = Metrics()
+        # con log_sink los logs se encolan y se formatean en otro hilo (src/base/log_sink.py)
+        self.log_sink = log_sink
+        # con capture (CaptureWriter de src/base/capture.py) cada mensaje recibido se guarda en un
+        # pcap; el servidor la cierra en stop()
+        self.capture = capture
+        self.local_address = None
+        # con flow_table (FlowTable de src/base/flows.py) se llevan estadísticas por cliente
+        self.flow_table = flow_table
+        # se activa cuando el socket ya está escuchando (ver _mark_ready)
+        self.ready = threading.Event()
+        # compression=True (o una tupla de códecs) acepta la compresión que negocie cada
+        # cliente (src/base/compression.py); en TCP requiere framed=True
+        self.compression = CODECS if compression is True else tuple(compression or ())
+        self.compress_threshold = compress_threshold
+        self.compression_stats = CompressionStats()
+        # con recorder (Recorder de src/base/recording.py) cada mensaje de cliente se graba para src/replay.py
+        self.recorder = recorder
+        # con rate_limiter (RateLimiter de src/base/rate_limit.py) se limitan mensajes/s y bytes/s por IP
+        self.rate_limiter = rate_limiter
+        # hooks del camino caliente (HotPathProfiler de src/base/profiling.py); se pueden
+        # instalar con el servidor en marcha, sin hooks cada punto cuesta un `is not None`
+        self.hooks = None
 
     def _log(self, message):
         """envía el log al callback si existe, sino usa logger"""
-        if self.log_callback:
+        if self.log_sink is not None:
+            self.log_sink.emit(message)
+        elif self.log_callback:
             self.log_callback(message)
         else:
             logger.info(message)
 
+    def _emit(self, template, *args):
+        """log del camino caliente: con log_sink el formateo (y la hora {ts}) se difiere"""
+        if self.log_sink is not None:
+            self.log_sink.emit(template, args)
+        else:
+            self._log(format_event(template, args, time.time()))
+
+    @property
+    def counters(self):
+        """contadores totales (conexiones, mensajes, bytes, errores) sumados de todos los hilos"""
+        counters = self.metrics.counters()
+        return {field: counters[field] for field in self.COUNTER_FIELDS}
+
+    def _limit(self, address, nbytes):
+        """consulta el rate_limiter: (acción, espera en s), con acción None si el mensaje pasa"""
+        action, wait = self.rate_limiter.check(address[0], nbytes)
+        if action is not None:
+            self._emit("Cliente {} limitado ({}), espera de {:.1f} ms", address, action, wait * 1000)
+        return action, wait
+
+    def enable_hooks(self, hooks=None):
+        """instala los hooks de medición (uno nuevo si no se pasa) y los devuelve"""
+        if hooks is None:
+            hooks = self.hooks or HotPathProfiler()
+        self.hooks = hooks
+        return hooks
+
+    def disable_hooks(self):
+        self.hooks = None
+
+    def rate_limit_stats(self):
+        """mensajes permitidos y limitados por acción; None sin rate_limiter"""
+        return self.rate_limiter.stats() if self.rate_limiter is not None else None
+
+    def _negotiate(self, hello, address, stream=True):
+        """responde un saludo de compresión: devuelve (respuesta, códec o None)"""
+        name = choose_codec(parse_hello(hello), self.compression)
+        codec = make_codec(name, stream, self.compress_threshold,
+                           stats=None if stream else self.compression_stats)
+        self._emit("Compresión con {}: {}", address, name)
+        return encode_hello((name,)), codec
+
+    def _end_tcp_session(self, address, local_address):
+        """fin de una conexión TCP: cierra su sesión en el recorder y su flujo en la captura"""
+        if self.recorder is not None:
+            self.recorder.close_session('tcp', address)
+        if self.capture is not None and local_address is not None:
+            self.capture.close_flow(address, local_address)
+
+    def _sample_tcp_rtt(self, sock, address):
+        """guarda en la tabla de flujos el RTT que estima el kernel para la conexión"""
+        if self.flow_table is not None:
+            self.flow_table.update_rtt('tcp', address, tcp_rtt(sock))
+
+    def _set_socket_options(self, sock):
+        """aplica SO_REUSEADDR y, si corresponde, SO_REUSEPORT antes del bind"""
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+    def _mark_ready(self):
+        """el socket ya está escuchando: guarda la dirección real (con port=0 la elige el sistema) y avisa"""
+        self.local_address = self.server_socket.getsockname()[:2]
+        self.port = self.local_address[1]
+        self.running = True
+        self.ready.set()
+
     def stop(self):
         """detiene el servidor"""
         self.running = False
+        self.ready.clear()
         if self.server_socket:
             self.server_socket.close()
             self._log(f"Servidor {self.__class__.__name__} detenido")
+        if self.capture is not None:
+            # vuelca lo que quede en el buffer; lo que llegue después se descarta
+            self.capture.close()
 
 class TCPServer(BaseServer):
-    def __init__(self, host='localhost', port=54321, log_callback=None):
-        super().__init__(host, port, log_callback)
+    def __init__(self, host='localhost', port=54321, log_callback=None, backlog=2, framed=False,
+                 max_connections=None, overload=QUEUE, max_queue=128, queue_timeout=1.0,
+                 idle_timeout=None, max_lifetime=None, keepalive=None, **options):
+        # options: reuse_port, log_sink, capture, flow_table, compression, recorder, rate_limiter (ver BaseServer)
+        super().__init__(host, port, log_callback, **options)
+        self.backlog = backlog
+        # framed=True usa el protocolo con largo + payload de src/base/framing.py
+        self.framed = framed
+        self.buffer_pool = BufferPool() if framed else None
+        # con max_connections las conexiones las atiende un pool fijo con control de
+        # admisión (src/base/worker_pool.py) en lugar de un hilo nuevo por conexión
+        self.pool = None
+        if max_connections:
+            self.pool = WorkerPool(
+                self._handle_framed_client if framed else self._handle_client,
+                workers=max_connections, max_queue=max_queue, policy=overload,
+                queue_timeout=queue_timeout, reject=self._reject_client, name='tcp-worker',
+            )
+        # idle_timeout/max_lifetime (segundos) cierran conexiones abandonadas (src/base/reaper.py);
+        # el reaper también lleva las conexiones vivas para cerrarlas en stop()
+        self.reaper = ConnectionReaper(idle_timeout, max_lifetime, on_reap=self._on_reap)
+        # keepalive: dict con idle, interval y count (segundos) para TCP keepalive
+        self.keepalive = keepalive
 
     def start(self):
         """inicia el servidor TCP"""
-        if used_port(self.port, self.host):
+        if used_port(self.port, self.host, self.reuse_port):
             self._log(f"El puerto {self.port} ya está en uso. El servidor ya está corriendo.")
             return
 
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._set_socket_options(self.server_socket)
             self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(2)
-            self.running = True
+            self.server_socket.listen(self.backlog)
+            self._mark_ready()
+            if self.pool is not None:
+                self.pool.start()
+            self.reaper.start()
             self._log(f"Servidor TCP iniciado en {self.host}:{self.port}")
 
             while self.running:
                 try:
                     client_socket, address = self.server_socket.accept()
-                    self._log(f"Conexión aceptada de {address}")
+                    if self.keepalive:
+                        set_keepalive(client_socket, **self.keepalive)
+                    self.metrics.connection_opened()
+                    self._emit("Conexión aceptada de {}", address)
+                    if self.pool is not None:
+                        self.pool.submit(client_socket, address)
+                        continue
                     client_thread = threading.Thread(
-                        target=self._handle_client,
-                        args=(client_socket, address)
+                        target=self._connection_thread,
+                        args=(self._handle_framed_client if self.framed else self._handle_client,
+                              client_socket, address)
                     )
                     client_thread.start()
                 except Exception as e:
                     if self.running:
+                        self.metrics.error()
                         self._log(f"Error al aceptar conexión: {e}")
         except Exception as e:
             self._log(f"Error al iniciar servidor TCP: {e}")
             self.stop()
 
+    def _connection_thread(self, handler, client_socket, address):
+        """hilo de una conexión: al terminar retira su shard de métricas (ver Metrics.retire_thread)"""
+        try:
+            handler(client_socket, address)
+        finally:
+            self.metrics.retire_thread()
+
+    def _reject_client(self, client_socket, address, reason):
+        """cierra una conexión que el pool no admitió"""
+        client_socket.close()
+        self.metrics.connection_closed()
+        self._emit("Conexión rechazada de {}: {}", address, reason)
+
+    def admission_stats(self):
+        """contadores del pool (activas, en cola, rechazadas); None sin max_connections"""
+        return self.pool.stats() if self.pool is not None else None
+
+    def _on_reap(self, address, reason):
+        self._emit("Conexión con {} cerrada por {}", address, reason)
+
+    def _throttle(self, address, nbytes):
+        """aplica el rate_limiter en el hilo del cliente
+
+        devuelve None si el mensaje se procesa (con delay, después de esperar
+        su turno) o la respuesta a enviar en su lugar (vacía con drop)
+        """
+        action, wait = self._limit(address, nbytes)
+        if action is None:
+            return None
+        if action == DELAY:
+            time.sleep(wait)
+            return None
+        return slow_down_reply(wait) if action == SLOW_DOWN else b''
+
+    def reaper_stats(self):
+        """conexiones vigiladas y cerradas por inactividad, tiempo de vida o detención"""
+        return self.reaper.stats()
+
+    def stop(self):
+        if self.server_socket:
+            # shutdown despierta al hilo bloqueado en accept(); close solo no lo hace en Linux
+            try:
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        super().stop()
+        self.reaper.stop()
+        self.reaper.reap_all()
+        if self.pool is not None:
+            self.pool.shutdown()
+
     def _handle_client(self, client_socket, address):
         """maneja la conexión con un cliente TCP"""
+        tracked = self.reaper.register(client_socket, address)
+        local_address = None
         try:
+            local_address = client_socket.getsockname()[:2]
             while True:
                 data = client_socket.recv(1024)
                 if not data:
                     break
-                    
-                message = data.decode()
+                tracked.touch()
+                started = time.perf_counter_ns()
+                hooks = self.hooks
+                if hooks is not None:
+                    mark = hooks.begin()
+                if self.capture is not None:
+                    self.capture.write('tcp', address, local_address, data)
+                if self.flow_table is not None:
+                    self.flow_table.record('tcp', address, len(data))
+                if self.rate_limiter is not None:
+                    reply = self._throttle(address, len(data))
+                    if reply is not None:
+                        if reply:
+                            client_socket.sendall(reply)
+                        if hooks is not None:
+                            hooks.end(RESPOND, mark)
+                        continue
+                if self.recorder is not None:
+                    self.recorder.record('tcp', address, data)
+                if hooks is not None:
+                    mark = hooks.lap(RECV, mark)
+
                 client_ip, client_port = address
-                timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
-                self._log(f"Mensaje recibido desde la IP {client_ip} puerto {client_port}.")
-                self._log(f"Tiempo de recepción: {timestamp}")
-                
-                response = f"Confirmación recibida: {message}"
-                client_socket.send(response.encode())
+                self._emit("Mensaje recibido desde la IP {} puerto {}.", client_ip, client_port)
+                self._emit("Tiempo de recepción: {ts}")
+                if hooks is not None:
+                    mark = hooks.lap(LOG, mark)
+
+                send_ack(client_socket, data)
+                if hooks is not None:
+                    hooks.end(RESPOND, mark)
+                self.metrics.message(len(data), time.perf_counter_ns() - started)
                 
         except Exception as e:
+            self.metrics.error()
             self._log(f"Error al manejar cliente {address}: {e}")
         finally:
+            self._end_tcp_session(address, local_address)
+            self.reaper.unregister(tracked)
+            self._sample_tcp_rtt(client_socket, address)
             client_socket.close()
-            self._log(f"Conexión cerrada con {address}")
+            self.metrics.connection_closed()
+            self._emit("Conexión cerrada con {}", address)
+
+    def _handle_framed_client(self, client_socket, address):
+        """maneja un cliente TCP con framing: lee con recv_into y responde sin decodificar"""
+        reader = FramedReader(client_socket, self.buffer_pool)
+        tracked = self.reaper.register(client_socket, address)
+        codec = None
+        local_address = None
+        try:
+            local_address = client_socket.getsockname()[:2]
+            while True:
+                payload = reader.read_frame()
+                if payload is None:
+                    break
+                tracked.touch()
+                started = time.perf_counter_ns()
+                hooks = self.hooks
+                if hooks is not None:
+                    mark = hooks.begin()
+                if self.capture is not None:
+                    self.capture.write('tcp', address, local_address, payload)
+                if self.flow_table is not None:
+                    self.flow_table.record('tcp', address, len(payload))
+                if self.compression and is_hello(payload):
+                    reply, codec = self._negotiate(payload, address)
+                    send_frame(client_socket, reply)
+                    if hooks is not None:
+                        hooks.end(RESPOND, mark)
+                    continue
+                if self.rate_limiter is not None:
+                    reply = self._throttle(address, len(payload))
+                    if reply is not None:
+                        if reply:
+                            send_frame(client_socket, codec.encode(reply) if codec is not None else reply)
+                        if hooks is not None:
+                            hooks.end(RESPOND, mark)
+                        continue
+                if hooks is not None:
+                    mark = hooks.lap(RECV, mark)
+                message = codec.decode(payload) if codec is not None else payload
+                if hooks is not None:
+                    mark = hooks.lap(PROCESS, mark)
+                if self.recorder is not None:
+                    self.recorder.record('tcp', address, message)
+
+                client_ip, client_port = address
+                self._emit("Mensaje recibido desde la IP {} puerto {}.", client_ip, client_port)
+                self._emit("Tiempo de recepción: {ts}")
+                if hooks is not None:
+                    mark = hooks.lap(LOG, mark)
+
+                if codec is not None:
+                    reply = codec.encode(ACK_PREFIX + message)
+                    if hooks is not None:
+                        mark = hooks.lap(PROCESS, mark)
+                    send_frame(client_socket, reply)
+                else:
+                    send_frame(client_socket, ACK_PREFIX, payload)
+                if hooks is not None:
+                    hooks.end(RESPOND, mark)
+                self.metrics.message(len(payload), time.perf_counter_ns() - started)
+
+        except Exception as e:
+            self.metrics.error()
+            self._log(f"Error al manejar cliente {address}: {e}")
+        finally:
+            reader.close()
+            if codec is not None:
+                self.compression_stats.merge(codec.stats)
+            self._end_tcp_session(address, local_address)
+            self.reaper.unregister(tracked)
+            self._sample_tcp_rtt(client_socket, address)
+            client_socket.close()
+            self.metrics.connection_closed()
+            self._emit("Conexión cerrada con {}", address)
 
 class UDPServer(BaseServer):
-    def __init__(self, host='localhost', port=5555, log_callback=None):
-        super().__init__(host, port, log_callback)
+    # tamaño máximo de datagrama que se lee por recvfrom
+    RECV_SIZE = 1024
+    # datagramas que se leen por despertar, cada uno en su buffer preasignado
+    RECV_BATCH = 64
+
+    def __init__(self, host='localhost', port=5555, log_callback=None, rcvbuf=None, **options):
+        # options: reuse_port, log_sink, capture, flow_table, compression, recorder, rate_limiter (ver BaseServer)
+        super().__init__(host, port, log_callback, **options)
+        # rcvbuf: SO_RCVBUF en bytes (Linux reserva el doble); receive_stats() dice si alcanza
+        self.rcvbuf = rcvbuf
+        # direcciones que negociaron compresión y su códec (sin estado entre datagramas)
+        self.codecs = CodecTable()
+        # datagramas demorados por el rate_limiter: (instante, orden, datos, dirección)
+        self._deferred = []
+        self._sequence = itertools.count()
+        # confirmaciones del lote en curso, se envían juntas al terminar de leerlo
+        self._acks = []
+        self._wakeup_r = self._wakeup_w = None
+        self.batches = 0
+        self.datagrams = 0
+        self.max_batch = 0
+        # descartes del kernel según SO_RXQ_OVFL (None si no está disponible)
+        self.rx_dropped = None
+        self._drops_logged = 0
 
     def start(self):
-        """inicia el servidor UDP"""
-        if used_port_udp(self.port, self.host):
+        """inicia el servidor UDP
+
+        El socket es no bloqueante y el hilo duerme en un selector junto con
+        el extremo de lectura de un socketpair que stop() usa para despertarlo.
+        En cada despertar se vacía la cola de recepción (hasta RECV_BATCH
+        datagramas) y después se envían las confirmaciones del lote.
+        """
+        if used_port_udp(self.port, self.host, self.reuse_port):
             self._log(f"El puerto UDP {self.port} ya está en uso. El servidor ya está corriendo.")
             return
 
+        selector = selectors.DefaultSelector()
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.settimeout(1.0)  # timeout para poder detener el servidor
+            self._set_socket_options(self.server_socket)
+            if self.rcvbuf:
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            ancbufsize = 0
+            if SO_RXQ_OVFL is not None:
+                try:
+                    self.server_socket.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+                    ancbufsize = socket.CMSG_SPACE(_DROP_COUNTER.size)
+                    self.rx_dropped = 0
+                except OSError:
+                    pass
             self.server_socket.bind((self.host, self.port))
-            self.running = True
+            self.server_socket.setblocking(False)
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self._wakeup_w.setblocking(False)
+            selector.register(self.server_socket, selectors.EVENT_READ)
+            selector.register(self._wakeup_r, selectors.EVENT_READ)
+            self._mark_ready()
             self._log(f"Servidor UDP iniciado en {self.host}:{self.port}")
 
+            views = [memoryview(bytearray(self.RECV_SIZE)) for _ in range(self.RECV_BATCH)]
+            # sin datagramas demorados se espera sin timeout: stop() despierta con el socketpair
+            timeout = None
             while self.running:
                 try:
-                    data, address = self.server_socket.recvfrom(1024)
-                    message = data.decode()
-                    client_ip, client_port = address
-                    timestamp = datetime.now().strftime('%H:%M:%S.%f')[:-3]
-                    
-                    self._log(f"Mensaje recibido desde la IP {client_ip} puerto {client_port}: {message}")
-                    self._log(f"Tiempo de recepción: {timestamp}")
-                    
-                    response = f"Confirmación recibida: {message}"
-                    self.server_socket.sendto(response.encode(), address)
-                    self._log(f"Respuesta enviada a {address}")
-                    
-                except socket.timeout:
-                    # timeout normal, continuar el bucle para verificar self.running
-                    continue
+                    for key, _ in selector.select(timeout):
+                        if key.fileobj is self._wakeup_r:
+                            self._drain_wakeup()
+                        elif self.running:
+                            self._receive_batch(views, ancbufsize)
+                    timeout = self._run_deferred() if self._deferred else None
+                    if self._acks:
+                        self._flush_acks()
                 except Exception as e:
                     if self.running:
+                        self.metrics.error()
                         self._log(f"Error al recibir mensaje UDP: {e}")
         except Exception as e:
             self._log(f"Error al iniciar servidor UDP: {e}")
             self.stop()
         finally:
+            selector.close()
+            for sock in (self._wakeup_r, self._wakeup_w):
+                if sock is not None:
+                    sock.close()
             self._log("Servidor UDP terminado")
 
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(64):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _receive_batch(self, views, ancbufsize):
+        """lee los datagramas en cola hasta que no quede ninguno (o se usen todos los buffers)"""
+        sock = self.server_socket
+        count = 0
+        for view in views:
+            try:
+                if ancbufsize:
+                    nbytes, ancdata, _, address = sock.recvmsg_into((view,), ancbufsize)
+                    if ancdata:
+                        self._read_overflow(ancdata)
+                else:
+                    nbytes, address = sock.recvfrom_into(view)
+            except (BlockingIOError, InterruptedError):
+                break
+            count += 1
+            # copia del tamaño exacto: el buffer se reutiliza en el próximo lote y el
+            # mensaje puede seguir vivo (log diferido, grabación, demora del rate_limiter)
+            data = bytes(view[:nbytes])
+            try:
+                if self.capture is not None:
+                    self.capture.write('udp', address, self.local_address, data)
+                if self.flow_table is not None:
+                    self.flow_table.record('udp', address, nbytes)
+                self._handle_datagram(data, address)
+            except Exception as e:
+                if self.running:
+                    self.metrics.error()
+                    self._log(f"Error al procesar mensaje UDP: {e}")
+        if count:
+            self.batches += 1
+            self.datagrams += count
+            if count > self.max_batch:
+                self.max_batch = count
+
+    def _read_overflow(self, ancdata):
+        """actualiza rx_dropped con el contador de SO_RXQ_OVFL (solo viene si hubo descartes)"""
+        for level, kind, payload in ancdata:
+            if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL and len(payload) >= _DROP_COUNTER.size:
+                (dropped,) = _DROP_COUNTER.unpack_from(payload)
+                if dropped != self.rx_dropped:
+                    self.rx_dropped = dropped
+                    now = time.monotonic()
+                    # como mucho un aviso por segundo aunque siga descartando
+                    if now - self._drops_logged >= 1.0:
+                        self._drops_logged = now
+                        self._log(f"El kernel descartó {dropped} datagramas por buffer de recepción lleno "
+                                  f"(SO_RCVBUF {self._rcvbuf_size()} bytes)")
+
+    def _rcvbuf_size(self):
+        sock = self.server_socket
+        if sock is None or sock.fileno() == -1:
+            return None
+        return sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+    def receive_stats(self):
+        """lotes leídos, datagramas, el lote más grande, descartes del kernel y SO_RCVBUF efectivo"""
+        return {
+            'batches': self.batches,
+            'datagrams': self.datagrams,
+            'max_batch': self.max_batch,
+            'rx_dropped': self.rx_dropped,
+            'rcvbuf': self._rcvbuf_size(),
+        }
+
+    def _flush_acks(self):
+        """envía las confirmaciones del lote, una tras otra sin volver al selector"""
+        acks = self._acks
+        self._acks = []
+        sock = self.server_socket
+        for data, address, reply, started, hooks, mark in acks:
+            try:
+                if reply is None:
+                    send_ack_to(sock, data, address)
+                else:
+                    sock.sendto(reply, address)
+            except (BlockingIOError, InterruptedError):
+                # buffer de envío lleno: la confirmación se pierde como un datagrama más
+                self.metrics.error()
+                continue
+            finally:
+                if hooks is not None:
+                    hooks.end(RESPOND, mark)
+            self.metrics.message(len(data), time.perf_counter_ns() - started)
+            self._emit("Respuesta enviada a {}", address)
+
+    def stop(self):
+        self.running = False
+        if self._wakeup_w is not None:
+            try:
+                self._wakeup_w.send(b'\0')
+            except OSError:
+                # socketpair lleno o ya cerrado: el hilo ya se va a despertar o terminó
+                pass
+        super().stop()
+
+    def _run_deferred(self):
+        """procesa los datagramas demorados que ya llegaron a su turno; devuelve el próximo timeout"""
+        deferred = self._deferred
+        now = time.monotonic()
+        while deferred and deferred[0][0] <= now:
+            _, _, data, address = heapq.heappop(deferred)
+            hooks = self.hooks
+            try:
+                self._process_datagram(data, address, time.perf_counter_ns(),
+                                       hooks.begin() if hooks is not None else None)
+            except Exception as e:
+                self.metrics.error()
+                self._log(f"Error al procesar mensaje UDP demorado: {e}")
+        return deferred[0][0] - now if deferred else None
+
+    def _handle_datagram(self, data, address):
+        """procesa un datagrama (saludo de compresión y rate_limiter) y responde con la confirmación"""
+        started = time.perf_counter_ns()
+        hooks = self.hooks
+        mark = hooks.begin() if hooks is not None else None
+        if self.compression and is_hello(data):
+            reply, self.codecs[address] = self._negotiate(data, address, stream=False)
+            self.server_socket.sendto(reply, address)
+            if hooks is not None:
+                hooks.end(RESPOND, mark)
+            return
+        if self.rate_limiter is not None:
+            action, wait = self._limit(address, len(data))
+            if action is not None:
+                if action == DELAY:
+                    # se demora solo a este cliente: el bucle sigue atendiendo al resto
+                    heapq.heappush(self._deferred, (time.monotonic() + wait, next(self._sequence), data, address))
+                elif action == SLOW_DOWN:
+                    codec = self.codecs.get(address)
+                    reply = slow_down_reply(wait)
+                    self.server_socket.sendto(codec.encode(reply) if codec is not None else reply, address)
+                if hooks is not None:
+                    hooks.end(RECV, mark)
+                return
+        self._process_datagram(data, address, started, mark)
+
+    def _process_datagram(self, data, address, started, mark=None):
+        """decodifica, registra y confirma un datagrama ya admitido"""
+        hooks = self.hooks if mark is not None else None
+        if hooks is not None:
+            mark = hooks.lap(RECV, mark)
+        client_ip, client_port = address
+        codec = self.codecs.get(address)
+        if codec is not None:
+            try:
+                data = codec.decode(data)
+            except CompressionError:
+                # códec viejo de otro cliente en el mismo ip:puerto, o bomba: se olvida
+                self.codecs.pop(address)
+                raise
+            if hooks is not None:
+                mark = hooks.lap(PROCESS, mark)
+        if self.recorder is not None:
+            self.recorder.record('udp', address, data)
+
+        self._emit("Mensaje recibido desde la IP {} puerto {}: {}", client_ip, client_port, LazyText(data))
+        self._emit("Tiempo de recepción: {ts}")
+        if hooks is not None:
+            mark = hooks.lap(LOG, mark)
+
+        reply = None
+        if codec is not None:
+            reply = codec.encode(ACK_PREFIX + data)
+            if hooks is not None:
+                mark = hooks.lap(PROCESS, mark)
+        # la confirmación sale con el resto del lote (_flush_acks); respond incluye esa espera
+        self._acks.append((data, address, reply, started, hooks, mark))
+
 if __name__ == '__main__':
     print("Seleccione el servidor a iniciar:")
     print("1. TCP")
@@ -0,0 +1,220 @@
+"""
+Servidores multi-núcleo: N procesos worker comparten host:puerto con SO_REUSEPORT
+y el kernel reparte conexiones y datagramas entre ellos
+"""
+import os
+import signal
+import socket
+import logging
+import threading
+import time
+import multiprocessing
+import queue
+import sys
+from pathlib import Path
+
+# agregamos el directorio root al path
+root_dir = str(Path(__file__).parent.parent)
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from src.server import BaseServer, TCPServer, UDPServer, used_port, used_port_udp
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = BaseServer.COUNTER_FIELDS
+
+def _build_server(protocol, engine, host, port, log_callback):
+    """crea el servidor del worker según protocolo y motor"""
+    if engine == 'async':
+        from src.async_server import AsyncTCPServer, AsyncUDPServer
+        server_class = AsyncTCPServer if protocol == 'tcp' else AsyncUDPServer
+    else:
+        server_class = TCPServer if protocol == 'tcp' else UDPServer
+    return server_class(host=host, port=port, log_callback=log_callback, reuse_port=True)
+
+def _worker_main(index, protocol, engine, host, port, counters, log_queue, publish_interval):
+    """punto de entrada de cada proceso worker"""
+    def log(message):
+        try:
+            log_queue.put_nowait(f"[worker {index}] {message}")
+        except queue.Full:
+            # si el supervisor no da abasto descartamos logs, nunca bloqueamos la red
+            pass
+
+    server = _build_server(protocol, engine, host, port, log)
+    base = index * len(COUNTER_FIELDS)
+
+    def publish():
+        snapshot = server.counters
+        for offset, field in enumerate(COUNTER_FIELDS):
+            counters[base + offset] = snapshot[field]
+
+    def publisher():
+        while True:
+            publish()
+            time.sleep(publish_interval)
+
+    threading.Thread(target=publisher, daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        server.start()
+    finally:
+        publish()
+        # los hilos de clientes del servidor con hilos no son daemon
+        os._exit(0)
+
+class ShardedServer:
+    def __init__(self, protocol='tcp', host='localhost', port=None, workers=None,
+                 engine='thread', log_callback=None, restart=True, publish_interval=0.5):
+        if protocol not in ('tcp', 'udp'):
+            raise ValueError(f"Protocolo no soportado: {protocol}")
+        if engine not in ('thread', 'async'):
+            raise ValueError(f"Motor no soportado: {engine}")
+        self.protocol = protocol
+        self.host = host
+        self.port = port if port is not None else (54321 if protocol == 'tcp' else 5555)
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = engine
+        self.log_callback = log_callback
+        self.restart = restart
+        self.publish_interval = publish_interval
+        self.running = False
+        self.restarts = 0
+        self._processes = [None] * self.workers
+        # backoff de reinicio por worker para no entrar en un bucle si falla al arrancar
+        self._spawned_at = [0.0] * self.workers
+        self._restart_at = [0.0] * self.workers
+        self._failures = [0] * self.workers
+        self._context = multiprocessing.get_context()
+        self._counters = self._context.Array('q', self.workers * len(COUNTER_FIELDS), lock=False)
+        # totales de workers que murieron y fueron reemplazados
+        self._retired = dict.fromkeys(COUNTER_FIELDS, 0)
+        self._log_queue = self._context.Queue(maxsize=10000)
+
+    def _log(self, message):
+        """envía el log al callback si existe, sino usa logger"""
+        if self.log_callback:
+            self.log_callback(message)
+        else:
+            logger.info(message)
+
+    def _spawn(self, index):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.protocol, self.engine, self.host, self.port,
+                  self._counters, self._log_queue, self.publish_interval),
+            name=f"csat-{self.protocol}-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        self._spawned_at[index] = time.monotonic()
+        return process
+
+    def _retire(self, index):
+        """acumula los contadores del worker muerto y deja su slot en cero"""
+        base = index * len(COUNTER_FIELDS)
+        for offset, field in enumerate(COUNTER_FIELDS):
+            self._retired[field] += self._counters[base + offset]
+            self._counters[base + offset] = 0
+
+    def _drain_logs(self):
+        while True:
+            try:
+                message = self._log_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._log(message)
+
+    def stats(self):
+        """contadores sumados de todos los workers (vivos y reemplazados)"""
+        totals = dict(self._retired)
+        for index in range(self.workers):
+            base = index * len(COUNTER_FIELDS)
+            for offset, field in enumerate(COUNTER_FIELDS):
+                totals[field] += self._counters[base + offset]
+        totals['workers'] = sum(1 for p in self._processes if p is not None and p.is_alive())
+        totals['restarts'] = self.restarts
+        return totals
+
+    def start(self):
+        """inicia los workers y los supervisa hasta que se llame a stop()"""
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            self._log("SO_REUSEPORT no está disponible en esta plataforma")
+            return
+        probe = used_port if self.protocol == 'tcp' else used_port_udp
+        if probe(self.port, self.host, reuse_port=True):
+            self._log(f"El puerto {self.port} ya está en uso por un servidor sin SO_REUSEPORT.")
+            return
+
+        self.running = True
+        for index in range(self.workers):
+            self._spawn(index)
+        self._log(f"Servidor {self.protocol.upper()} con {self.workers} workers en {self.host}:{self.port}")
+
+        try:
+            while self.running:
+                self._drain_logs()
+                now = time.monotonic()
+                for index, process in enumerate(self._processes):
+                    if process is None:
+                        if self.restart and now >= self._restart_at[index]:
+                            self.restarts += 1
+                            self._spawn(index)
+                        continue
+                    if process.is_alive() or not self.running:
+                        continue
+                    process.join()
+                    self._retire(index)
+                    self._processes[index] = None
+                    if now - self._spawned_at[index] < 1.0:
+                        self._failures[index] += 1
+                    else:
+                        self._failures[index] = 0
+                    delay = min(5.0, 0.1 * (2 ** self._failures[index])) if self._failures[index] else 0.0
+                    self._restart_at[index] = now + delay
+                    if self.restart:
+                        self._log(f"Worker {index} terminó (código {process.exitcode}), reiniciando")
+                time.sleep(0.2)
+        finally:
+            self._shutdown()
+
+    def _shutdown(self):
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+        self._drain_logs()
+        self._log(f"Servidor {self.protocol.upper()} con workers detenido")
+
+    def stop(self):
+        """detiene el supervisor y todos los workers"""
+        self.running = False
+
+if __name__ == '__main__':
+    print("Seleccione el servidor multi-núcleo a iniciar:")
+    print("1. TCP")
+    print("2. UDP")
+    eleccion = input("Ingrese su elección (1 o 2): ")
+
+    if eleccion not in ("1", "2"):
+        print("Opcion invalida")
+        exit(1)
+    workers = input(f"Número de workers [{os.cpu_count()}]: ").strip()
+    server = ShardedServer(
+        protocol='tcp' if eleccion == "1" else 'udp',
+        workers=int(workers) if workers else None,
+    )
+
+    try:
+        server.start()
+    except KeyboardInterrupt:
+        server.stop()
+        print(server.stats())
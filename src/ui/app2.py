@@ -1,8 +1,9 @@
 from textual.app import App, ComposeResult
 from textual.containers import Container
-from textual.widgets import Header, Footer, Input, Static, ListView, ListItem, Label, Log
+from textual.widgets import Header, Footer, Input, Static, ListView, ListItem, Label, Log, Sparkline
 from textual.binding import Binding
 import sys
+import asyncio
 from pathlib import Path
 import threading
 
@@ -11,8 +12,22 @@ root_dir = str(Path(__file__).parent.parent.parent)
 if root_dir not in sys.path:
     sys.path.append(root_dir)
 
+from src.base.metrics import MetricsSampler
+from src.base.flows import FlowTable
+from src.base.log_sink import DROP_OLDEST, LogBuffer, LogSink
+from src.base.profiling import CPROFILE, KINDS, HotPathProfiler, format_stages
+
 class CSATApp(App):
     """Aplicación TUI para cliente-servidor TCP/UDP"""
+
+    # líneas que conserva cada panel de logs y refrescos por segundo
+    MAX_SCROLLBACK = 2000
+    REFRESH_RATE = 10
+    # duración de las capturas de perfilado iniciadas desde el menú
+    PROFILE_SECONDS = 10
+    # flujos que guarda la tabla y segundos sin actividad antes de olvidarlos
+    MAX_FLOWS = 10000
+    FLOW_IDLE_SECONDS = 300
     
     CSS = """
     .banner {
@@ -61,6 +76,28 @@ class CSATApp(App):
         background: transparent
     }
 
+    .metrics {
+        height: 8;
+        width: 100%;
+        border: round $accent;
+        padding: 0 1;
+        background: transparent;
+    }
+
+    .metric-row {
+        layout: horizontal;
+        height: 2;
+    }
+
+    .metric-label {
+        width: 28;
+        color: $accent;
+    }
+
+    .metric-row Sparkline {
+        width: 1fr;
+    }
+
     .input {
         dock: bottom;
         margin: 1;
@@ -72,6 +109,35 @@ class CSATApp(App):
         Binding("q", "quit", "Salir", show=True),
     ]
 
+    def __init__(self, max_scrollback=None, refresh_rate=None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_scrollback = max_scrollback or self.MAX_SCROLLBACK
+        self.refresh_rate = refresh_rate or self.REFRESH_RATE
+        self._client_buffer = LogBuffer()
+        self._server_buffer = LogBuffer()
+        self._client_log = None
+        self._server_log = None
+        self._app_thread = None
+        # los hilos de red solo encolan eventos; el hilo de cada sink los formatea y cada
+        # 1/refresh_rate s escribe el lote entero en su panel (una sola cola por panel)
+        self.server_sink = LogSink(batch_callback=self._server_batch, max_queue=self.max_scrollback,
+                                   batch_size=self.max_scrollback, flush_interval=1 / self.refresh_rate,
+                                   policy=DROP_OLDEST)
+        self.client_sink = LogSink(batch_callback=self._client_batch, max_queue=self.max_scrollback,
+                                   batch_size=self.max_scrollback, flush_interval=1 / self.refresh_rate,
+                                   policy=DROP_OLDEST)
+        self.metrics_sampler = MetricsSampler(self._metrics_sources)
+        # tabla de flujos compartida por los servidores que inicia la app
+        self.flow_table = FlowTable(max_flows=self.MAX_FLOWS)
+        # hooks de perfilado: se instalan en los servidores solo mientras dura una captura
+        self.profiler = HotPathProfiler()
+        # los envíos corren como workers del event loop; el lock mantiene el orden por protocolo
+        self._tcp_lock = asyncio.Lock()
+        self._udp_lock = asyncio.Lock()
+        # conexiones AsyncTCPClient del pool de la app (src/client_pool.py) y mensajes de la sesión actual
+        self._tcp_pool = None
+        self._tcp_session = None
+
     def compose(self) -> ComposeResult:
         """Crear los widgets de la aplicación"""
         yield Header()
@@ -86,11 +152,32 @@ class CSATApp(App):
                     ListItem(Label("4. Cerrar servidor UDP"), id="stop_udp"),
                     ListItem(Label("5. Enviar mensaje TCP"), id="send_tcp"),
                     ListItem(Label("6. Enviar mensaje UDP"), id="send_udp"),
+                    ListItem(Label("7. Clientes con más tráfico"), id="top_flows"),
+                    ListItem(Label("8. Perfilar servidores"), id="profile"),
                     classes="list",
                 ),
                 Container(
-                    Log(classes="messages", id="client_msg"),
-                    Log(classes="messages", id="server_msg"),
+                    Log(classes="messages", id="client_msg", max_lines=self.max_scrollback),
+                    Log(classes="messages", id="server_msg", max_lines=self.max_scrollback),
+                    Container(
+                        Container(
+                            Label("msg/s: -", classes="metric-label", id="msgs_label"),
+                            Sparkline([], summary_function=max, id="msgs_spark"),
+                            classes="metric-row",
+                        ),
+                        Container(
+                            Label("bytes/s: -", classes="metric-label", id="bytes_label"),
+                            Sparkline([], summary_function=max, id="bytes_spark"),
+                            classes="metric-row",
+                        ),
+                        Container(
+                            Label("p99: -", classes="metric-label", id="p99_label"),
+                            Sparkline([], summary_function=max, id="p99_spark"),
+                            classes="metric-row",
+                        ),
+                        classes="metrics",
+                        id="metrics",
+                    ),
                     classes="column",
                 ),
                 classes="row", 
@@ -111,63 +198,142 @@ class CSATApp(App):
         server_messages.border_title = "Logs Servidor"
         client_messages.border_title = "Logs Cliente"
 
+        # referencias cacheadas: el refresco no hace query_one
+        self._client_log = client_messages
+        self._server_log = server_messages
+        self._app_thread = threading.get_ident()
+        self.server_sink.start()
+        self.client_sink.start()
+
+        self.query_one("#metrics").border_title = "Métricas"
+        self._metric_widgets = [
+            (self.query_one(f"#{name}_label", Label), self.query_one(f"#{name}_spark", Sparkline))
+            for name in ("msgs", "bytes", "p99")
+        ]
+        self.set_interval(1.0, self._sample_metrics)
+
+    def _metrics_sources(self):
+        """métricas a graficar: las de los servidores, o las de los clientes si no hay servidores"""
+        servers = [getattr(self, name).metrics for name in ('tcp_server', 'udp_server') if hasattr(self, name)]
+        if servers:
+            return servers
+        clients = self._tcp_pool.metrics_sources() if self._tcp_pool is not None else []
+        if hasattr(self, 'udp_client'):
+            clients.append(self.udp_client.metrics)
+        return clients
+
+    def _sample_metrics(self) -> None:
+        """toma una muestra por segundo, actualiza las sparklines y vence los flujos inactivos"""
+        self.flow_table.expire(self.FLOW_IDLE_SECONDS)
+        sample = self.metrics_sampler.sample()
+        if sample is None:
+            return
+        sampler = self.metrics_sampler
+        values = (
+            (f"msg/s: {sample['msgs_per_sec']:.0f}", sampler.msgs_per_sec),
+            (f"bytes/s: {sample['bytes_per_sec']:.0f}", sampler.bytes_per_sec),
+            (f"p99: {sample['p99_us']:.0f} us  conex: {sample['active_connections']}", sampler.p99_us),
+        )
+        for (label, sparkline), (text, history) in zip(self._metric_widgets, values):
+            label.update(text)
+            sparkline.data = list(history)
+
     def add_client_log(self, message: str) -> None:
-        """añade un log del cliente"""
-        client_messages = self.query_one("#client_msg", Log)
-        client_messages.write(f"{message}\n")
+        """añade un log del cliente (seguro desde cualquier hilo)"""
+        self.client_sink.emit(message)
 
     def add_server_log(self, message: str) -> None:
-        """añade un log del servidor"""
-        server_messages = self.query_one("#server_msg", Log)
-        server_messages.write(f"{message}\n")
+        """añade un log del servidor (seguro desde cualquier hilo)"""
+        self.server_sink.emit(message)
+
+    def _client_batch(self, entries) -> None:
+        self._deliver_logs(self._client_log, self._client_buffer, self.client_sink, entries)
+
+    def _server_batch(self, entries) -> None:
+        self._deliver_logs(self._server_log, self._server_buffer, self.server_sink, entries)
+
+    def _deliver_logs(self, widget, buffer, sink, entries) -> None:
+        """lote de un sink (en su hilo, o en el de la app al cerrar) hacia el panel"""
+        if widget is None:
+            return
+        if threading.get_ident() == self._app_thread:
+            self._write_logs(widget, buffer, sink, entries)
+        else:
+            self.call_from_thread(self._write_logs, widget, buffer, sink, entries)
+
+    def _write_logs(self, widget, buffer, sink, entries) -> None:
+        """una escritura por lote, se ejecuta en el hilo de la app"""
+        widget.write_lines(buffer.flush(entries))
+        if buffer.coalesced or sink.dropped:
+            widget.border_subtitle = f"{buffer.coalesced} agrupadas · {sink.dropped} descartadas"
 
     def send_message(self) -> None:
-        """envía un mensaje TCP"""
+        """envía un mensaje TCP sin bloquear la interfaz"""
         input_widget = self.query_one("#message_input", Input)
         message = input_widget.value
         if message:
+            input_widget.value = ""
+            self.run_worker(self._send_tcp(message), group="tcp_client")
+
+    async def _send_tcp(self, message: str) -> None:
+        async with self._tcp_lock:
             try:
-                from src.client import TCPClient
-                if not hasattr(self, 'tcp_client'):
-                    self.tcp_client = TCPClient(log_callback=self.add_client_log)
-                    if not self.tcp_client.connect():
-                        self.add_client_log("Error al conectar con el servidor")
-                        return
+                if self._tcp_pool is None:
+                    from src.client_pool import AsyncTCPConnectionPool
+                    self._tcp_pool = AsyncTCPConnectionPool(log_callback=self.client_sink.emit)
+                if self._tcp_session is None:
+                    self._tcp_session = 0
                     self.add_client_log("\n=== Cliente TCP ===")
                     self.add_client_log("Ingresa mensajes (min 5). Escribe 'end' para terminar.")
-                
-                if not self.tcp_client.send_message(message):
-                    self.tcp_client.close()
-                    delattr(self, 'tcp_client')
-                
+
+                if message.lower() == 'end':
+                    if self._tcp_session < 5:
+                        self.add_client_log(f"Error: Debes enviar al menos 5 mensajes. Llevas {self._tcp_session}")
+                        return
+                    # termina la sesión, pero las conexiones del pool quedan abiertas para la próxima
+                    self._tcp_session = None
+                    self.add_client_log("Sesión TCP terminada")
+                    return
+
+                # el envío (y una posible reconexión) corre en el event loop, sin bloquear la interfaz
+                if await self._tcp_pool.send_message(message):
+                    self._tcp_session += 1
+
             except Exception as e:
                 self.add_client_log(f"Error al enviar mensaje: {e}")
-                if hasattr(self, 'tcp_client'):
-                    self.tcp_client.close()
-                    delattr(self, 'tcp_client')
-            input_widget.value = ""
 
     def send_udp_message(self) -> None:
-        """envía un mensaje UDP"""
+        """envía un mensaje UDP sin bloquear la interfaz"""
         input_widget = self.query_one("#message_input", Input)
         message = input_widget.value
         if message:
+            input_widget.value = ""
+            self.run_worker(self._send_udp(message), group="udp_client")
+
+    async def _send_udp(self, message: str) -> None:
+        async with self._udp_lock:
             try:
-                from src.client import UDPClient
+                from src.async_client import AsyncUDPClient
                 if not hasattr(self, 'udp_client'):
-                    self.udp_client = UDPClient(log_callback=self.add_client_log)
+                    self.udp_client = AsyncUDPClient(log_sink=self.client_sink)
                     self.add_client_log("\n=== Cliente UDP ===")
                     self.add_client_log("Ingresa mensajes (min 5). Escribe 'end' para terminar.")
-                
-                if not self.udp_client.send_message(message):
+
+                if not await self.udp_client.send_message(message):
+                    await self.udp_client.close()
                     delattr(self, 'udp_client')
                     self.add_client_log("Sesión UDP cerrada")
-                
+
             except Exception as e:
                 self.add_client_log(f"Error al enviar mensaje UDP: {e}")
                 if hasattr(self, 'udp_client'):
+                    await self.udp_client.close()
                     delattr(self, 'udp_client')
-            input_widget.value = ""
+
+    async def on_unmount(self) -> None:
+        """cierra las conexiones del pool TCP antes de que termine el event loop"""
+        if self._tcp_pool is not None:
+            await self._tcp_pool.close()
 
     def on_input_submitted(self, event: Input.Submitted) -> None:
         """maneja evento del binding enter"""
@@ -186,7 +352,7 @@ class CSATApp(App):
         if selected == "start_tcp":
             try:
                 from src.server import TCPServer
-                self.tcp_server = TCPServer(log_callback=self.add_server_log)
+                self.tcp_server = TCPServer(log_sink=self.server_sink, flow_table=self.flow_table)
                 server_thread = threading.Thread(target=self.tcp_server.start)
                 server_thread.daemon = True
                 server_thread.start()
@@ -199,7 +365,7 @@ class CSATApp(App):
         elif selected == "start_udp":
             try:
                 from src.server import UDPServer
-                self.udp_server = UDPServer(log_callback=self.add_server_log)
+                self.udp_server = UDPServer(log_sink=self.server_sink, flow_table=self.flow_table)
                 server_thread = threading.Thread(target=self.udp_server.start)
                 server_thread.daemon = True
                 server_thread.start()
@@ -213,6 +379,67 @@ class CSATApp(App):
             self.send_message()
         elif selected == "send_udp":
             self.send_udp_message()
+        elif selected == "top_flows":
+            self.show_top_flows()
+        elif selected == "profile":
+            self.toggle_profile()
+
+    def _running_servers(self):
+        return [getattr(self, name) for name in ('tcp_server', 'udp_server') if hasattr(self, name)]
+
+    def toggle_profile(self) -> None:
+        """inicia una captura de los servidores en marcha, o termina antes la que está en curso
+
+        El tipo se toma del input ("cprofile" o "tracemalloc", cprofile si no es ninguno).
+        """
+        capture = self.profiler.capture
+        if capture is not None and capture.active:
+            self.add_server_log("Terminando la captura antes de tiempo...")
+            # stop() guarda el archivo: fuera del hilo de la app
+            threading.Thread(target=capture.stop, daemon=True).start()
+            return
+        servers = self._running_servers()
+        if not servers:
+            self.add_server_log("No hay servidores en marcha para perfilar")
+            return
+        kind = self.query_one("#message_input", Input).value.strip().lower()
+        if kind not in KINDS:
+            kind = CPROFILE
+        self.profiler = HotPathProfiler()
+        for server in servers:
+            server.enable_hooks(self.profiler)
+        try:
+            self.profiler.start_capture(kind, self.PROFILE_SECONDS, on_done=self._profile_done)
+        except RuntimeError as e:
+            for server in servers:
+                server.disable_hooks()
+            self.add_server_log(f"No se pudo iniciar la captura: {e}")
+            return
+        self.add_server_log(f"Captura {kind} de {self.PROFILE_SECONDS} s iniciada (8 de nuevo para terminarla)")
+
+    def _profile_done(self, capture) -> None:
+        """se llama desde el hilo del timer al guardar la captura"""
+        for server in self._running_servers():
+            if server.hooks is self.profiler:
+                server.disable_hooks()
+        for line in capture.summary.splitlines():
+            self.add_server_log(line)
+        for line in format_stages(self.profiler.summary()):
+            self.add_server_log(line)
+
+    def show_top_flows(self, k: int = 10) -> None:
+        """muestra en el log del servidor los clientes con más bytes recibidos"""
+        flows = self.flow_table.top(k)
+        if not flows:
+            self.add_server_log("Sin flujos registrados")
+            return
+        self.add_server_log(f"=== Top {len(flows)} clientes por bytes ===")
+        for flow in flows:
+            rtt = f"  RTT {flow['rtt'] * 1000:.2f} ms" if flow['rtt'] else ""
+            self.add_server_log(
+                f"{flow['protocol'].upper()} {flow['ip']}:{flow['port']}  "
+                f"{flow['messages']} mensajes  {flow['bytes']} bytes{rtt}"
+            )
 
     def exit(self) -> None:
         """cierra la aplicación"""
@@ -224,6 +451,8 @@ class CSATApp(App):
         except Exception as e:
             self.add_server_log(f"Error al cerrar servidores: {e}")
         finally:
+            self.server_sink.stop()
+            self.client_sink.stop()
             super().exit()
 
 banner = """
@@ -0,0 +1,36 @@
+"""
+Fixtures compartidas: servidores en un hilo sobre un puerto elegido por el sistema.
+"""
+import threading
+import time
+
+import pytest
+
+def quiet(message):
+    """log_callback que descarta los mensajes"""
+
+def wait_for(predicate, timeout=5.0):
+    """espera a que predicate() sea verdadero (las métricas se registran después de responder)"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+@pytest.fixture
+def serve():
+    """inicia servidores (con port=0) en hilos daemon y los detiene al terminar el test"""
+    started = []
+
+    def start(server, timeout=5.0):
+        thread = threading.Thread(target=server.start, daemon=True)
+        thread.start()
+        assert server.ready.wait(timeout), f"{server.__class__.__name__} no quedó escuchando"
+        started.append((server, thread))
+        return server
+
+    yield start
+    for server, thread in started:
+        server.stop()
+        thread.join(timeout=5.0)
@@ -0,0 +1,50 @@
+import pytest
+
+from src.base.acks import PlainAckMatcher, UnexpectedReply
+from src.server import ACK_PREFIX
+
+def server_echo(payload, chunk):
+    """lo que responde el servidor sin framing si lee de a chunk bytes"""
+    return b''.join(ACK_PREFIX + payload[start:start + chunk] for start in range(0, len(payload), chunk))
+
+@pytest.mark.parametrize('payload', [
+    b'C' * 3000,
+    ACK_PREFIX,
+    (ACK_PREFIX + b'x') * 50,
+    b'a' * 1020 + ACK_PREFIX * 3 + b'fin',
+])
+@pytest.mark.parametrize('chunk', [1, 5, 1024])
+def test_echo_split_by_the_server(payload, chunk):
+    matcher = PlainAckMatcher(ACK_PREFIX)
+    for _ in range(2):
+        matcher.expect(payload)
+        assert not matcher.feed()
+        assert matcher.feed(server_echo(payload, chunk))
+    assert not matcher._buffer
+
+def test_reads_split_by_the_network():
+    payload = b'Co' * 600
+    echo = server_echo(payload, 1024)
+    matcher = PlainAckMatcher(ACK_PREFIX)
+    matcher.expect(payload)
+    results = [matcher.feed(echo[start:start + 100]) for start in range(0, len(echo), 100)]
+    assert results[-1] and not any(results[:-1])
+
+def test_pipelined_messages_under_one_prefix():
+    matcher = PlainAckMatcher(ACK_PREFIX, pipelined=True)
+    matcher.expect(b'uno')
+    assert matcher.feed(ACK_PREFIX + b'unodos' + ACK_PREFIX + b'tres')
+    matcher.expect(b'dos')
+    assert matcher.feed()
+    matcher.expect(b'tres')
+    assert matcher.feed()
+
+def test_unexpected_reply_is_returned():
+    matcher = PlainAckMatcher(ACK_PREFIX)
+    matcher.expect(b'hola')
+    with pytest.raises(UnexpectedReply) as error:
+        matcher.feed(b'Reduce la velocidad: hola')
+    assert error.value.data == b'Reduce la velocidad: hola'
+    # queda listo para el próximo mensaje
+    matcher.expect(b'hola')
+    assert matcher.feed(ACK_PREFIX + b'hola')
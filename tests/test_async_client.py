@@ -0,0 +1,91 @@
+import asyncio
+
+from src.async_client import AsyncTCPClient, AsyncUDPClient, run_sessions
+from src.async_server import AsyncTCPServer
+from src.server import ACK_PREFIX, TCPServer, UDPServer
+from tests.conftest import quiet, wait_for
+
+def test_many_tcp_sessions_on_one_loop(serve):
+    server = serve(AsyncTCPServer(port=0, log_callback=quiet))
+    messages = [f"mensaje {index}" for index in range(5)]
+    metrics, completed = asyncio.run(run_sessions(200, messages, 'tcp', port=server.port, log_callback=quiet))
+    assert completed == 200
+    assert metrics.snapshot()['messages'] == 1000
+    assert wait_for(lambda: server.counters['messages'] == 1000)
+
+def test_udp_sessions(serve):
+    server = serve(UDPServer(port=0, log_callback=quiet))
+    messages = [f"mensaje {index}" for index in range(5)]
+    metrics, completed = asyncio.run(run_sessions(50, messages, 'udp', port=server.port, log_callback=quiet))
+    assert completed == 50
+    assert metrics.snapshot()['messages'] == 250
+
+def test_compressed_tcp_client(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=True, compression=True))
+
+    async def session():
+        client = AsyncTCPClient(server.port, log_callback=quiet, compression='zlib')
+        assert await client.connect()
+        try:
+            assert client.codec is not None
+            assert await client.send_message('{"level": "INFO", "message": "hola"} ' * 20)
+        finally:
+            await client.close()
+
+    asyncio.run(session())
+
+def test_timeout_without_server():
+    async def session():
+        # nadie escucha: el datagrama se pierde (o vuelve ICMP) y send_message devuelve False
+        client = AsyncUDPClient(9, log_callback=quiet, timeout=0.2)
+        try:
+            return await client.send_message("hola")
+        finally:
+            await client.close()
+
+    assert asyncio.run(session()) is False
+
+def test_large_plain_messages_read_the_whole_echo(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+
+    async def session():
+        client = AsyncTCPClient(server.port, log_callback=quiet)
+        assert await client.connect()
+        try:
+            # el servidor confirma de a 1024 bytes: cada envío tiene que consumir todo su eco
+            for letter in 'aCb':
+                assert await client.send_message(letter * 3000)
+            assert not client._acks._buffer
+        finally:
+            await client.close()
+
+    asyncio.run(session())
+
+def test_reconnects_after_a_timeout():
+    async def session():
+        connections = []
+
+        async def handle(reader, writer):
+            connections.append(writer)
+            data = await reader.read(1024)
+            if len(connections) == 1:
+                # la primera confirmación llega después del timeout del cliente
+                await asyncio.sleep(0.3)
+            writer.write(ACK_PREFIX + data)
+            await writer.drain()
+            await reader.read(1024)
+            writer.close()
+
+        server = await asyncio.start_server(handle, 'localhost', 0)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncTCPClient(port, log_callback=quiet, timeout=0.1)
+        try:
+            assert await client.connect()
+            assert not await client.send_message("tarde")
+            assert await client.send_message("a tiempo")
+            assert len(connections) == 2
+        finally:
+            await client.close()
+            server.close()
+
+    asyncio.run(session())
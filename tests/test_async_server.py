@@ -0,0 +1,44 @@
+import socket
+
+import pytest
+
+from src.async_server import AsyncBaseServer, AsyncTCPServer, AsyncUDPServer
+from src.base.framing import FramedReader, send_frame
+from src.server import ACK_PREFIX
+from tests.conftest import quiet, wait_for
+
+def test_async_tcp_echo(serve):
+    server = serve(AsyncTCPServer(port=0, log_callback=quiet))
+    connections = [socket.create_connection(('localhost', server.port), timeout=5) for _ in range(3)]
+    try:
+        for index, sock in enumerate(connections):
+            sock.sendall(f'hola {index}'.encode())
+        for index, sock in enumerate(connections):
+            assert sock.recv(1024) == ACK_PREFIX + f'hola {index}'.encode()
+    finally:
+        for sock in connections:
+            sock.close()
+    assert wait_for(lambda: server.counters['messages'] == 3)
+    assert wait_for(lambda: server.counters['connections'] == 3)
+
+def test_async_tcp_framed_echo(serve):
+    server = serve(AsyncTCPServer(port=0, log_callback=quiet, framed=True))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        reader = FramedReader(sock)
+        payload = b'y' * 5000
+        send_frame(sock, payload)
+        assert bytes(reader.read_frame()) == ACK_PREFIX + payload
+
+def test_async_udp_echo(serve):
+    server = serve(AsyncUDPServer(port=0, log_callback=quiet))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        for index in range(3):
+            payload = f"datagrama {index}".encode()
+            sock.sendto(payload, ('localhost', server.port))
+            assert sock.recvfrom(2048)[0] == ACK_PREFIX + payload
+    assert wait_for(lambda: server.counters['messages'] == 3)
+
+def test_base_server_requires_serve():
+    with pytest.raises(TypeError):
+        AsyncBaseServer(port=0, log_callback=quiet)
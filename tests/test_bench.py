@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from src.bench import compare_results, format_report, main, run_benchmark
+
+@pytest.mark.parametrize('protocol,engine,framed', [
+    ('tcp', 'thread', False),
+    ('tcp', 'async', True),
+    ('udp', 'thread', False),
+])
+def test_closed_loop_run(protocol, engine, framed):
+    result = run_benchmark(protocol, engine, concurrency=2, duration=0.3, warmup=0.1, framed=framed)
+    results = result['results']
+    assert results['messages'] > 0
+    assert results['errors'] == 0
+    assert 0 < results['latency_us']['p50'] <= results['latency_us']['max']
+    assert 'Benchmark' in format_report(result)
+
+def test_open_loop_rate_is_respected():
+    result = run_benchmark('tcp', concurrency=2, rate=200, duration=0.5, warmup=0.1)
+    assert result['config']['mode'] == 'open'
+    assert 40 <= result['results']['messages'] <= 130
+
+def test_invalid_configurations():
+    with pytest.raises(ValueError):
+        run_benchmark('udp', framed=True)
+    with pytest.raises(ValueError):
+        run_benchmark('sctp')
+
+def test_compare_with_saved_run(tmp_path, capsys):
+    output = tmp_path / 'base.json'
+    assert main(['--duration', '0.2', '--warmup', '0', '--output', str(output)]) == 0
+    baseline = json.loads(output.read_text())
+    assert compare_results(baseline, baseline)['throughput_msgs'] == 0.0
+    assert main(['--duration', '0.2', '--warmup', '0', '--compare', str(output)]) == 0
+    assert 'throughput_msgs:' in capsys.readouterr().out
+
+def test_incomparable_runs_are_refused():
+    result = run_benchmark('tcp', duration=0.1, warmup=0)
+    other = json.loads(json.dumps(result))
+    other['config']['message_size'] = 512
+    other['config']['port'] += 1
+    with pytest.raises(ValueError, match='message_size'):
+        compare_results(result, other)
+    other = json.loads(json.dumps(result))
+    other['schema_version'] += 1
+    with pytest.raises(ValueError, match='schema_version'):
+        compare_results(result, other)
@@ -0,0 +1,32 @@
+import pytest
+
+from src.bulk import BulkClient, BulkServer, parse_size
+from tests.conftest import quiet, wait_for
+
+@pytest.mark.parametrize('text, size', [('512', 512), ('64K', 65536), ('10M', 10 * 1024 ** 2), ('1.5kb', 1536)])
+def test_parse_size(text, size):
+    assert parse_size(text) == size
+
+def test_payload_transfer_reports_both_sides(serve):
+    server = serve(BulkServer(port=0, log_callback=quiet, buffer_size=256 * 1024))
+    client = BulkClient(server.port, log_callback=quiet)
+    size = 8 * 1024 * 1024 + 123
+    report = client.send_payload(size, chunk_size=1024 * 1024)
+    assert report['client']['bytes'] == size
+    assert report['server']['bytes'] == size
+    # el servidor guarda su resultado después de enviar el reporte
+    assert wait_for(lambda: server.last_transfer is not None)
+    assert server.last_transfer['bytes'] == size
+
+def test_file_transfer(serve, tmp_path):
+    path = tmp_path / 'archivo.bin'
+    path.write_bytes(bytes(range(256)) * 4096)
+    server = serve(BulkServer(port=0, log_callback=quiet))
+    report = BulkClient(server.port, log_callback=quiet).send_file(str(path))
+    assert report['server']['bytes'] == 256 * 4096
+
+def test_unreachable_server_returns_none(serve):
+    server = serve(BulkServer(port=0, log_callback=quiet))
+    port = server.port
+    server.stop()
+    assert BulkClient(port, log_callback=quiet).send_payload(1024) is None
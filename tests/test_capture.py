@@ -0,0 +1,69 @@
+import os
+import socket
+
+from src.server import TCPServer
+from src.base.capture import GLOBAL_HEADER, CaptureReader, CaptureWriter
+from tests.conftest import wait_for
+
+CLIENT = ('10.0.0.1', 40000)
+SERVER = ('10.0.0.2', 54321)
+
+def test_roundtrip_and_filters(tmp_path):
+    path = str(tmp_path / 'trafico.pcap')
+    with CaptureWriter(path) as writer:
+        writer.write('tcp', CLIENT, SERVER, b'uno', ts_ns=1_000)
+        writer.write('udp', ('::1', 5000), ('::1', 5555), b'dos', ts_ns=2_000)
+        writer.write('tcp', CLIENT, SERVER, b'tres', ts_ns=3_000)
+    with CaptureReader(path) as reader:
+        assert len(reader) == 3
+        assert [bytes(payload) for _, _, payload in reader.filter(protocol='tcp')] == [b'uno', b'tres']
+        # los payloads son vistas sobre el mmap: se copian antes de cerrar el lector
+        assert [(ts, flow, bytes(payload)) for ts, flow, payload in reader.filter(host='::1')] == [
+            (2_000, ('udp', '::1', 5000, '::1', 5555), b'dos')]
+        assert [ts for ts, _, _ in reader.filter(start_ns=1_500, end_ns=3_000)] == [2_000, 3_000]
+        assert reader.flow_summary()[('tcp',) + CLIENT + SERVER] == (2, 1_000, 3_000)
+
+def test_interval_flush_without_close(tmp_path):
+    path = str(tmp_path / 'en_curso.pcap')
+    writer = CaptureWriter(path, flush_interval=0.1)
+    writer.write('udp', CLIENT, SERVER, b'hola')
+    # sin más mensajes el paquete igual llega al disco con la captura abierta
+    assert wait_for(lambda: os.path.getsize(path) > GLOBAL_HEADER.size, timeout=2.0)
+    with CaptureReader(path) as reader:
+        assert [bytes(payload) for _, _, payload in reader.filter()] == [b'hola']
+    writer.close()
+
+def test_buffered_until_interval(tmp_path):
+    path = str(tmp_path / 'buffer.pcap')
+    writer = CaptureWriter(path, flush_interval=60)
+    writer.write('udp', CLIENT, SERVER, b'hola')
+    assert os.path.getsize(path) == GLOBAL_HEADER.size
+    writer.close()
+    assert os.path.getsize(path) > GLOBAL_HEADER.size
+
+def test_close_flow_forgets_sequence(tmp_path):
+    writer = CaptureWriter(str(tmp_path / 'flujos.pcap'))
+    writer.write('tcp', CLIENT, SERVER, b'abc')
+    assert writer._tcp_seq
+    writer.close_flow(CLIENT, SERVER)
+    assert not writer._tcp_seq
+    writer.close()
+    # después de cerrar las escrituras se descartan sin error
+    writer.write('tcp', CLIENT, SERVER, b'tarde')
+
+def test_server_closes_capture_on_stop(serve, tmp_path):
+    path = str(tmp_path / 'servidor.pcap')
+    capture = CaptureWriter(path, flush_interval=60)
+    server = serve(TCPServer(port=0, log_callback=lambda message: None, capture=capture))
+    for index in range(3):
+        with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+            sock.sendall(f"mensaje {index}".encode())
+            sock.recv(1024)
+    assert wait_for(lambda: server.metrics.counters()['closed'] == 3)
+    # cada conexión cerrada suelta su secuencia TCP
+    assert not capture._tcp_seq
+    server.stop()
+    assert capture.closed
+    with CaptureReader(path) as reader:
+        assert sorted(bytes(payload) for _, _, payload in reader.filter(port=server.port)) == [
+            b'mensaje 0', b'mensaje 1', b'mensaje 2']
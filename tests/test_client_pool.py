@@ -0,0 +1,104 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from src.client_pool import AsyncTCPConnectionPool, TCPConnectionPool, is_alive
+from src.server import ACK_PREFIX, TCPServer
+from tests.conftest import quiet, wait_for
+
+@pytest.mark.parametrize('framed', [False, True])
+def test_large_messages_reuse_one_connection(serve, framed):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=framed))
+    with TCPConnectionPool(server.port, size=1, log_callback=quiet, framed=framed) as pool:
+        for index in range(5):
+            payload = bytes([65 + index]) * 3000
+            assert pool.request(payload) == ACK_PREFIX + payload
+        stats = pool.stats()['per_connection'][0]
+        assert stats['connects'] == 1
+        assert stats['health_failures'] == 0
+        assert stats['messages'] == 5
+
+def test_reconnects_after_server_closes_idle_connection(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, idle_timeout=0.2))
+    with TCPConnectionPool(server.port, size=1, log_callback=quiet) as pool:
+        assert pool.send_message("antes")
+        assert wait_for(lambda: server.reaper_stats()['reaped_idle'] == 1)
+        assert pool.send_message("después")
+        stats = pool.stats()['per_connection'][0]
+        assert stats['reconnects'] == 1
+        assert stats['health_failures'] == 1
+
+def test_dead_connection_is_replaced_before_reuse(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    with TCPConnectionPool(server.port, size=1, log_callback=quiet) as pool:
+        with pool.connection() as client:
+            client.request(b'hola')
+            client.socket.shutdown(socket.SHUT_RDWR)
+        connection = pool._idle[0]
+        assert not is_alive(connection.client.socket)
+        assert pool.request(b'otra vez') == ACK_PREFIX + b'otra vez'
+        assert connection.health_failures == 1
+        assert connection.reconnects == 1
+
+def test_retries_when_connection_dies_mid_exchange(serve, monkeypatch):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    with TCPConnectionPool(server.port, size=1, log_callback=quiet) as pool:
+        with pool.connection() as client:
+            client.request(b'hola')
+            client.socket.shutdown(socket.SHUT_RDWR)
+        # corte que el chequeo de salud no ve: falla el intercambio y se reintenta
+        monkeypatch.setattr('src.client_pool.is_alive', lambda sock: True)
+        assert pool.request(b'otra vez') == ACK_PREFIX + b'otra vez'
+        connection = pool._idle[0]
+        assert connection.send_failures == 1
+        assert connection.reconnects == 1
+
+def test_concurrent_requests_share_the_pool(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=True))
+    errors = []
+    with TCPConnectionPool(server.port, size=3, log_callback=quiet, framed=True) as pool:
+        def work(worker):
+            try:
+                for index in range(20):
+                    payload = f"{worker}-{index}".encode()
+                    assert pool.request(payload) == ACK_PREFIX + payload
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(worker,)) for worker in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = pool.stats()
+    assert errors == []
+    assert stats['connections'] <= 3
+    assert sum(entry['messages'] for entry in stats['per_connection']) == 120
+    assert wait_for(lambda: server.counters['messages'] == 120)
+
+def test_payload_containing_the_ack_prefix(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    with TCPConnectionPool(server.port, size=1, log_callback=quiet) as pool:
+        for payload in (ACK_PREFIX, b'a' * 1020 + ACK_PREFIX * 3 + b'fin', (ACK_PREFIX + b'x') * 200):
+            assert pool.request(payload) == ACK_PREFIX + payload
+        assert pool.stats()['per_connection'][0]['connects'] == 1
+
+def test_async_pool_reuses_and_replaces_connections(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, idle_timeout=0.3))
+
+    async def session():
+        async with AsyncTCPConnectionPool(server.port, size=2, log_callback=quiet) as pool:
+            # sesiones concurrentes: a lo sumo size conexiones
+            results = await asyncio.gather(*(pool.send_message('C' * 3000) for _ in range(6)))
+            assert all(results)
+            assert pool.stats()['connections'] <= 2
+            # el servidor cierra las ociosas: el chequeo de salud las reabre antes de reusarlas
+            await asyncio.sleep(0.6)
+            assert await pool.send_message("después")
+            stats = pool.stats()['per_connection']
+            assert sum(connection['health_failures'] for connection in stats) == 1
+            assert sum(connection['messages'] for connection in stats) == 7
+
+    asyncio.run(session())
@@ -0,0 +1,94 @@
+import socket
+import time
+import zlib
+
+import pytest
+
+from src.base.compression import (DEFLATE, DICTIONARY, CodecTable, CompressionError, DatagramCodec, StreamCodec,
+                                  encode_hello, is_hello, make_codec)
+from src.base.framing import MAX_FRAME_SIZE, FramedReader, send_frame
+from src.client import TCPClient
+from src.server import ACK_PREFIX, TCPServer, UDPServer
+from tests.conftest import quiet, wait_for
+
+def bomb(size, wbits=-15):
+    """flag DEFLATE + size ceros comprimidos (unos pocos KiB en el cable)"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, wbits, zdict=DICTIONARY)
+    return bytes([DEFLATE]) + compressor.compress(bytes(size)) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+@pytest.mark.parametrize('stream', [True, False])
+def test_roundtrip(stream):
+    sender = make_codec('zlib', stream, threshold=16)
+    receiver = make_codec('zlib', stream, threshold=16)
+    for payload in (b'corto', b'INFO Mensaje recibido desde la IP 127.0.0.1 ' * 20):
+        assert receiver.decode(sender.encode(payload)) == payload
+    assert sender.stats.compressed == 1
+
+def test_stream_codec_rejects_bomb():
+    codec = StreamCodec(max_size=1000)
+    with pytest.raises(CompressionError):
+        codec.decode(bomb(5000))
+
+def test_datagram_codec_rejects_bomb():
+    with pytest.raises(CompressionError):
+        DatagramCodec().decode(bomb(MAX_FRAME_SIZE + 1, DatagramCodec.WBITS))
+    assert DatagramCodec(max_size=1000).decode(bomb(1000, DatagramCodec.WBITS)) == bytes(1000)
+
+def test_unknown_flag_is_rejected():
+    with pytest.raises(CompressionError):
+        DatagramCodec().decode(b'hola')
+
+def test_codec_table_is_bounded():
+    table = CodecTable(max_entries=3)
+    for port in range(5):
+        table[('127.0.0.1', port)] = DatagramCodec()
+    assert len(table) == 3
+    assert table.get(('127.0.0.1', 0)) is None
+    assert table.get(('127.0.0.1', 4)) is not None
+    table[('127.0.0.1', 4)] = None
+    assert ('127.0.0.1', 4) not in table
+
+def test_codec_table_expires_idle_entries():
+    table = CodecTable(idle_timeout=0.05)
+    table[('127.0.0.1', 1)] = DatagramCodec()
+    time.sleep(0.1)
+    assert table.get(('127.0.0.1', 1)) is None
+    table[('127.0.0.1', 2)] = DatagramCodec()
+    time.sleep(0.1)
+    table[('127.0.0.1', 3)] = DatagramCodec()
+    assert len(table) == 1
+
+def test_tcp_client_negotiates_compression(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=True, compression=True))
+    client = TCPClient(server.port, log_callback=quiet, timeout=5, framed=True, compression='zlib')
+    assert client.connect()
+    try:
+        assert client.codec is not None
+        payload = b'{"level": "INFO", "message": "hola"} ' * 50
+        assert client.request(payload) == ACK_PREFIX + payload
+    finally:
+        client.close()
+
+def test_tcp_server_closes_connection_on_bomb(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=True, compression=True))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        reader = FramedReader(sock)
+        send_frame(sock, encode_hello())
+        assert is_hello(reader.read_frame())
+        send_frame(sock, bomb(MAX_FRAME_SIZE + 1)[:-4])
+        assert reader.read_frame() is None
+    assert wait_for(lambda: server.counters['errors'] == 1)
+
+def test_udp_server_forgets_codec_on_bad_payload(serve):
+    server = serve(UDPServer(port=0, log_callback=quiet, compression=True))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        address = ('localhost', server.port)
+        sock.sendto(encode_hello(), address)
+        assert is_hello(sock.recvfrom(1024)[0])
+        assert len(server.codecs) == 1
+        # otro cliente en el mismo ip:puerto que no negoció compresión
+        sock.sendto(b'hola', address)
+        assert wait_for(lambda: len(server.codecs) == 0)
+        sock.sendto(b'hola', address)
+        assert sock.recvfrom(1024)[0] == ACK_PREFIX + b'hola'
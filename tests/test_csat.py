@@ -0,0 +1,71 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src import csat
+
+ROOT = Path(__file__).parent.parent
+
+def start_serve(*arguments):
+    """lanza `csat serve` en otro proceso y espera su línea READY"""
+    process = subprocess.Popen([sys.executable, '-m', 'src.csat', 'serve', '--port', '0', '--quiet', *arguments],
+                               cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline().split()
+    if not line or line[0] != 'READY':
+        process.kill()
+        pytest.fail(f"serve no quedó listo: {process.stderr.read()}")
+    return process, line
+
+def stop_serve(process):
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=10) == 0
+
+@pytest.mark.parametrize('protocol, engine', [('tcp', 'thread'), ('udp', 'thread'), ('tcp', 'async')])
+def test_serve_and_send(protocol, engine, tmp_path, capsys):
+    ready_file = tmp_path / 'listo.json'
+    process, (_, ready_protocol, host, port, pid) = start_serve(
+        '--protocol', protocol, '--engine', engine, '--ready-file', str(ready_file))
+    try:
+        assert ready_protocol == protocol and int(pid) == process.pid
+        info = json.loads(ready_file.read_text())
+        assert info['port'] == int(port) and info['engine'] == engine
+        code = csat.main(['send', '--protocol', protocol, '--port', port, '--quiet', '--json', '-n', '7'])
+        summary = json.loads(capsys.readouterr().out)
+        assert code == 0
+        assert summary['sent'] == summary['confirmed'] == 7
+    finally:
+        stop_serve(process)
+    # al terminar se borra el archivo de listo
+    assert not ready_file.exists()
+
+def test_send_fails_without_server(capsys):
+    process, (_, _, _, port, _) = start_serve()
+    stop_serve(process)
+    assert csat.main(['send', '--port', port, '--quiet']) == 1
+
+@pytest.mark.parametrize('arguments', [
+    ['--protocol', 'udp', '--mode', 'framed'],
+    ['--protocol', 'tcp', '--mode', 'reliable'],
+    ['--protocol', 'tcp', '--rcvbuf', '1M'],
+])
+def test_invalid_combinations(arguments, capsys):
+    assert csat.main(['serve', '--port', '0', *arguments]) == 2
+    assert capsys.readouterr().err
+
+@pytest.mark.parametrize('command', ['serve', 'send'])
+def test_compression_needs_framing_over_tcp(command, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        csat.main([command, '--port', '0', '--protocol', 'tcp', '--mode', 'echo', '--compression'])
+    assert exit_info.value.code == 2
+    assert '--mode framed' in capsys.readouterr().err
+
+def test_ready_file_is_atomic(tmp_path):
+    path = tmp_path / 'listo.json'
+    csat.write_ready_file(str(path), {'port': 1})
+    assert json.loads(path.read_text()) == {'port': 1}
+    assert os.listdir(tmp_path) == ['listo.json']
@@ -0,0 +1,42 @@
+import socket
+
+import pytest
+
+from src.listeners import TCP, UDP, ListenerManager
+from src.reliable_udp import ReliableUDPServer
+from src.server import ACK_PREFIX, TCPServer, UDPServer
+from tests.conftest import quiet
+
+# no es UTF-8 válido: el eco tiene que volver byte a byte, sin decodificar
+PAYLOAD = bytes(range(256))
+
+def tcp_echo(port, payload):
+    expected = len(ACK_PREFIX) + len(payload)
+    reply = b''
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(payload)
+        while len(reply) < expected:
+            data = sock.recv(1024)
+            if not data:
+                break
+            reply += data
+    return reply
+
+def udp_echo(port, payload):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        sock.sendto(payload, ('127.0.0.1', port))
+        return sock.recvfrom(1024)[0]
+
+@pytest.mark.parametrize('server_class', [TCPServer, UDPServer, ReliableUDPServer])
+def test_servers_echo_non_utf8_payloads(serve, server_class):
+    server = serve(server_class('127.0.0.1', 0, quiet))
+    echo = tcp_echo if server_class is TCPServer else udp_echo
+    assert echo(server.port, PAYLOAD) == ACK_PREFIX + PAYLOAD
+
+def test_listeners_echo_non_utf8_payloads(serve):
+    manager = ListenerManager([(TCP, '127.0.0.1', 0), (UDP, '127.0.0.1', 0)], log_callback=quiet)
+    tcp, udp = manager.listeners.values()
+    serve(manager)
+    assert tcp_echo(tcp.port, PAYLOAD) == ACK_PREFIX + PAYLOAD
+    assert udp_echo(udp.port, PAYLOAD) == ACK_PREFIX + PAYLOAD
@@ -0,0 +1,45 @@
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.base.exporter import MetricsExporter, render_metrics
+from src.base.metrics import Metrics
+from src.server import TCPServer
+from tests.conftest import quiet, wait_for
+
+def test_render_counters_and_histogram():
+    metrics = Metrics()
+    metrics.connection_opened()
+    for latency in (20_000, 300_000, 2_000_000):
+        metrics.message(100, latency)
+    text = render_metrics({'tcp': metrics})
+    assert 'csat_messages_total{server="tcp"} 3' in text
+    assert 'csat_bytes_total{server="tcp"} 300' in text
+    assert 'csat_connections_active{server="tcp"} 1' in text
+    assert 'csat_latency_seconds_bucket{server="tcp",le="2.5e-05"} 1' in text
+    assert 'csat_latency_seconds_bucket{server="tcp",le="0.001"} 2' in text
+    assert 'csat_latency_seconds_bucket{server="tcp",le="+Inf"} 3' in text
+    assert 'csat_latency_seconds_count{server="tcp"} 3' in text
+    assert text.endswith('\n')
+
+def test_http_scrape_of_running_server(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        sock.sendall(b'hola')
+        sock.recv(1024)
+    assert wait_for(lambda: server.counters['messages'] == 1)
+
+    exporter = MetricsExporter({'tcp': server}, port=0).start()
+    try:
+        with urllib.request.urlopen(exporter.url, timeout=5) as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            body = response.read().decode()
+        assert 'csat_messages_total{server="tcp"} 1' in body
+        assert 'csat_reaper_' in body
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://{exporter.host}:{exporter.port}/otra", timeout=5)
+        assert error.value.code == 404
+    finally:
+        exporter.stop()
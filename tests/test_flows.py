@@ -0,0 +1,56 @@
+import csv
+
+import pytest
+
+from src.base.flows import FlowTable
+
+def test_record_and_top():
+    table = FlowTable(capacity=2)
+    for port, size in ((1, 10), (2, 300), (3, 50), (2, 300)):
+        table.record('udp', ('10.0.0.1', port), size, now=100.0)
+    assert len(table) == 3
+    top = table.top(2)
+    assert [(row['port'], row['bytes'], row['messages']) for row in top] == [(2, 600, 2), (3, 50, 1)]
+    assert table.top(1, by='messages')[0]['port'] == 2
+    with pytest.raises(ValueError):
+        table.top(by='nada')
+
+def test_max_flows_evicts_least_recent():
+    table = FlowTable(max_flows=3)
+    for port in range(3):
+        table.record('tcp', ('10.0.0.1', port), 1, now=100.0 + port)
+    table.record('tcp', ('10.0.0.1', 0), 1, now=200.0)
+    table.record('tcp', ('10.0.0.1', 99), 1, now=201.0)
+    assert len(table) == 3
+    assert table.evicted == 1
+    assert {row['port'] for row in table.top(10)} == {0, 2, 99}
+
+def test_expire_reuses_slots():
+    table = FlowTable()
+    for port in range(100):
+        table.record('tcp', ('10.0.0.1', port), 1, now=100.0)
+    table.record('tcp', ('10.0.0.1', 5), 1, now=500.0)
+    assert table.expire(60, now=520.0) == 99
+    assert len(table) == 1
+    rows_before = len(table.keys)
+    for port in range(1000, 1050):
+        table.record('tcp', ('10.0.0.1', port), 1, now=530.0)
+    # las filas liberadas se reutilizan en vez de crecer
+    assert len(table.keys) == rows_before
+    assert len(table.top(100)) == 51
+
+def test_rtt_smoothing():
+    table = FlowTable(rtt_alpha=0.5)
+    table.record('tcp', ('10.0.0.1', 1), 1)
+    table.update_rtt('tcp', ('10.0.0.1', 1), 0.010)
+    table.update_rtt('tcp', ('10.0.0.1', 1), 0.020)
+    assert table.top(1)[0]['rtt'] == pytest.approx(0.015)
+
+def test_export_csv(tmp_path):
+    table = FlowTable()
+    table.record('udp', ('::1', 5000), 42)
+    path = tmp_path / 'flujos.csv'
+    table.export_csv(str(path))
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]['ip'] == '::1' and rows[0]['bytes'] == '42'
@@ -0,0 +1,76 @@
+import socket
+
+import pytest
+
+from src.base.framing import HEADER, BufferPool, FrameError, FramedReader, encode_frame, send_frame
+from src.server import ACK_PREFIX
+
+class ChunkedSocket:
+    """socket falso que entrega los datos de a chunk bytes por recv_into"""
+    def __init__(self, data, chunk):
+        self.data = data
+        self.chunk = chunk
+
+    def recv_into(self, view):
+        size = min(self.chunk, len(view), len(self.data))
+        view[:size] = self.data[:size]
+        self.data = self.data[size:]
+        return size
+
+@pytest.mark.parametrize('chunk', [1, 3, 7, 4096])
+def test_partial_reads(chunk):
+    payloads = [b'', b'a', b'hola mundo', bytes(range(256)) * 4]
+    sock = ChunkedSocket(b''.join(encode_frame(payload) for payload in payloads), chunk)
+    reader = FramedReader(sock, BufferPool(buffer_size=64, max_buffers=1))
+    for payload in payloads:
+        assert bytes(reader.read_frame()) == payload
+    assert reader.read_frame() is None
+
+def test_frame_larger_than_buffer_grows():
+    payload = b'z' * 10000
+    reader = FramedReader(ChunkedSocket(encode_frame(payload), 1000), BufferPool(buffer_size=128))
+    assert bytes(reader.read_frame()) == payload
+
+def test_truncated_frame_returns_none():
+    data = encode_frame(b'incompleto')[:-3]
+    reader = FramedReader(ChunkedSocket(data, 2))
+    assert reader.read_frame() is None
+
+def test_oversized_frame_rejected():
+    reader = FramedReader(ChunkedSocket(HEADER.pack(1000), 4), max_frame_size=100)
+    with pytest.raises(FrameError):
+        reader.read_frame()
+
+def test_over_socketpair():
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(encode_frame(b'uno') + encode_frame(b'dos'))
+        reader = FramedReader(right)
+        assert bytes(reader.read_frame()) == b'uno'
+        assert bytes(reader.read_frame()) == b'dos'
+
+def test_frames_are_views_over_the_pooled_buffer():
+    pool = BufferPool(buffer_size=64, max_buffers=1)
+    reader = FramedReader(ChunkedSocket(encode_frame(b'uno'), 64), pool)
+    buffer = reader._buffer
+    frame = reader.read_frame()
+    # sin copia: el payload apunta al buffer de la conexión
+    assert frame.obj is buffer and bytes(frame) == b'uno'
+    frame.release()
+    reader.close()
+    # la conexión siguiente reutiliza el mismo buffer
+    assert pool.acquire() is buffer
+
+def test_grown_buffers_are_not_pooled():
+    pool = BufferPool(buffer_size=64, max_buffers=4)
+    reader = FramedReader(ChunkedSocket(encode_frame(b'x' * 1000), 256), pool)
+    assert len(reader.read_frame()) == 1000
+    reader.close()
+    # el buffer original volvió al crecer; el grande se descarta al cerrar
+    assert [len(buffer) for buffer in pool._free] == [64]
+
+def test_send_frame_joins_parts():
+    left, right = socket.socketpair()
+    with left, right:
+        send_frame(left, ACK_PREFIX, memoryview(b'hola'))
+        assert bytes(FramedReader(right).read_frame()) == ACK_PREFIX + b'hola'
@@ -0,0 +1,33 @@
+from src.base.histogram import SUB_BUCKETS, LatencyHistogram, bucket_index, bucket_value
+
+def test_bucket_relative_error():
+    for value in (1, 63, 64, 1000, 123456, 10 ** 9):
+        assert abs(bucket_value(bucket_index(value)) - value) <= value / SUB_BUCKETS
+
+def test_percentiles_uniform():
+    histogram = LatencyHistogram()
+    for value in range(1, 10001):
+        histogram.record(value * 1000)
+    percentiles = histogram.percentiles((50, 99))
+    assert abs(percentiles[50] - 5_000_000) <= 5_000_000 / SUB_BUCKETS
+    assert abs(percentiles[99] - 9_900_000) <= 9_900_000 / SUB_BUCKETS
+    assert histogram.percentile(100) == histogram.max == 10_000_000
+    assert histogram.min == 1000
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0
+    assert histogram.mean() == 0.0
+
+def test_merge_and_since():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for value in (100, 200, 300):
+        first.record(value)
+    before = first.copy()
+    second.record(5000)
+    first.merge(second)
+    assert first.count == 4
+    assert first.max == 5000
+    delta = first.since(before)
+    assert delta.count == 1
+    assert delta.total == 5000
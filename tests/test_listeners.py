@@ -0,0 +1,109 @@
+import socket
+
+import pytest
+
+from src.base.rate_limit import DELAY
+from src.listeners import TCP, UDP, ListenerManager, format_endpoint, parse_endpoint
+from src.server import ACK_PREFIX
+from tests.conftest import quiet, wait_for
+
+def has_ipv6():
+    if not socket.has_ipv6:
+        return False
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_DGRAM) as sock:
+            sock.bind(('::1', 0))
+        return True
+    except OSError:
+        return False
+
+def tcp_echo(host, port, payload):
+    with socket.create_connection((host, port), timeout=5) as sock:
+        sock.sendall(payload)
+        return sock.recv(1024)
+
+def udp_echo(host, port, payload):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        sock.sendto(payload, (host, port))
+        return sock.recvfrom(1024)[0]
+
+def test_parse_and_format_endpoint():
+    assert parse_endpoint('tcp:0.0.0.0:54321') == (TCP, '0.0.0.0', 54321)
+    assert parse_endpoint('udp:[::1]:5555') == (UDP, '::1', 5555)
+    assert format_endpoint(UDP, '::1', 5555) == 'udp:[::1]:5555'
+    with pytest.raises(ValueError):
+        parse_endpoint('sctp:localhost:1')
+
+def test_tcp_and_udp_on_one_thread(serve):
+    manager = ListenerManager([(TCP, '127.0.0.1', 0), (UDP, '127.0.0.1', 0)], log_callback=quiet)
+    tcp, udp = manager.listeners.values()
+    serve(manager)
+    assert tcp_echo('127.0.0.1', tcp.port, b'hola tcp') == ACK_PREFIX + b'hola tcp'
+    assert udp_echo('127.0.0.1', udp.port, b'hola udp') == ACK_PREFIX + b'hola udp'
+    assert wait_for(lambda: manager.counters['messages'] == 2)
+    stats = {entry['protocol']: entry for entry in manager.listener_stats()}
+    assert stats[TCP]['accepted'] == 1
+    assert stats[UDP]['messages'] == 1
+
+def test_add_and_remove_while_running(serve):
+    manager = serve(ListenerManager(log_callback=quiet))
+    listener = manager.add_listener(TCP, '127.0.0.1', 0)
+    assert tcp_echo('127.0.0.1', listener.port, b'nuevo') == ACK_PREFIX + b'nuevo'
+    # el puerto ya está tomado por el listener
+    with pytest.raises(OSError):
+        manager.add_listener(TCP, '127.0.0.1', listener.port)
+
+    manager.remove_listener(TCP, '127.0.0.1', listener.port)
+    assert wait_for(lambda: listener.sock.fileno() == -1)
+    with pytest.raises(OSError):
+        tcp_echo('127.0.0.1', listener.port, b'cerrado')
+    with pytest.raises(ValueError):
+        manager.remove_listener(TCP, '127.0.0.1', listener.port)
+
+def test_remove_keeps_accepted_connections(serve):
+    manager = serve(ListenerManager(log_callback=quiet))
+    listener = manager.add_listener(TCP, '127.0.0.1', 0)
+    with socket.create_connection(('127.0.0.1', listener.port), timeout=5) as sock:
+        sock.sendall(b'uno')
+        assert sock.recv(1024) == ACK_PREFIX + b'uno'
+        manager.remove_listener(TCP, '127.0.0.1', listener.port)
+        sock.sendall(b'dos')
+        assert sock.recv(1024) == ACK_PREFIX + b'dos'
+
+@pytest.mark.skipif(not has_ipv6(), reason="sin IPv6 en este equipo")
+def test_ipv6_listeners(serve):
+    manager = serve(ListenerManager(log_callback=quiet))
+    tcp = manager.add_listener(TCP, '::1', 0)
+    udp = manager.add_listener(UDP, '::1', 0)
+    assert tcp_echo('::1', tcp.port, b'v6') == ACK_PREFIX + b'v6'
+    assert udp_echo('::1', udp.port, b'v6') == ACK_PREFIX + b'v6'
+
+class DelayFirst:
+    """rate_limiter de prueba: demora solo el primer mensaje"""
+    def __init__(self, wait):
+        self.wait = wait
+        self.calls = 0
+
+    def check(self, ip, nbytes):
+        self.calls += 1
+        return (DELAY, self.wait) if self.calls == 1 else (None, 0.0)
+
+def test_replies_wait_behind_a_delayed_message(serve):
+    manager = ListenerManager([(TCP, '127.0.0.1', 0)], log_callback=quiet, rate_limiter=DelayFirst(0.2))
+    listener, = manager.listeners.values()
+    serve(manager)
+    expected = ACK_PREFIX + b'uno' + ACK_PREFIX + b'dos'
+    reply = b''
+    with socket.create_connection(('127.0.0.1', listener.port), timeout=5) as sock:
+        sock.sendall(b'uno')
+        assert wait_for(lambda: manager.rate_limiter.calls == 1)
+        sock.sendall(b'dos')
+        while len(reply) < len(expected):
+            data = sock.recv(1024)
+            if not data:
+                break
+            reply += data
+    # 'dos' pasa el rate_limiter pero no se adelanta al eco demorado de 'uno'
+    assert reply == expected
@@ -0,0 +1,95 @@
+import socket
+
+import pytest
+
+from src.server import TCPServer
+from src.base.log_sink import DROP_NEWEST, DROP_OLDEST, SAMPLE, LazyText, LogBuffer, LogSink, format_event
+
+class Exploding:
+    """argumento que falla si alguien lo formatea"""
+    def __format__(self, spec):
+        raise AssertionError("se formateó en el camino caliente")
+
+def test_formatting_is_deferred_to_flush():
+    lines = []
+    sink = LogSink(callback=lines.append)
+    sink.emit("Mensaje {}", (Exploding(),))
+    assert lines == [] and sink.pending() == 1
+    sink._queue.clear()
+    sink.emit("Mensaje {} de {}", (LazyText(b'hola'), ('127.0.0.1', 5555)))
+    sink.emit("ya formateado")
+    assert sink.flush() == 2
+    assert lines == ["Mensaje hola de ('127.0.0.1', 5555)", "ya formateado"]
+
+def test_timestamp_placeholder():
+    assert format_event("Tiempo: {ts}", (), 0).startswith("Tiempo: ")
+
+def test_batches():
+    batches = []
+    sink = LogSink(batch_callback=batches.append, batch_size=4)
+    for index in range(10):
+        sink.emit("linea {}", (index,))
+    sink.flush()
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert sink.stats()['written'] == 10
+
+@pytest.mark.parametrize('policy, kept', [
+    (DROP_NEWEST, ['0', '1', '2', '3']),
+    (DROP_OLDEST, ['6', '7', '8', '9']),
+])
+def test_overflow_policies(policy, kept):
+    lines = []
+    sink = LogSink(callback=lines.append, max_queue=4, policy=policy)
+    for index in range(10):
+        sink.emit("{}", (index,))
+    sink.flush()
+    assert lines == kept
+    assert sink.dropped == 6
+
+def test_sample_policy_keeps_some_over_high_water():
+    lines = []
+    sink = LogSink(callback=lines.append, max_queue=100, policy=SAMPLE, sample_every=10)
+    for index in range(200):
+        sink.emit("{}", (index,))
+    sink.flush()
+    # hasta la marca de agua (75) entra todo, después 1 de cada 10 hasta llenar
+    assert 75 < len(lines) < 100
+    assert sink.dropped == 200 - len(lines)
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        LogSink(policy='todo')
+
+def test_background_thread_drains_on_stop():
+    lines = []
+    sink = LogSink(callback=lines.append, flush_interval=0.01).start()
+    for index in range(1000):
+        sink.emit("{}", (index,))
+    sink.stop()
+    assert len(lines) == 1000
+
+def test_server_logs_through_sink(serve):
+    lines = []
+    sink = LogSink(callback=lines.append)
+    server = serve(TCPServer(port=0, log_sink=sink))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        sock.sendall(b'hola')
+        sock.recv(1024)
+    sink.flush()
+    assert any(line.startswith("Mensaje recibido desde la IP 127.0.0.1") for line in lines)
+
+def test_log_buffer_counts_entries_per_flush():
+    writes = []
+    buffer = LogBuffer()
+    sink = LogSink(batch_callback=lambda entries: writes.append(buffer.flush(entries)), batch_size=100)
+    sink.emit("uno")
+    sink.emit("\n=== Cliente TCP ===")
+    sink.emit("tres")
+    sink.flush()
+    # un lote, una escritura; los saltos de línea parten la entrada pero no cuentan como agrupadas
+    assert writes == [["uno", "", "=== Cliente TCP ===", "tres"]]
+    assert (buffer.entries, buffer.flushes, buffer.coalesced) == (3, 1, 2)
+    sink.emit("cuatro")
+    sink.flush()
+    assert (buffer.entries, buffer.flushes, buffer.coalesced) == (4, 2, 2)
+    assert buffer.flush([]) == [] and buffer.flushes == 2
@@ -0,0 +1,69 @@
+import socket
+import threading
+
+from src.server import TCPServer
+from src.base.metrics import Metrics, MetricsSampler, combine
+from tests.conftest import wait_for
+
+def test_counters_from_many_threads():
+    metrics = Metrics()
+
+    def work():
+        for _ in range(1000):
+            metrics.message(10, 1000)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    snapshot = metrics.snapshot()
+    assert snapshot['messages'] == 4000
+    assert snapshot['bytes'] == 40000
+    assert snapshot['latency'].count == 4000
+
+def test_retired_threads_keep_totals_and_free_shards():
+    metrics = Metrics()
+
+    def connection():
+        metrics.connection_opened()
+        metrics.message(5, 2000)
+        metrics.connection_closed()
+        metrics.retire_thread()
+
+    for _ in range(20):
+        thread = threading.Thread(target=connection)
+        thread.start()
+        thread.join()
+    assert metrics.shard_count() == 0
+    snapshot = metrics.snapshot()
+    assert snapshot['connections'] == snapshot['closed'] == 20
+    assert snapshot['messages'] == 20
+    assert snapshot['latency'].count == 20
+    assert snapshot['active_connections'] == 0
+    # un hilo retirado que vuelve a registrar empieza un shard nuevo
+    metrics.message(1)
+    metrics.retire_thread()
+    metrics.retire_thread()
+    assert metrics.counters()['messages'] == 21
+
+def test_tcp_server_does_not_keep_a_shard_per_connection(serve):
+    server = serve(TCPServer(port=0, log_callback=lambda message: None, backlog=64))
+    for _ in range(50):
+        with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+            sock.sendall(b'ping')
+            sock.recv(1024)
+    assert wait_for(lambda: server.metrics.counters()['closed'] == 50)
+    assert wait_for(lambda: server.metrics.shard_count() <= 1)
+    assert server.counters['messages'] == 50
+
+def test_sampler_rates():
+    metrics = Metrics()
+    sampler = MetricsSampler(lambda: [metrics])
+    assert sampler.sample() is None
+    for _ in range(100):
+        metrics.message(10, 50_000)
+    sample = sampler.sample()
+    assert sample['msgs_per_sec'] > 0
+    assert 40 <= sample['p99_us'] <= 60
+    assert combine([metrics.snapshot(), metrics.snapshot()])['messages'] == 200
@@ -0,0 +1,61 @@
+import json
+import os
+import socket
+import urllib.request
+
+import pytest
+
+from src.base.exporter import MetricsExporter
+from src.base.profiling import CPROFILE, RECV, STAGES, HotPathProfiler
+from src.server import TCPServer
+from tests.conftest import quiet, wait_for
+
+def exchange(port, count=5):
+    with socket.create_connection(('localhost', port), timeout=5) as sock:
+        for index in range(count):
+            sock.sendall(f'mensaje {index}'.encode())
+            sock.recv(1024)
+
+def test_stage_histograms():
+    profiler = HotPathProfiler()
+    mark = profiler.begin()
+    profiler.end(RECV, mark)
+    summary = profiler.summary()
+    assert set(summary) == set(STAGES)
+    assert summary[STAGES[RECV]]['count'] == 1
+
+def test_exporter_capture_removes_hooks_when_done(tmp_path, serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    exporter = MetricsExporter({'tcp': server}, port=0, profile_dir=str(tmp_path))
+    capture = exporter.start_profile(CPROFILE, 0.3)
+    assert server.hooks is exporter.profiler
+    exchange(server.port)
+    assert capture.done.wait(5)
+    assert server.hooks is None
+    assert os.path.exists(capture.path)
+    assert capture.messages == 5
+    # una segunda captura vuelve a instalar los hooks
+    exporter.start_profile(CPROFILE, 5)
+    assert server.hooks is exporter.profiler
+    with pytest.raises(RuntimeError):
+        exporter.start_profile(CPROFILE, 5)
+    exporter.stop_profile()
+    assert server.hooks is None
+
+def test_profile_over_http(tmp_path, serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    exporter = MetricsExporter({'tcp': server}, port=0, profile_dir=str(tmp_path)).start()
+    base = f"http://{exporter.host}:{exporter.port}"
+    try:
+        request = urllib.request.Request(f"{base}/profile/start?kind=cprofile&seconds=5", method='POST')
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert json.load(response)['capture']['active'] is True
+        exchange(server.port)
+        request = urllib.request.Request(f"{base}/profile/stop", method='POST')
+        with urllib.request.urlopen(request, timeout=5) as response:
+            status = json.load(response)
+        assert status['capture']['active'] is False
+        assert status['stages']['recv']['count'] == 5
+        assert wait_for(lambda: server.hooks is None)
+    finally:
+        exporter.stop()
@@ -0,0 +1,87 @@
+import socket
+import time
+
+import pytest
+
+from src.base.rate_limit import DELAY, DROP, SLOW_DOWN, SLOW_DOWN_PREFIX, RateLimiter
+from src.server import ACK_PREFIX, TCPServer, UDPServer
+from tests.conftest import quiet, wait_for
+
+def test_drop_after_burst():
+    limiter = RateLimiter(messages_per_ip=10, burst=0.5)
+    actions = [limiter.check('10.0.0.1', 10)[0] for _ in range(8)]
+    assert actions == [None] * 5 + [DROP] * 3
+    # otra IP tiene su propio bucket
+    assert limiter.check('10.0.0.2', 10) == (None, 0.0)
+    stats = limiter.stats()
+    assert stats['allowed'] == 6
+    assert stats['dropped'] == 3
+    assert limiter.top_throttled() == [('10.0.0.1', 3)]
+
+def test_delay_reserves_turns_until_max_delay():
+    limiter = RateLimiter(messages_per_ip=100, burst=0.01, action=DELAY, max_delay=0.05)
+    assert limiter.check('10.0.0.1', 1)[0] is None
+    waits = []
+    for _ in range(8):
+        action, wait = limiter.check('10.0.0.1', 1)
+        waits.append((action, wait))
+    delayed = [wait for action, wait in waits if action == DELAY]
+    assert delayed == sorted(delayed)
+    assert all(wait <= 0.05 for wait in delayed)
+    assert waits[-1][0] == DROP
+
+def test_byte_limit_and_global_limit():
+    limiter = RateLimiter(bytes_per_ip=1000, messages_global=3, burst=1.0, action=SLOW_DOWN)
+    assert limiter.check('10.0.0.1', 600)[0] is None
+    assert limiter.check('10.0.0.1', 600)[0] == SLOW_DOWN
+    assert limiter.check('10.0.0.2', 10)[0] is None
+    assert limiter.check('10.0.0.3', 10)[0] is None
+    # el par global ya se gastó aunque la IP sea nueva
+    assert limiter.check('10.0.0.4', 10)[0] == SLOW_DOWN
+
+def test_unknown_action_is_rejected():
+    with pytest.raises(ValueError):
+        RateLimiter(messages_per_ip=1, action='ignorar')
+
+def test_sweep_forgets_idle_clients():
+    limiter = RateLimiter(messages_per_ip=1000, burst=0.01, max_clients=4)
+    for index in range(4):
+        limiter.check(f'10.0.0.{index}', 1)
+    time.sleep(0.05)
+    limiter.check('10.0.1.1', 1)
+    assert limiter.stats()['clients'] == 1
+
+def test_max_clients_is_a_hard_cap():
+    limiter = RateLimiter(messages_per_ip=2, burst=1.0, max_clients=4)
+    for index in range(4):
+        assert limiter.check(f'10.0.0.{index}', 1)[0] is None
+    # todos siguen activos: las IPs nuevas comparten un bucket de reserva
+    actions = [limiter.check(f'10.0.1.{index}', 1)[0] for index in range(4)]
+    assert actions == [None, None, DROP, DROP]
+    assert limiter.stats()['clients'] == 4
+    # las IPs con bucket propio no se ven afectadas
+    assert limiter.check('10.0.0.0', 1)[0] is None
+
+def test_tcp_server_replies_slow_down(serve):
+    limiter = RateLimiter(messages_per_ip=1, burst=1.0, action=SLOW_DOWN)
+    server = serve(TCPServer(port=0, log_callback=quiet, rate_limiter=limiter))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        sock.sendall(b'uno')
+        assert sock.recv(1024) == ACK_PREFIX + b'uno'
+        sock.sendall(b'dos')
+        assert sock.recv(1024).startswith(SLOW_DOWN_PREFIX)
+    assert server.rate_limit_stats()['slowed'] == 1
+
+def test_udp_server_delays_only_the_limited_client(serve):
+    limiter = RateLimiter(messages_per_ip=20, burst=0.05, action=DELAY)
+    server = serve(UDPServer(port=0, log_callback=quiet, rate_limiter=limiter))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        started = time.monotonic()
+        for index in range(3):
+            sock.sendto(f'm{index}'.encode(), ('localhost', server.port))
+        replies = sorted(sock.recvfrom(1024)[0] for _ in range(3))
+        assert replies == [ACK_PREFIX + f'm{index}'.encode() for index in range(3)]
+        # dos mensajes esperaron su turno de 50 ms
+        assert time.monotonic() - started >= 0.09
+    assert wait_for(lambda: server.rate_limit_stats()['delayed'] == 2)
@@ -0,0 +1,75 @@
+import socket
+import time
+
+from src.server import TCPServer
+from src.base.reaper import IDLE, LIFETIME, ConnectionReaper, TimerWheel
+from tests.conftest import wait_for
+
+def test_timer_wheel_fires_within_a_tick():
+    wheel = TimerWheel(tick=0.1, slots=8, now=0.0)
+    wheel.schedule(0.25, 'a')
+    wheel.schedule(0.5, 'b')
+    # más de una vuelta (8 ranuras = 0.8 s): queda en su ranura hasta la vuelta correcta
+    wheel.schedule(2.05, 'c')
+    assert wheel.advance(0.2) == []
+    # nunca antes del plazo y como mucho un tick después
+    assert wheel.advance(0.35) == ['a']
+    assert wheel.advance(1.0) == ['b']
+    assert wheel.advance(2.0) == []
+    assert wheel.advance(2.15) == ['c']
+    assert wheel.size == 0
+
+def test_timer_wheel_past_deadline_goes_to_next_tick():
+    wheel = TimerWheel(tick=0.1, now=10.0)
+    wheel.schedule(5.0, 'vencido')
+    assert wheel.advance(10.0) == []
+    assert wheel.advance(10.15) == ['vencido']
+
+def test_timer_wheel_long_gap():
+    wheel = TimerWheel(tick=0.1, slots=4, now=0.0)
+    for index in range(10):
+        wheel.schedule(0.1 * (index + 1), index)
+    assert sorted(wheel.advance(100.0)) == list(range(10))
+
+class FakeSocket:
+    def __init__(self):
+        self.shut = False
+
+    def shutdown(self, how):
+        self.shut = True
+
+def test_idle_reschedules_on_activity():
+    reaper = ConnectionReaper(idle_timeout=1.0, tick=0.1)
+    sock = FakeSocket()
+    tracked = reaper.register(sock, ('10.0.0.1', 1))
+    start = tracked.last_activity
+    tracked.last_activity = start + 0.8
+    assert reaper.check(start + 1.05) == 0
+    assert reaper.check(start + 1.85) == 1
+    assert sock.shut and tracked.reason == IDLE
+
+def test_lifetime_wins_over_activity():
+    reaper = ConnectionReaper(idle_timeout=10.0, max_lifetime=1.0, tick=0.1)
+    tracked = reaper.register(FakeSocket(), ('10.0.0.1', 2))
+    tracked.last_activity = tracked.opened + 0.9
+    assert reaper.check(tracked.opened + 1.1) == 1
+    assert tracked.reason == LIFETIME
+
+def test_unregistered_connections_are_skipped():
+    reaper = ConnectionReaper(idle_timeout=0.5, tick=0.1)
+    tracked = reaper.register(FakeSocket(), ('10.0.0.1', 3))
+    reaper.unregister(tracked)
+    assert reaper.check(tracked.opened + 1.0) == 0
+    assert reaper.stats()['tracked'] == 0
+
+def test_server_reaps_idle_connection(serve):
+    reaped = []
+    server = serve(TCPServer(port=0, log_callback=reaped.append, idle_timeout=0.2))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        sock.sendall(b'hola')
+        sock.recv(1024)
+        started = time.monotonic()
+        # el servidor cierra la conexión inactiva: recv ve EOF
+        assert sock.recv(1024) == b''
+        assert 0.15 < time.monotonic() - started < 2.0
+    assert wait_for(lambda: server.reaper_stats()['reaped_idle'] == 1)
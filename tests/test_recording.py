@@ -0,0 +1,69 @@
+import socket
+import time
+
+from src.base.recording import CLOSE, MESSAGE, Recorder, load_sessions, read_records
+from src.replay import replay
+from src.server import ACK_PREFIX, UDPServer
+from tests.conftest import quiet, wait_for
+
+def test_records_messages_and_close(tmp_path):
+    path = tmp_path / 'sesion.rec'
+    with Recorder(path) as recorder:
+        recorder.record('tcp', ('127.0.0.1', 1000), b'uno')
+        recorder.record('udp', ('127.0.0.1', 2000), b'dos')
+        recorder.record('tcp', ('127.0.0.1', 1000), b'tres')
+        recorder.close_session('tcp', ('127.0.0.1', 1000))
+        # la dirección reutilizada abre otra sesión
+        recorder.record('tcp', ('127.0.0.1', 1000), b'cuatro')
+    records = [(session, protocol, kind, payload) for _, session, protocol, kind, payload in read_records(path)]
+    assert records == [
+        (0, 'tcp', MESSAGE, b'uno'),
+        (1, 'udp', MESSAGE, b'dos'),
+        (0, 'tcp', MESSAGE, b'tres'),
+        (0, 'tcp', CLOSE, b''),
+        (2, 'tcp', MESSAGE, b'cuatro'),
+    ]
+    protocol, messages = load_sessions(path)[0]
+    assert protocol == 'tcp'
+    assert [payload for _, payload in messages] == [b'uno', b'tres']
+
+def test_idle_udp_sessions_are_closed(tmp_path):
+    path = tmp_path / 'udp.rec'
+    with Recorder(path, udp_idle_timeout=0.05) as recorder:
+        recorder.record('udp', ('127.0.0.1', 2000), b'viejo')
+        recorder.record('tcp', ('127.0.0.1', 1000), b'tcp')
+        time.sleep(0.1)
+        recorder.record('udp', ('127.0.0.1', 3000), b'nuevo')
+        assert len(recorder._sessions) == 2
+        recorder.record('udp', ('127.0.0.1', 2000), b'otra vez')
+    records = [(session, kind) for _, session, _, kind, _ in read_records(path)]
+    assert (0, CLOSE) in records
+    assert records[-1] == (3, MESSAGE)
+
+def test_replay_udp_recording(tmp_path, serve):
+    path = tmp_path / 'udp.rec'
+    recorder = Recorder(path)
+    server = serve(UDPServer(port=0, log_callback=quiet, recorder=recorder))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        for index in range(5):
+            payload = f"mensaje {index}".encode()
+            sock.sendto(payload, ('localhost', server.port))
+            assert sock.recvfrom(1024)[0] == ACK_PREFIX + payload
+    assert wait_for(lambda: recorder.messages == 5)
+    recorder.flush()
+
+    result = replay(path, port=server.port, speed=None)['results']
+    assert result['sessions'] == 1
+    assert result['messages'] == 5
+    assert result['acked'] == 5
+    recorder.close()
+
+def test_idle_recording_reaches_disk(tmp_path):
+    path = tmp_path / 'en_curso.rec'
+    recorder = Recorder(path, flush_interval=0.1)
+    recorder.record('tcp', ('127.0.0.1', 1000), b'ultimo de la rafaga')
+    # sin más mensajes ni close() el registro igual se vuelca
+    assert wait_for(lambda: [payload for *_, payload in read_records(path)] == [b'ultimo de la rafaga'],
+                    timeout=2.0)
+    recorder.close()
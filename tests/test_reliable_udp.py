@@ -0,0 +1,64 @@
+import socket
+
+from src.server import ACK_PREFIX
+from src.reliable_udp import ReliableUDPClient, ReliableUDPServer
+from tests.conftest import quiet
+
+class RecordingServer(ReliableUDPServer):
+    """guarda los mensajes en el orden en que se entregan a la aplicación"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delivered = []
+
+    def _deliver(self, payload, address, started):
+        self.delivered.append(bytes(payload))
+        super()._deliver(payload, address, started)
+
+def messages(count):
+    return [f"mensaje {index:04d}" for index in range(count)]
+
+def test_in_order_exactly_once_under_loss(serve):
+    # 30 % de pérdida en ambos sentidos: datos perdidos en el servidor y en el cliente
+    server = serve(RecordingServer(port=0, log_callback=quiet, loss_rate=0.3, seed=7))
+    client = ReliableUDPClient(server.port, log_callback=quiet, loss_rate=0.3, seed=11,
+                               max_rto=0.2, max_retries=30)
+    try:
+        sent = messages(200)
+        assert client.send_many(sent) == len(sent)
+    finally:
+        client.close()
+    assert server.delivered == [message.encode() for message in sent]
+    stats = client.stats()
+    assert stats['in_flight'] == 0
+    assert stats['acked'] == len(sent)
+    assert stats['injected_losses'] > 0 and server.loss.dropped > 0
+    # cada pérdida inyectada del cliente obliga al menos a una retransmisión
+    assert stats['retransmissions'] >= stats['injected_losses']
+    assert stats['fast_retransmits'] > 0
+
+def test_no_loss_needs_no_retransmissions(serve):
+    server = serve(RecordingServer(port=0, log_callback=quiet))
+    client = ReliableUDPClient(server.port, log_callback=quiet)
+    try:
+        assert client.send_many(messages(100)) == 100
+    finally:
+        client.close()
+    assert len(server.delivered) == 100
+    assert client.stats()['retransmissions'] == 0
+
+def test_plain_udp_clients_still_served(serve):
+    server = serve(RecordingServer(port=0, log_callback=quiet))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        sock.sendto(b'normal', ('localhost', server.port))
+        assert sock.recvfrom(2048)[0] == ACK_PREFIX + b'normal'
+    assert server.delivered == []
+
+def test_non_utf8_payloads_are_delivered_unchanged(serve):
+    server = serve(RecordingServer(port=0, log_callback=quiet))
+    client = ReliableUDPClient(server.port, log_callback=quiet)
+    try:
+        assert client.send_many([bytes(range(256)), b'\xff\xfe'] * 2) == 4
+    finally:
+        client.close()
+    assert server.delivered == [bytes(range(256)), b'\xff\xfe'] * 2
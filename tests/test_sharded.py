@@ -0,0 +1,47 @@
+import os
+import signal
+import socket
+import threading
+
+import pytest
+
+from src.bench import free_port
+from src.server import ACK_PREFIX
+from src.sharded import ShardedServer
+from tests.conftest import quiet, wait_for
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'), reason="sin SO_REUSEPORT")
+
+def echo(port, payload):
+    try:
+        with socket.create_connection(('localhost', port), timeout=5) as sock:
+            sock.sendall(payload)
+            return sock.recv(1024)
+    except OSError:
+        return None
+
+@pytest.fixture
+def sharded():
+    port = free_port('tcp')
+    server = ShardedServer('tcp', port=port, workers=2, log_callback=quiet, publish_interval=0.05)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    assert wait_for(lambda: echo(port, b'listo') is not None)
+    yield server
+    server.stop()
+    thread.join(timeout=10)
+
+def test_workers_share_the_port(sharded):
+    for index in range(10):
+        payload = f'mensaje {index}'.encode()
+        assert echo(sharded.port, payload) == ACK_PREFIX + payload
+    # 10 mensajes más el de espera a que arranquen
+    assert wait_for(lambda: sharded.stats()['messages'] == 11)
+    assert sharded.stats()['workers'] == 2
+
+def test_dead_worker_is_restarted_and_keeps_its_counters(sharded):
+    assert wait_for(lambda: sharded.stats()['messages'] == 1)
+    os.kill(sharded._processes[0].pid, signal.SIGKILL)
+    assert wait_for(lambda: sharded.restarts == 1 and sharded.stats()['workers'] == 2)
+    assert sharded.stats()['messages'] >= 1
+    assert echo(sharded.port, b'otra vez') == ACK_PREFIX + b'otra vez'
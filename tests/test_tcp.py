@@ -0,0 +1,102 @@
+import socket
+
+import pytest
+
+from src.server import ACK_PREFIX, TCPServer
+from src.client import TCPClient
+from src.base.framing import FramedReader, send_frame
+from tests.conftest import quiet, wait_for
+
+def test_plain_echo(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        sock.sendall(b'hola')
+        assert sock.recv(1024) == ACK_PREFIX + b'hola'
+
+def test_framed_echo(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=True))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        reader = FramedReader(sock)
+        payload = b'x' * 5000
+        send_frame(sock, payload)
+        assert bytes(reader.read_frame()) == ACK_PREFIX + payload
+
+def test_client_counts_confirmed_messages(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    client = TCPClient(server.port, log_callback=quiet, timeout=5)
+    assert client.connect()
+    try:
+        for index in range(5):
+            assert client.send_message(f"mensaje {index}")
+        # con 5 mensajes enviados 'end' termina la sesión
+        assert client.send_message('end') is False
+    finally:
+        client.close()
+    assert client.metrics.counters()['messages'] == 5
+
+def test_server_metrics(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    with socket.create_connection(('localhost', server.port), timeout=5) as sock:
+        for _ in range(3):
+            sock.sendall(b'ping')
+            sock.recv(1024)
+    assert wait_for(lambda: server.counters['messages'] == 3)
+    counters = server.counters
+    assert counters['connections'] == 1
+    assert counters['bytes'] == 12
+
+def test_pipelined_client_keeps_order(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=True))
+    acks = []
+    client = TCPClient(server.port, log_callback=quiet, framed=True, window=8, timeout=5,
+                       ack_callback=lambda seq, rtt_ns: acks.append(seq))
+    assert client.connect()
+    try:
+        assert client.send_many(f"mensaje {index}" for index in range(100)) == 100
+        assert client.pipeline_send("uno más") == 100
+        client.pipeline_flush()
+    finally:
+        client.close()
+    assert acks == list(range(101))
+    assert wait_for(lambda: server.counters['messages'] == 101)
+
+def test_pipeline_with_large_frames_does_not_deadlock(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=True))
+    client = TCPClient(server.port, log_callback=quiet, framed=True, window=32, timeout=5)
+    assert client.connect()
+    try:
+        # los ecos de 1 MiB llenan los buffers si nadie los lee mientras se envía
+        payload = b'x' * (1 << 20)
+        assert client.send_many(payload for _ in range(40)) == 40
+    finally:
+        client.close()
+
+def test_failed_pipeline_leaves_no_messages_in_flight(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet, framed=True))
+    # un listener que no responde: la confirmación de "uno" no puede llegar antes del corte
+    with socket.create_server(('localhost', 0)) as silent:
+        client = TCPClient(silent.getsockname()[1], log_callback=quiet, framed=True, timeout=5)
+        assert client.connect()
+        client.pipeline_send("uno")
+        client.socket.shutdown(socket.SHUT_RDWR)
+        with pytest.raises(OSError):
+            client.pipeline_flush()
+    assert client.socket is None
+    assert not client._in_flight
+    client.port = server.port
+    assert client.connect()
+    try:
+        assert client.send_many(["dos", "tres"]) == 2
+        assert client.pipeline_send("cuatro") == 2
+    finally:
+        client.close()
+
+def test_pipeline_requires_framing(serve):
+    server = serve(TCPServer(port=0, log_callback=quiet))
+    client = TCPClient(server.port, log_callback=quiet, timeout=5)
+    assert client.connect()
+    try:
+        with pytest.raises(ValueError):
+            client.pipeline_send("hola")
+    finally:
+        client.close()
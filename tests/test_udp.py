@@ -0,0 +1,45 @@
+import socket
+import threading
+import time
+
+from src.server import ACK_PREFIX, UDPServer
+from tests.conftest import quiet, wait_for
+
+def test_udp_echo(serve):
+    server = serve(UDPServer(port=0, log_callback=quiet))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        for index in range(3):
+            payload = f"datagrama {index}".encode()
+            sock.sendto(payload, ('localhost', server.port))
+            data, _ = sock.recvfrom(2048)
+            assert data == ACK_PREFIX + payload
+    assert wait_for(lambda: server.counters['messages'] == 3)
+
+def test_batched_receive_answers_every_datagram(serve):
+    server = serve(UDPServer(port=0, log_callback=quiet, rcvbuf=1 << 20))
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        payloads = [f"lote {index}".encode() for index in range(200)]
+        for payload in payloads:
+            sock.sendto(payload, ('localhost', server.port))
+        replies = {sock.recvfrom(2048)[0] for _ in payloads}
+    assert replies == {ACK_PREFIX + payload for payload in payloads}
+    assert wait_for(lambda: server.counters['messages'] == len(payloads))
+    stats = server.receive_stats()
+    assert stats['datagrams'] == len(payloads)
+    assert 1 <= stats['batches'] <= len(payloads)
+    assert 1 <= stats['max_batch'] <= UDPServer.RECV_BATCH
+    assert stats['rcvbuf'] >= 1 << 20
+
+def test_stop_wakes_idle_loop():
+    server = UDPServer(port=0, log_callback=quiet)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    assert server.ready.wait(5)
+    # el bucle está bloqueado en el selector sin timeout: stop() lo despierta
+    started = time.monotonic()
+    server.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,124 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from src.server import ACK_PREFIX, TCPServer
+from src.base.worker_pool import QUEUE, REJECT, SHED_OLDEST, WorkerPool
+from tests.conftest import wait_for
+
+class Blocking:
+    """handler que retiene a los workers hasta que se libera el evento"""
+    def __init__(self):
+        self.release = threading.Event()
+        self.done = []
+
+    def __call__(self, item):
+        self.release.wait(5)
+        self.done.append(item)
+
+def make_pool(policy, workers=2, max_queue=2, queue_timeout=None):
+    handler = Blocking()
+    rejected = []
+    pool = WorkerPool(handler, workers=workers, max_queue=max_queue, policy=policy,
+                      queue_timeout=queue_timeout, reject=lambda item, reason: rejected.append((item, reason)))
+    pool.start()
+    return pool, handler, rejected
+
+def test_queue_policy_rejects_when_full():
+    pool, handler, rejected = make_pool(QUEUE)
+    try:
+        results = [pool.submit(index) for index in range(5)]
+        assert results == [True, True, True, True, False]
+        assert [item for item, _ in rejected] == [4]
+        handler.release.set()
+        assert wait_for(lambda: len(handler.done) == 4)
+        assert pool.stats()['accepted'] == 4 and pool.stats()['rejected'] == 1
+    finally:
+        handler.release.set()
+        pool.shutdown(timeout=2)
+
+def test_reject_policy_has_no_queue():
+    pool, handler, rejected = make_pool(REJECT)
+    try:
+        assert [pool.submit(index) for index in range(3)] == [True, True, False]
+        assert rejected[0][1] == "sin workers libres"
+    finally:
+        handler.release.set()
+        pool.shutdown(timeout=2)
+
+def test_shed_oldest_drops_longest_waiting():
+    pool, handler, rejected = make_pool(SHED_OLDEST)
+    try:
+        # con los 2 workers ocupados la cola guarda 2, 3 y luego descarta las más viejas
+        pool.submit(0)
+        pool.submit(1)
+        assert wait_for(lambda: pool.stats()['active'] == 2)
+        for index in range(2, 6):
+            assert pool.submit(index)
+        assert [item for item, _ in rejected] == [2, 3]
+        assert pool.stats()['shed'] == 2
+        handler.release.set()
+        assert wait_for(lambda: sorted(handler.done) == [0, 1, 4, 5])
+    finally:
+        handler.release.set()
+        pool.shutdown(timeout=2)
+
+def test_queue_timeout_expires_waiting_tasks():
+    pool, handler, rejected = make_pool(QUEUE, workers=1, max_queue=4, queue_timeout=0.05)
+    try:
+        pool.submit('ocupa')
+        pool.submit('espera')
+        time.sleep(0.1)
+        handler.release.set()
+        assert wait_for(lambda: pool.stats()['expired'] == 1)
+        assert rejected == [('espera', "plazo de espera en cola vencido")]
+    finally:
+        pool.shutdown(timeout=2)
+
+def test_acceptor_expires_queue_while_workers_are_busy():
+    pool, handler, rejected = make_pool(QUEUE, workers=1, max_queue=2, queue_timeout=0.05)
+    try:
+        pool.submit('ocupa')
+        pool.submit('vieja 1')
+        pool.submit('vieja 2')
+        time.sleep(0.1)
+        # el worker sigue ocupado: el próximo submit vence el frente y hace lugar
+        assert pool.submit('nueva')
+        assert rejected == [('vieja 1', "plazo de espera en cola vencido"),
+                            ('vieja 2', "plazo de espera en cola vencido")]
+        assert pool.stats()['expired'] == 2 and pool.stats()['queued'] == 1
+        handler.release.set()
+        assert wait_for(lambda: handler.done == ['ocupa', 'nueva'])
+    finally:
+        handler.release.set()
+        pool.shutdown(timeout=2)
+
+def test_shutdown_rejects_pending():
+    pool, handler, rejected = make_pool(QUEUE, workers=1)
+    pool.submit(0)
+    pool.submit(1)
+    pool.shutdown()
+    handler.release.set()
+    assert (1, "servidor detenido") in rejected
+    assert pool.submit(2) is False
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        WorkerPool(print, policy='todo')
+    with pytest.raises(ValueError):
+        WorkerPool(print, workers=0)
+
+def test_server_with_bounded_pool(serve):
+    server = serve(TCPServer(port=0, log_callback=lambda message: None, max_connections=2,
+                             overload='reject', backlog=16))
+    with socket.create_connection(('localhost', server.port), timeout=5) as first, \
+            socket.create_connection(('localhost', server.port), timeout=5) as second:
+        for sock in (first, second):
+            sock.sendall(b'hola')
+            assert sock.recv(1024) == ACK_PREFIX + b'hola'
+        with socket.create_connection(('localhost', server.port), timeout=5) as third:
+            # la tercera conexión se acepta y se cierra sin respuesta
+            assert third.recv(1024) == b''
+    assert wait_for(lambda: server.admission_stats()['rejected'] == 1)